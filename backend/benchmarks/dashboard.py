@@ -0,0 +1,95 @@
+# 仪表盘：原来逐条执行的 8 条查询、合并后的一条语句、以及命中用户缓存三种情况的耗时和网络往返次数
+# 用法（在 backend 目录下，需要可连接的 Oracle）：
+#     python -m benchmarks.dashboard --user-id 1 --repeat 200
+import argparse
+import asyncio
+import json
+import time
+from db_config import get_async_conn
+from main import load_dashboard, get_dashboard
+from user_cache import dashboard_cache
+
+_ROUND_TRIPS_SQL = '''
+    SELECT m.value FROM v$mystat m JOIN v$statname n ON m.statistic# = n.statistic#
+    WHERE n.name = 'SQL*Net roundtrips to/from client'
+'''
+
+async def _eight_queries(conn, user_id):
+    # 合并之前的实现，作为对照
+    cursor = conn.cursor()
+    try:
+        await cursor.execute('SELECT NVL(SUM(log_count), 0) FROM StudyDailyRollup WHERE user_id=:user_id AND study_date = TRUNC(SYSDATE)', user_id=user_id)
+        await cursor.fetchone()
+        await cursor.execute('SELECT COUNT(*) FROM WordMastery WHERE user_id=:user_id', user_id=user_id)
+        await cursor.fetchone()
+        await cursor.execute('SELECT MAX(streak) FROM (SELECT COUNT(*) AS streak FROM (SELECT checkin_date, ROW_NUMBER() OVER (ORDER BY checkin_date DESC) rn FROM CheckInLog WHERE user_id=:user_id) GROUP BY checkin_date - rn)', user_id=user_id)
+        await cursor.fetchone()
+        await cursor.execute('SELECT AVG(accuracy_rate) FROM CheckInLog WHERE user_id=:user_id', user_id=user_id)
+        await cursor.fetchone()
+        await cursor.execute('SELECT COUNT(*) FROM ReviewSchedule WHERE user_id=:user_id AND TRUNC(review_date) = TRUNC(SYSDATE)', user_id=user_id)
+        await cursor.fetchone()
+        await cursor.execute('SELECT NVL(SUM(log_count), 0) FROM StudyDailyRollup WHERE user_id=:user_id AND study_date >= TRUNC(SYSDATE) - 7', user_id=user_id)
+        await cursor.fetchone()
+        await cursor.execute('SELECT w.word_id, w.word FROM StudyLog s JOIN Word w ON s.word_id=w.word_id WHERE s.user_id=:user_id ORDER BY s.study_time DESC FETCH FIRST 5 ROWS ONLY', user_id=user_id)
+        await cursor.fetchall()
+        await cursor.execute('''
+            SELECT w.word, '第' || TO_CHAR(r.repeat_count + 1) || '天复习' AS type, COUNT(*) AS cnt
+            FROM ReviewSchedule r JOIN Word w ON r.word_id=w.word_id
+            WHERE r.user_id=:user_id AND r.review_date >= SYSDATE
+            GROUP BY w.word, r.repeat_count
+        ''', user_id=user_id)
+        await cursor.fetchall()
+    finally:
+        cursor.close()
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda p: samples[min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))]
+    return {"p50_ms": round(pick(50), 3), "p99_ms": round(pick(99), 3), "max_ms": round(samples[-1], 3)}
+
+async def _round_trips(cursor):
+    await cursor.execute(_ROUND_TRIPS_SQL)
+    return (await cursor.fetchone())[0]
+
+async def _measure(conn, stat_cursor, fn, repeat):
+    await fn()  # 预热：解析语句
+    baseline = await _round_trips(stat_cursor)
+    overhead = await _round_trips(stat_cursor) - baseline
+    before = await _round_trips(stat_cursor)
+    await fn()
+    trips = await _round_trips(stat_cursor) - before - overhead
+    elapsed = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn()
+        elapsed.append((time.perf_counter() - start) * 1000)
+    return dict(_percentiles(elapsed), round_trips=trips)
+
+async def run(user_id: int, repeat: int):
+    conn = await get_async_conn()
+    stat_cursor = conn.cursor()
+    try:
+        dashboard_cache.clear()
+        results = {
+            "eight_queries": await _measure(conn, stat_cursor, lambda: _eight_queries(conn, user_id), repeat),
+            "single_statement": await _measure(conn, stat_cursor, lambda: load_dashboard(conn, user_id), repeat),
+        }
+        # 缓存命中：第一次请求填充缓存，之后不访问数据库
+        await get_dashboard(user_id)
+        elapsed = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            await get_dashboard(user_id)
+            elapsed.append((time.perf_counter() - start) * 1000)
+        results["cached"] = dict(_percentiles(elapsed), round_trips=0)
+        return {"user_id": user_id, "repeat": repeat, "results": results}
+    finally:
+        stat_cursor.close()
+        await conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.user_id, args.repeat)), ensure_ascii=False, indent=2))
@@ -0,0 +1,82 @@
+# 拼写容错索引在不同词表规模下的构建耗时与查询延迟，使用合成单词，不需要数据库
+# 用法（在 backend 目录下）：
+#     python -m benchmarks.fuzzy_search --sizes 10000 50000 100000 500000 --queries 1000
+# 不指定 --max-distance 时与接口默认行为一致，按查询长度自动决定编辑距离
+import argparse
+import gc
+import json
+import os
+import random
+import string
+import time
+from search_index import FuzzyWordIndex, FUZZY_MAX_DISTANCE
+
+# 英文字母大致频率，合成的单词更接近真实词表的删除变体分布
+_LETTERS = "eeeeeeeeeeeetttttttttaaaaaaaaooooooooiiiiiiinnnnnnnsssssshhhhhhrrrrrrddddlllluuucccmmmwwffggyyppbbvkjxqz"
+
+def _word(rng):
+    return ''.join(rng.choice(_LETTERS) for _ in range(rng.randint(4, 12)))
+
+def _misspell(rng, word, edits):
+    for _ in range(edits):
+        i = rng.randrange(len(word))
+        op = rng.choice(("delete", "insert", "replace", "swap"))
+        if op == "delete" and len(word) > 2:
+            word = word[:i] + word[i + 1:]
+        elif op == "insert":
+            word = word[:i] + rng.choice(string.ascii_lowercase) + word[i:]
+        elif op == "swap" and i < len(word) - 1:
+            word = word[:i] + word[i + 1] + word[i] + word[i + 2:]
+        else:
+            word = word[:i] + rng.choice(string.ascii_lowercase) + word[i + 1:]
+    return word
+
+def _rss_mb():
+    # 当前进程的常驻内存（Linux），构建前后之差即索引在一个 worker 中的占用
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+def run(size: int, queries: int, max_distance=None, seed: int = 7):
+    rng = random.Random(seed)
+    words = [_word(rng) for _ in range(size)]
+    gc.collect()
+    before = _rss_mb()
+    index = FuzzyWordIndex()
+    start = time.perf_counter()
+    index._fill((word_id, word, None) for word_id, word in enumerate(words))
+    build_ms = (time.perf_counter() - start) * 1000
+    gc.collect()
+    memory_mb = _rss_mb() - before
+    latencies = []
+    found = 0
+    for _ in range(queries):
+        target = rng.choice(words)
+        q = _misspell(rng, target, rng.randint(1, FUZZY_MAX_DISTANCE))
+        start = time.perf_counter()
+        hits = index.search(q, 10, max_distance)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found += any(h["word"] == target for h in hits)
+    latencies.sort()
+    pick = lambda p: round(latencies[min(int(len(latencies) * p), len(latencies) - 1)], 3)
+    stats = index.stats()
+    return {
+        "words": size,
+        "deletes": stats["deletes"],
+        "build_ms": round(build_ms, 1),
+        "memory_mb": round(memory_mb, 1),
+        "queries": queries,
+        "max_distance": "auto" if max_distance is None else max_distance,
+        "recall_at_10": round(found / queries, 3),
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "max_ms": round(latencies[-1], 3),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 100000, 500000])
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--max-distance", type=int, default=None)
+    args = parser.parse_args()
+    print(json.dumps([run(size, args.queries, args.max_distance) for size in args.sizes], indent=2))
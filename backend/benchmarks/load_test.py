@@ -0,0 +1,246 @@
+# 模拟学生的混合流量压测：登录、仪表盘、写学习记录、取题与交卷、复习、统计，按接口输出吞吐和延迟分位数（JSON）
+# 每个并发对应一名学生（首次运行时注册 loadtest_<序号>，之后复用），循环按权重随机选择操作直到时长结束。
+# 两种目标（在 backend 目录下运行）：
+#   1. 已启动的服务，连接的数据库由服务自身的 DB_* 环境变量决定（正式 Oracle 或本机的 Oracle Free 容器）：
+#          python -m benchmarks.load_test --base-url http://127.0.0.1:8000 --concurrency 50 --duration 60
+#   2. 进程内直接调用 main.app（不经过网络和 uvicorn），按本进程的 DB_* 环境变量连接数据库，适合在笔记本上对本机数据库回归：
+#          DB_HOST=localhost DB_SERVICE_NAME=FREE python -m benchmarks.load_test --in-process --concurrency 20 --duration 30
+# 指定 --baseline 时与之前保存的报告（--output）比较各接口 p99，超出 --tolerance 的接口列在 regressions 中，退出码为 1
+import argparse
+import asyncio
+import datetime
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+import httpx
+
+# 操作名 -> 默认权重，大致对应一名学生一次学习过程中各操作的频率
+DEFAULT_MIX = {
+    "login": 1,
+    "dashboard": 3,
+    "study_log": 8,
+    "test": 2,
+    "review": 3,
+    "statistics": 1,
+}
+
+# 每名学生准备时创建的已到期复习卡片数
+REVIEW_CARDS = 20
+
+class Recorder:
+    # 按接口记录每次请求的耗时和状态码，warmup 结束前的请求不计入
+    def __init__(self, measure_from: float):
+        self.measure_from = measure_from
+        self.latency = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.errors = defaultdict(int)
+
+    async def call(self, client: httpx.AsyncClient, name: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            self._add(name, start, type(e).__name__)
+            return None
+        self._add(name, start, response.status_code)
+        return response if response.status_code < 400 else None
+
+    def _add(self, name, start, status):
+        end = time.perf_counter()
+        if start < self.measure_from:
+            return
+        self.latency[name].append((end - start) * 1000)
+        self.statuses[name][str(status)] += 1
+        if not isinstance(status, int) or status >= 400:
+            self.errors[name] += 1
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda p: samples[min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))]
+    return {"p50_ms": round(pick(50), 3), "p90_ms": round(pick(90), 3), "p99_ms": round(pick(99), 3), "max_ms": round(samples[-1], 3)}
+
+class Student:
+    def __init__(self, index: int, prefix: str, client: httpx.AsyncClient, recorder: Recorder, rng: random.Random):
+        self.username = f"{prefix}_{index}"
+        self.password = "loadtest123"
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+        self.user_id = None
+        self.word_ids = []
+
+    async def call(self, name, method, url, **kwargs):
+        return await self.recorder.call(self.client, name, method, url, **kwargs)
+
+    async def setup(self):
+        # 注册（已存在则直接登录）、取一批单词、创建已到期的复习卡片；准备阶段的请求不计入结果
+        response = await self.client.post("/api/auth/register", json={
+            "username": self.username, "password": self.password, "role": "student", "email": f"{self.username}@loadtest.local",
+        })
+        body = response.json() if response.status_code == 200 else {}
+        if not body.get("success"):
+            response = await self.client.post("/api/login", json={"username": self.username, "password": self.password, "role": "student"})
+            body = response.json() if response.status_code == 200 else {}
+        if not body.get("success"):
+            raise RuntimeError(f"{self.username} 无法注册或登录: {response.status_code} {response.text[:200]}")
+        self.user_id = body["user"]["user_id"]
+        response = await self.client.get("/api/test/questions", params={"count": REVIEW_CARDS})
+        response.raise_for_status()
+        self.word_ids = [q["word_id"] for q in response.json()]
+        if not self.word_ids:
+            raise RuntimeError("Word 表为空，先导入 init_data.sql 或词库")
+        due = (datetime.datetime.now() - datetime.timedelta(days=1)).strftime("%Y-%m-%dT%H:%M:%S")
+        for word_id in self.word_ids:
+            await self.client.post("/api/review/create", json={"user_id": self.user_id, "word_id": word_id, "review_date": due})
+
+    async def login(self):
+        await self.call("POST /api/login", "POST", "/api/login", json={"username": self.username, "password": self.password, "role": "student"})
+
+    async def dashboard(self):
+        await self.call("GET /api/dashboard/{user_id}", "GET", f"/api/dashboard/{self.user_id}")
+
+    async def study_log(self):
+        await self.call("POST /api/study/log", "POST", "/api/study/log", json={
+            "user_id": self.user_id, "word_id": self.rng.choice(self.word_ids), "status": self.rng.choice(("known", "unknown")),
+        })
+
+    async def test(self):
+        # 取 10 道题，约七成答对后交卷
+        response = await self.call("GET /api/test/questions", "GET", "/api/test/questions", params={"count": 10})
+        if response is None:
+            return
+        questions = response.json()
+        answers, correct = [], 0
+        for q in questions:
+            translation = q["translations"][0]["translation"] if q.get("translations") else ""
+            q["correct_answer"] = translation
+            if self.rng.random() < 0.7:
+                answers.append(translation)
+                correct += 1
+            else:
+                answers.append("?")
+        await self.call("POST /api/tests/results", "POST", "/api/tests/results", json={
+            "user_id": self.user_id, "questions": questions, "answers": answers,
+            "score": round(correct * 100 / len(questions), 1) if questions else 0.0,
+            "total_questions": len(questions), "correct_answers": correct, "test_type": "vocabulary",
+        })
+
+    async def review(self):
+        # 取到期队列，作答前 5 张
+        response = await self.call("GET /api/review/due", "GET", "/api/review/due", params={"user_id": self.user_id, "limit": 20})
+        if response is None:
+            return
+        items = response.json()["items"][:5]
+        if items:
+            await self.call("POST /api/review/answers", "POST", "/api/review/answers", json={
+                "user_id": self.user_id,
+                "answers": [{"schedule_id": item["schedule_id"], "grade": self.rng.randint(1, 5)} for item in items],
+            })
+
+    async def statistics(self):
+        await self.call("GET /api/statistics/summary/{user_id}", "GET", f"/api/statistics/summary/{self.user_id}")
+
+    async def run(self, mix, deadline: float, think: float):
+        names, weights = list(mix), list(mix.values())
+        while time.perf_counter() < deadline:
+            await getattr(self, self.rng.choices(names, weights)[0])()
+            if think > 0:
+                await asyncio.sleep(self.rng.expovariate(1 / think))
+
+def _parse_mix(text: str):
+    mix = dict(DEFAULT_MIX)
+    if text:
+        for item in text.split(","):
+            name, _, weight = item.partition("=")
+            if name.strip() not in DEFAULT_MIX:
+                raise SystemExit(f"未知操作 {name}，可选 {', '.join(DEFAULT_MIX)}")
+            mix[name.strip()] = float(weight)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+def _compare(report, baseline, tolerance: float):
+    # p99 比基线慢 tolerance 以上（且至少慢 1ms，避免极短接口的抖动）记为回归
+    regressions = []
+    for name, current in report["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(name)
+        if previous and current["p99_ms"] > previous["p99_ms"] * (1 + tolerance) and current["p99_ms"] - previous["p99_ms"] >= 1:
+            regressions.append({"endpoint": name, "baseline_p99_ms": previous["p99_ms"], "p99_ms": current["p99_ms"]})
+    return regressions
+
+async def _drive(client, args, mix):
+    # 准备完成前不计时
+    recorder = Recorder(float("inf"))
+    students = [Student(i, args.user_prefix, client, recorder, random.Random(args.seed + i)) for i in range(args.concurrency)]
+    setup = asyncio.Semaphore(10)
+
+    async def prepare(student):
+        async with setup:
+            await student.setup()
+
+    await asyncio.gather(*(prepare(s) for s in students))
+    start = time.perf_counter()
+    recorder.measure_from = start + args.warmup
+    await asyncio.gather(*(s.run(mix, start + args.warmup + args.duration, args.think_ms / 1000) for s in students))
+    elapsed = time.perf_counter() - start - args.warmup
+    endpoints = {}
+    for name in sorted(recorder.latency):
+        samples = recorder.latency[name]
+        endpoints[name] = dict(
+            count=len(samples), errors=recorder.errors[name], rps=round(len(samples) / elapsed, 2),
+            statuses=dict(recorder.statuses[name]), **_percentiles(samples),
+        )
+    total = sum(e["count"] for e in endpoints.values())
+    return {
+        "target": "in-process" if args.in_process else args.base_url,
+        "concurrency": args.concurrency,
+        "duration_s": round(elapsed, 3),
+        "warmup_s": args.warmup,
+        "think_ms": args.think_ms,
+        "mix": mix,
+        "requests": total,
+        "errors": sum(e["errors"] for e in endpoints.values()),
+        "rps": round(total / elapsed, 2),
+        "overall": _percentiles([v for samples in recorder.latency.values() for v in samples]) if total else {},
+        "endpoints": endpoints,
+    }
+
+async def run(args):
+    mix = _parse_mix(args.mix)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    if args.in_process:
+        # 进程内运行时启动 main 的 lifespan（连接池、索引、写缓冲线程），结束时关闭
+        from main import app, lifespan
+        async with lifespan(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout) as client:
+                return await _drive(client, args, mix)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        return await _drive(client, args, mix)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--in-process", action="store_true")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30, help="计入结果的秒数")
+    parser.add_argument("--warmup", type=float, default=5, help="开始计时前的预热秒数")
+    parser.add_argument("--think-ms", type=float, default=0, help="两次操作之间的平均间隔，0 表示不间断地发请求")
+    parser.add_argument("--mix", default="", help="调整操作权重，如 study_log=10,statistics=0")
+    parser.add_argument("--user-prefix", default="loadtest")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--output", help="报告另存为该文件，可作为之后的 --baseline")
+    parser.add_argument("--baseline", help="之前保存的报告")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+    report = asyncio.run(run(args))
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            report["regressions"] = _compare(report, json.load(f), args.tolerance)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+    sys.exit(1 if report.get("regressions") else 0)
@@ -0,0 +1,70 @@
+# 对比 CLOB 以 LOB 定位符返回与以 str 直接返回时，批量补全单词的网络往返次数和耗时
+# 用法（在 backend 目录下，需要可连接的 Oracle）：
+#     python -m benchmarks.lob_fetch --words 500 --repeat 5
+import argparse
+import json
+import time
+import oracledb
+import db_config
+from db_config import get_oracle_conn
+from hydrate import load_words
+
+_ROUND_TRIPS_SQL = '''
+    SELECT m.value FROM v$mystat m JOIN v$statname n ON m.statistic# = n.statistic#
+    WHERE n.name = 'SQL*Net roundtrips to/from client'
+'''
+
+# before：默认 LOB 定位符 + 驱动默认 arraysize；after：fetch_lobs=False + list 配置
+SCENARIOS = {
+    "before": {"fetch_lobs": True, "list": {"arraysize": 100, "prefetchrows": 2}},
+    "after": {"fetch_lobs": False, "list": dict(db_config.FETCH_PROFILES["list"])},
+}
+
+def _round_trips(cursor):
+    cursor.execute(_ROUND_TRIPS_SQL)
+    return cursor.fetchone()[0]
+
+def run(words: int, repeat: int):
+    original_fetch_lobs = oracledb.defaults.fetch_lobs
+    original_profile = db_config.FETCH_PROFILES["list"]
+    conn = get_oracle_conn()
+    stat_cursor = conn.cursor()
+    try:
+        stat_cursor.execute('SELECT word_id FROM Word ORDER BY word_id FETCH FIRST :n ROWS ONLY', n=words)
+        word_ids = [row[0] for row in stat_cursor.fetchall()]
+        # 读取统计值本身也要一次往返，先测出来再扣除
+        baseline = _round_trips(stat_cursor)
+        overhead = _round_trips(stat_cursor) - baseline
+        results = {}
+        for name, scenario in SCENARIOS.items():
+            oracledb.defaults.fetch_lobs = scenario["fetch_lobs"]
+            db_config.FETCH_PROFILES["list"] = scenario["list"]
+            trips, elapsed = [], []
+            for _ in range(repeat):
+                cursor = conn.cursor()
+                before = _round_trips(stat_cursor)
+                start = time.perf_counter()
+                load_words(cursor, word_ids)
+                elapsed.append((time.perf_counter() - start) * 1000)
+                trips.append(_round_trips(stat_cursor) - before - overhead)
+                cursor.close()
+            results[name] = {
+                "fetch_lobs": scenario["fetch_lobs"],
+                "arraysize": scenario["list"]["arraysize"],
+                "round_trips": min(trips),
+                "best_ms": round(min(elapsed), 2),
+                "avg_ms": round(sum(elapsed) / len(elapsed), 2),
+            }
+        return {"words": len(word_ids), "repeat": repeat, "results": results}
+    finally:
+        oracledb.defaults.fetch_lobs = original_fetch_lobs
+        db_config.FETCH_PROFILES["list"] = original_profile
+        stat_cursor.close()
+        conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--words", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(run(args.words, args.repeat), ensure_ascii=False, indent=2))
@@ -0,0 +1,83 @@
+# 调度引擎的数组批量计算与逐行 Python 循环的耗时对比，使用合成的复习计划，不需要数据库
+# 用法（在 backend 目录下）：
+#     python -m benchmarks.scheduler --rows 1000000
+import argparse
+import json
+import math
+import time
+import numpy as np
+from scheduler import SCHEDULER_CONFIG, PASS_GRADE, review, retune
+
+def _review_row(n, ease, interval, grade, now_days, config=SCHEDULER_CONFIG):
+    # 与 scheduler.review 相同的规则，逐行计算
+    ease = config["initial_ease"] if math.isnan(ease) else max(ease, config["min_ease"])
+    ease = max(ease + 0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02), config["min_ease"])
+    if math.isnan(interval) or interval <= 0:
+        interval = 1.0 if n <= 1 else 6.0 * ease ** max(n - 2, 0)
+    if grade < PASS_GRADE:
+        n, next_interval = 0, 1.0
+    else:
+        next_interval = 1.0 if n == 0 else 6.0 if n == 1 else float(round(interval * ease))
+        next_interval *= config["interval_modifier"]
+        n += 1
+    next_interval = min(max(next_interval, 1.0), config["max_interval"])
+    return n, round(ease, 2), next_interval, now_days + next_interval
+
+def _retune_row(n, ease, interval, last_review, review_date, config=SCHEDULER_CONFIG):
+    ease = round(config["initial_ease"] if math.isnan(ease) else max(ease, config["min_ease"]), 2)
+    moved = interval > 0 and not math.isnan(last_review) and abs(review_date - last_review - interval) > 60 / 86400
+    if math.isnan(interval) or interval <= 0:
+        interval = 1.0 if n <= 1 else 6.0 * ease ** max(n - 2, 0)
+    interval = min(max(interval, 1.0), config["max_interval"])
+    if math.isnan(last_review):
+        last_review = review_date - interval
+    return ease, interval, last_review, review_date if moved else last_review + interval
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, round((time.perf_counter() - start) * 1000, 1)
+
+def run(rows: int, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    now_days = 20000.0
+    n = rng.integers(0, 12, rows).astype(np.float64)
+    ease = rng.uniform(1.3, 3.0, rows).round(2)
+    interval = rng.uniform(0, 200, rows).round(2)
+    last_review = now_days - rng.uniform(0, 200, rows)
+    review_date = last_review + interval
+    # 模拟手动改过复习日期的行
+    moved = rng.random(rows) < 0.05
+    review_date[moved] += rng.uniform(-3, 3, int(moved.sum()))
+    grade = rng.integers(0, 6, rows).astype(np.float64)
+    # 模拟没有迁移状态列的旧数据
+    legacy = rng.random(rows) < 0.1
+    ease[legacy] = np.nan
+    interval[legacy] = np.nan
+    last_review[legacy] = np.nan
+
+    vector_review, vector_review_ms = _timed(lambda: review(n, ease, interval, grade, now_days))
+    vector_retune, vector_retune_ms = _timed(lambda: retune(n, ease, interval, last_review, review_date))
+    columns = list(zip(n.tolist(), ease.tolist(), interval.tolist(), grade.tolist(), last_review.tolist(), review_date.tolist()))
+    loop_review, loop_review_ms = _timed(lambda: [_review_row(int(c[0]), c[1], c[2], c[3], now_days) for c in columns])
+    loop_retune, loop_retune_ms = _timed(lambda: [_retune_row(int(c[0]), c[1], c[2], c[4], c[5]) for c in columns])
+
+    # 两种实现结果一致
+    sample = rng.integers(0, rows, min(rows, 10000))
+    for i in sample:
+        assert loop_review[i][0] == vector_review["repeat_count"][i]
+        assert math.isclose(loop_review[i][2], vector_review["interval_days"][i])
+        assert math.isclose(loop_retune[i][1], vector_retune["interval_days"][i])
+        assert math.isclose(loop_retune[i][3], vector_retune["review_date"][i], abs_tol=1e-6)
+
+    return {
+        "rows": rows,
+        "review": {"numpy_ms": vector_review_ms, "loop_ms": loop_review_ms, "speedup": round(loop_review_ms / max(vector_review_ms, 0.1), 1)},
+        "retune": {"numpy_ms": vector_retune_ms, "loop_ms": loop_retune_ms, "speedup": round(loop_retune_ms / max(vector_retune_ms, 0.1), 1)},
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.rows), indent=2))
@@ -0,0 +1,132 @@
+# 对比列表接口逐行创建 pydantic 对象再经 response_model 校验序列化，与直接组装 dict 用 orjson 编码的耗时
+# 不需要数据库：按各接口的字段构造 rows 条数据，在进程内直接调用 ASGI 应用，只测序列化部分
+# 用法（在 backend 目录下）：
+#     python -m benchmarks.serialization --rows 1000 --repeat 50
+import argparse
+import asyncio
+import datetime
+import json
+import time
+from typing import List
+from fastapi import FastAPI
+from fast_response import fast_json
+from review import ReviewSchedule
+from favorite import FavoriteWord
+from users import User
+from studylog import StudyLog
+from checkin import CheckInLog
+from test import TestResult
+from wordlists import WordList
+from wrongwords import WrongWord
+from statistics import WordMasteryStats, StatisticsSummary
+
+_NOW = datetime.datetime(2024, 1, 1, 8, 30)
+
+def _word(i):
+    return {
+        "word_id": i, "word": f"word{i}", "list_id": i % 10, "difficulty": "CET4",
+        "translations": [{"translation": f"释义{i}", "word_type": "n."}, {"translation": f"释义{i}b", "word_type": "v."}],
+        "phrases": [{"phrase": f"phrase {i}", "translation": f"短语{i}"}],
+    }
+
+def _summary(i):
+    return {
+        "daily": [{"date": "2024-01-01", "words_studied": i, "accuracy_rate": 75.5, "time_spent": 30}] * 7,
+        "mastery": [{"word": f"word{i}", "mastery_level": "learning", "last_review_date": "2024-01-01", "review_count": 3, "accuracy_rate": 66.7}] * 20,
+        "weekly": [{"week_start": "2024-01-01", "words_studied": 40, "average_accuracy": 80.0, "study_time": 0, "streak_days": 5}] * 4,
+        "categories": [{"category": "CET4", "word_count": 3000, "mastered_count": 10, "learning_count": 20, "not_started_count": 2970}] * 5,
+    }
+
+# 接口名 -> (response_model 中的单行模型, 由序号生成一行 dict, 是否为单个对象)
+ENDPOINTS = {
+    "review": (ReviewSchedule, lambda i: {"schedule_id": i, "user_id": 1, "word_id": i, "review_date": "2024-01-01T08:30:00", "repeat_count": 2, "memory_strength": 0.85}, False),
+    "favorite": (FavoriteWord, lambda i: {"fav_id": i, "user_id": 1, "word_id": i, "fav_time": "2024-01-01T08:30:00"}, False),
+    "users": (User, lambda i: {"user_id": i, "username": f"user{i}", "role": "student", "email": f"user{i}@example.com", "create_time": "2024-01-01"}, False),
+    "studylog": (StudyLog, lambda i: {"log_id": i, "user_id": 1, "word_id": i, "study_time": "2024-01-01T08:30:00", "status": "known"}, False),
+    "checkin_logs": (CheckInLog, lambda i: {"checkin_id": i, "user_id": 1, "checkin_date": "2024-01-01", "word_count": 50, "study_duration": 30, "accuracy_rate": 88.5}, False),
+    "test_history": (TestResult, lambda i: {"user_id": 1, "score": 80.0, "total_questions": 50, "correct_answers": 40, "test_date": _NOW, "test_type": "vocabulary"}, False),
+    "wordlists": (WordList, lambda i: {"list_id": i, "list_name": f"list{i}", "description": "描述" * 20, "creator_id": 1, "create_time": "2024-01-01", "is_public": True, "difficulty": "CET4", "word_count": 3000}, False),
+    "wrongwords": (WrongWord, lambda i: {"id": i, "user_id": 1, "word_id": i, "wrong_count": 3, "last_wrong_time": "2024-01-01T08:30:00", "error_type": "含义理解", "user_answer": "x", "correct_answer": "y", "word": _word(i)}, False),
+    "statistics_mastery": (WordMasteryStats, lambda i: {"word": f"word{i}", "mastery_level": "learning", "last_review_date": "2024-01-01", "review_count": 3, "accuracy_rate": 66.7}, False),
+    "statistics_summary": (StatisticsSummary, _summary, True),
+}
+
+def _routes(model, data, single, response_model, config):
+    def before():
+        # 原实现：逐行创建模型对象，FastAPI 再按 response_model 校验并序列化
+        return model(**data) if single else [model(**row) for row in data]
+
+    def after():
+        return fast_json(data, response_model, config)
+
+    return before, after
+
+def _app(rows: int, validate: bool):
+    app = FastAPI()
+    config = {"enabled": True, "validate": validate}
+    for name, (model, make, single) in ENDPOINTS.items():
+        response_model = model if single else List[model]
+        data = make(0) if single else [make(i) for i in range(rows)]
+        before, after = _routes(model, data, single, response_model, config)
+        app.get(f"/before/{name}", response_model=response_model)(before)
+        app.get(f"/after/{name}", response_model=response_model)(after)
+    return app
+
+async def _call(app, path):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "", "headers": [],
+        "client": ("benchmark", 0), "server": ("benchmark", 80),
+    }
+    body = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return b"".join(body)
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda p: samples[min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))]
+    return {"p50_ms": round(pick(50), 3), "p99_ms": round(pick(99), 3)}
+
+async def _measure(app, path, repeat):
+    await _call(app, path)
+    elapsed = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await _call(app, path)
+        elapsed.append((time.perf_counter() - start) * 1000)
+    return _percentiles(elapsed)
+
+async def run(rows: int, repeat: int):
+    fast = _app(rows, validate=False)
+    checked = _app(rows, validate=True)
+    results = {}
+    for name in ENDPOINTS:
+        # 两条路径的输出必须一致
+        before_body = await _call(fast, f"/before/{name}")
+        after_body = await _call(fast, f"/after/{name}")
+        assert json.loads(before_body) == json.loads(after_body), name
+        before = await _measure(fast, f"/before/{name}", repeat)
+        after = await _measure(fast, f"/after/{name}", repeat)
+        results[name] = {
+            "bytes": len(after_body),
+            "before": before,
+            "after": after,
+            "after_validate": await _measure(checked, f"/after/{name}", repeat),
+            "speedup_p50": round(before["p50_ms"] / after["p50_ms"], 2) if after["p50_ms"] else None,
+        }
+    return {"rows": rows, "repeat": repeat, "results": results}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.rows, args.repeat)), ensure_ascii=False, indent=2))
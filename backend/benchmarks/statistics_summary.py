@@ -0,0 +1,72 @@
+# 统计页：四个单独接口（各自取连接、各自一条语句）与 /statistics/summary 一次取回的耗时对比
+# 用法（在 backend 目录下，需要可连接的 Oracle，且已执行 python study_rollup.py rebuild）：
+#     python -m benchmarks.statistics_summary --user-id 1 --repeat 50
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from db_config import create_pool, close_pool
+from statistics import (
+    get_daily_statistics, get_word_mastery_statistics, get_weekly_statistics,
+    get_category_statistics, get_statistics_summary,
+)
+
+def _four_calls(user_id):
+    return [
+        get_daily_statistics(user_id),
+        get_word_mastery_statistics(user_id),
+        get_weekly_statistics(user_id),
+        get_category_statistics(user_id),
+    ]
+
+def _four_calls_parallel(user_id, executor):
+    # 前端并发发出四个请求的情况
+    futures = [
+        executor.submit(get_daily_statistics, user_id),
+        executor.submit(get_word_mastery_statistics, user_id),
+        executor.submit(get_weekly_statistics, user_id),
+        executor.submit(get_category_statistics, user_id),
+    ]
+    return [f.result() for f in futures]
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda p: samples[min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))]
+    return {"p50_ms": round(pick(50), 2), "p99_ms": round(pick(99), 2), "max_ms": round(samples[-1], 2)}
+
+def _timed(fn, repeat):
+    fn()  # 预热：建立池连接、解析语句
+    elapsed = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed.append((time.perf_counter() - start) * 1000)
+    return _percentiles(elapsed)
+
+def run(user_id: int, repeat: int):
+    create_pool()
+    executor = ThreadPoolExecutor(max_workers=4)
+    try:
+        # 两种方式结果一致
+        summary = get_statistics_summary(user_id)
+        daily, mastery, weekly, categories = _four_calls(user_id)
+        assert summary.daily == daily and summary.mastery == mastery
+        assert summary.weekly == weekly and summary.categories == categories
+        return {
+            "user_id": user_id,
+            "repeat": repeat,
+            "rows": {"daily": len(daily), "mastery": len(mastery), "weekly": len(weekly), "categories": len(categories)},
+            "four_calls_sequential": _timed(lambda: _four_calls(user_id), repeat),
+            "four_calls_parallel": _timed(lambda: _four_calls_parallel(user_id, executor), repeat),
+            "summary": _timed(lambda: get_statistics_summary(user_id), repeat),
+        }
+    finally:
+        executor.shutdown()
+        close_pool()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    print(json.dumps(run(args.user_id, args.repeat), ensure_ascii=False, indent=2))
@@ -2,6 +2,8 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Optional
 from db_config import get_oracle_conn
+from user_cache import dashboard_cache
+from fast_response import fast_json
 import datetime
 
 router = APIRouter()
@@ -22,16 +24,16 @@ def get_checkin_logs(user_id: int, limit: int = 7):
         sql = f'SELECT checkin_id, user_id, checkin_date, word_count, study_duration, accuracy_rate FROM CheckInLog WHERE user_id=:1 ORDER BY checkin_date DESC FETCH FIRST {int(limit)} ROWS ONLY'
         cursor.execute(sql, (user_id,))
         logs = [
-            CheckInLog(
-                checkin_id=row[0],
-                user_id=row[1],
-                checkin_date=row[2].strftime('%Y-%m-%d'),
-                word_count=row[3],
-                study_duration=row[4],
-                accuracy_rate=float(row[5])
-            ) for row in cursor.fetchall()
+            {
+                "checkin_id": row[0],
+                "user_id": row[1],
+                "checkin_date": row[2].strftime('%Y-%m-%d'),
+                "word_count": row[3],
+                "study_duration": row[4],
+                "accuracy_rate": float(row[5])
+            } for row in cursor.fetchall()
         ]
-        return logs
+        return fast_json(logs, List[CheckInLog])
     finally:
         cursor.close()
         conn.close()
@@ -62,6 +64,7 @@ def checkin_today(data: CheckInRequest):
             (data.user_id, data.word_count, data.study_duration, data.accuracy_rate, checkin_id_var)
         )
         conn.commit()
+        dashboard_cache.invalidate([data.user_id])
         return CheckInLog(
             checkin_id=checkin_id_var.getvalue()[0] if isinstance(checkin_id_var.getvalue(), list) else checkin_id_var.getvalue(),
             user_id=data.user_id,
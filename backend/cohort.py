@@ -0,0 +1,210 @@
+import datetime
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel
+from typing import List, Optional
+from snapshot import snapshot, SnapshotMissing, DELETED
+from users import require_admin
+
+router = APIRouter()
+
+# 一次统计最多指定的学生数
+COHORT_MAX_USERS = 5000
+
+class CohortWord(BaseModel):
+    word_id: int
+    word: str
+    list_id: Optional[int]
+    attempts: int
+    accuracy: float
+    students: int
+    wrong_count: int
+    avg_memory_strength: Optional[float]
+    overdue: int
+
+class CohortList(BaseModel):
+    list_id: Optional[int]
+    list_name: str
+    attempts: int
+    accuracy: float
+    students: int
+    words_studied: int
+
+class CohortDay(BaseModel):
+    date: str
+    attempts: int
+    accuracy: float
+    students: int
+
+class CohortWordsResponse(BaseModel):
+    as_of: str
+    students: int
+    words: List[CohortWord]
+
+class CohortListsResponse(BaseModel):
+    as_of: str
+    students: int
+    lists: List[CohortList]
+
+class CohortDailyResponse(BaseModel):
+    as_of: str
+    students: int
+    days: List[CohortDay]
+
+def _today() -> int:
+    return (datetime.date.today() - datetime.date(1970, 1, 1)).days
+
+def _lookup(keys, ids):
+    # 原始 id -> 在 keys 中的下标，不存在的为 -1
+    ids = np.asarray(ids, dtype=np.int64)
+    if not len(keys):
+        return np.full(len(ids), -1)
+    order = np.argsort(keys, kind="stable")
+    pos = np.minimum(np.searchsorted(keys[order], ids), len(keys) - 1)
+    return np.where(keys[order][pos] == ids, order[pos], -1)
+
+class _Cohort:
+    # 把筛选条件（学生、词表、天数）转换成按编码索引的布尔掩码，逐个分片计算后累加
+    def __init__(self, data, user_ids, list_id, days):
+        self.data = data
+        alive = np.asarray(data["user_alive"])
+        if user_ids:
+            codes = _lookup(data["users"], user_ids)
+            self.user_mask = np.zeros(len(data["users"]), dtype=bool)
+            self.user_mask[codes[codes >= 0]] = True
+            self.user_mask &= alive
+        else:
+            self.user_mask = alive.copy()
+        word_list = np.asarray(data["word_list"])
+        self.word_mask = word_list != DELETED if list_id is None else word_list == list_id
+        self.max_day = _today()
+        self.min_day = self.max_day - days + 1
+
+    @property
+    def students(self):
+        return int(self.user_mask.sum())
+
+    def logs(self):
+        for part in self.data["studylog"]:
+            user, word, day = part["user"], part["word"], part["day"]
+            keep = self.user_mask[user] & self.word_mask[word] & (day >= self.min_day) & (day <= self.max_day)
+            yield user[keep], word[keep], day[keep], part["status"][keep]
+
+    def rows(self, table):
+        columns = self.data[table]
+        keep = self.user_mask[columns["user"]] & self.word_mask[columns["word"]]
+        return {name: values[keep] for name, values in columns.items()}
+
+def _group(groups, size):
+    # 按组累加作答次数、known 次数和不同学生数；groups 为 (组编码, 学生编码, status) 序列
+    attempts = np.zeros(size, dtype=np.int64)
+    known = np.zeros(size, dtype=np.int64)
+    pairs = []
+    for group, user, status in groups:
+        attempts += np.bincount(group, minlength=size)
+        known += np.bincount(group[status == 0], minlength=size)
+        pairs.append(np.unique(group.astype(np.int64) << 32 | user.astype(np.int64)))
+    pairs = np.unique(np.concatenate(pairs)) if pairs else np.empty(0, dtype=np.int64)
+    students = np.bincount((pairs >> 32).astype(np.int64), minlength=size)
+    accuracy = np.divide(known * 100.0, attempts, out=np.zeros(size), where=attempts > 0)
+    return attempts, accuracy, students
+
+def cohort_words(data, user_ids=None, list_id=None, days=30, limit=50):
+    # 每个单词的作答次数、正确率、学过的学生数、错题次数、平均记忆强度和逾期复习数，按正确率从低到高
+    cohort = _Cohort(data, user_ids, list_id, days)
+    size = len(data["words"])
+    attempts, accuracy, students = _group(((w, u, s) for u, w, _, s in cohort.logs()), size)
+    review = cohort.rows("review")
+    strength = review["memory_strength"]
+    has_strength = ~np.isnan(strength)
+    strength_sum = np.bincount(review["word"][has_strength], weights=strength[has_strength], minlength=size)
+    strength_count = np.bincount(review["word"][has_strength], minlength=size)
+    overdue = np.bincount(review["word"][review["review_day"] < _today()], minlength=size)
+    wrong = cohort.rows("wrong")
+    wrong_count = np.bincount(wrong["word"], weights=wrong["wrong_count"], minlength=size)
+    studied = np.nonzero(attempts)[0]
+    top = studied[np.lexsort((-attempts[studied], accuracy[studied]))][:limit]
+    word_list = data["word_list"]
+    return CohortWordsResponse(as_of=data["refreshed_at"], students=cohort.students, words=[
+        CohortWord(
+            word_id=int(data["words"][i]),
+            word=str(data["word_text"][i]),
+            list_id=int(word_list[i]) if word_list[i] >= 0 else None,
+            attempts=int(attempts[i]),
+            accuracy=round(float(accuracy[i]), 2),
+            students=int(students[i]),
+            wrong_count=int(wrong_count[i]),
+            avg_memory_strength=round(float(strength_sum[i] / strength_count[i]), 2) if strength_count[i] else None,
+            overdue=int(overdue[i]),
+        )
+        for i in top
+    ])
+
+def cohort_lists(data, user_ids=None, list_id=None, days=30):
+    # 每个词表的作答次数、正确率、学生数和学过的不同单词数
+    cohort = _Cohort(data, user_ids, list_id, days)
+    lists, word_group = np.unique(np.asarray(data["word_list"]), return_inverse=True)
+    size = len(lists)
+    logs = list(cohort.logs())
+    attempts, accuracy, students = _group(((word_group[w], u, s) for u, w, _, s in logs), size)
+    studied_words = np.unique(np.concatenate([w for _, w, _, _ in logs])) if logs else np.empty(0, dtype=np.int32)
+    words_studied = np.bincount(word_group[studied_words], minlength=size)
+    names = dict(zip(np.asarray(data["list_ids"]).tolist(), np.asarray(data["list_names"]).tolist()))
+    return CohortListsResponse(as_of=data["refreshed_at"], students=cohort.students, lists=[
+        CohortList(
+            list_id=int(lists[i]) if lists[i] >= 0 else None,
+            list_name=names.get(int(lists[i]), "未分类"),
+            attempts=int(attempts[i]),
+            accuracy=round(float(accuracy[i]), 2),
+            students=int(students[i]),
+            words_studied=int(words_studied[i]),
+        )
+        for i in np.nonzero(attempts)[0] if lists[i] != DELETED
+    ])
+
+def cohort_daily(data, user_ids=None, list_id=None, days=30):
+    # 每天的作答次数、正确率和活跃学生数
+    cohort = _Cohort(data, user_ids, list_id, days)
+    attempts, accuracy, students = _group(((d - cohort.min_day, u, s) for u, _, d, s in cohort.logs()), days)
+    epoch = datetime.date(1970, 1, 1)
+    return CohortDailyResponse(as_of=data["refreshed_at"], students=cohort.students, days=[
+        CohortDay(
+            date=(epoch + datetime.timedelta(days=cohort.min_day + int(i))).strftime('%Y-%m-%d'),
+            attempts=int(attempts[i]),
+            accuracy=round(float(accuracy[i]), 2),
+            students=int(students[i]),
+        )
+        for i in np.nonzero(attempts)[0]
+    ])
+
+def _cohort_request(user_ids: Optional[str], days: int):
+    # 只有管理员可以调用（见 users.require_admin）；统计本身只读快照，不查询业务表
+    try:
+        ids = [int(i) for i in user_ids.split(',') if i.strip()] if user_ids else []
+    except ValueError:
+        raise HTTPException(status_code=400, detail="user_ids 格式错误")
+    if len(ids) > COHORT_MAX_USERS:
+        raise HTTPException(status_code=400, detail=f"一次最多统计 {COHORT_MAX_USERS} 名学生")
+    if days < 1:
+        raise HTTPException(status_code=400, detail="days 必须大于 0")
+    try:
+        return snapshot.load(), ids
+    except SnapshotMissing:
+        raise HTTPException(status_code=503, detail="分析快照尚未生成，请先运行 python snapshot.py")
+
+_USER_IDS = Query(None, description="逗号分隔的学生 ID（一个班级），不传则为全部学生")
+
+@router.get("/statistics/cohort/words", response_model=CohortWordsResponse, dependencies=[Depends(require_admin)])
+def get_cohort_words(user_ids: Optional[str] = _USER_IDS, list_id: Optional[int] = None, days: int = 30, limit: int = 50):
+    data, ids = _cohort_request(user_ids, days)
+    return cohort_words(data, ids, list_id, days, limit)
+
+@router.get("/statistics/cohort/lists", response_model=CohortListsResponse, dependencies=[Depends(require_admin)])
+def get_cohort_lists(user_ids: Optional[str] = _USER_IDS, list_id: Optional[int] = None, days: int = 30):
+    data, ids = _cohort_request(user_ids, days)
+    return cohort_lists(data, ids, list_id, days)
+
+@router.get("/statistics/cohort/daily", response_model=CohortDailyResponse, dependencies=[Depends(require_admin)])
+def get_cohort_daily(user_ids: Optional[str] = _USER_IDS, list_id: Optional[int] = None, days: int = 30):
+    data, ids = _cohort_request(user_ids, days)
+    return cohort_daily(data, ids, list_id, days)
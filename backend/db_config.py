@@ -1,7 +1,195 @@
+import os
 import oracledb
+from fastapi import HTTPException
+from metrics import driver_callbacks
+from query_log import timed
+
+# Navicat配置：host=localhost, port=1521, service_name=FREE, username=system, password=111111
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "port": int(os.getenv("DB_PORT", "1521")),
+    "service_name": os.getenv("DB_SERVICE_NAME", "FREE"),
+    "user": os.getenv("DB_USER", "system"),
+    "password": os.getenv("DB_PASSWORD", "111111"),
+}
+
+# 连接池配置
+# 每个 worker 同时有同步和异步两个连接池，占用的数据库会话最多为 DB_POOL_MAX + DB_ASYNC_POOL_MAX，
+# 默认两者各 10，合计与原来单个连接池的 20 相同；部署多个 worker 时按 worker 数乘以该合计估算会话数
+POOL_CONFIG = {
+    "min": int(os.getenv("DB_POOL_MIN", "2")),
+    "max": int(os.getenv("DB_POOL_MAX", "10")),
+    "increment": int(os.getenv("DB_POOL_INCREMENT", "2")),
+    # 连接空闲超过该秒数后，取出时先 ping 一次；0 表示每次取出都 ping，负数表示不 ping
+    "ping_interval": int(os.getenv("DB_POOL_PING_INTERVAL", "60")),
+    # 取连接的最长等待时间（毫秒），超时返回 503 而不是无限排队
+    "wait_timeout": int(os.getenv("DB_POOL_WAIT_TIMEOUT", "5000")),
+    # 空闲连接超过该秒数后被回收
+    "timeout": int(os.getenv("DB_POOL_IDLE_TIMEOUT", "300")),
+}
+
+# asyncio 连接池的大小单独配置，其余设置与同步连接池相同
+ASYNC_POOL_CONFIG = dict(
+    POOL_CONFIG,
+    min=int(os.getenv("DB_ASYNC_POOL_MIN", "1")),
+    max=int(os.getenv("DB_ASYNC_POOL_MAX", "10")),
+    increment=int(os.getenv("DB_ASYNC_POOL_INCREMENT", "1")),
+)
+
+# CLOB 列直接以 str 返回，不再返回 LOB 定位符（每读一个定位符都要多一次网络往返）
+# 设置 DB_FETCH_LOBS=1 可恢复 LOB 定位符
+oracledb.defaults.fetch_lobs = os.getenv("DB_FETCH_LOBS", "0") == "1"
+
+# 按请求统计网络往返次数、取回行数和等待数据库的时间；python-oracledb 较旧的版本没有这两个回调，不统计
+_CALLBACKS = driver_callbacks() if hasattr(oracledb.ConnectParams, "round_trip_callback") else {}
+
+# 按查询类型调整每次网络往返取回的行数：
+# single 为按主键查一行，prefetchrows=2 让 fetchone 与"没有更多行"在同一次往返中完成
+# list 为批量列表查询，一次取回更多行以减少往返次数
+FETCH_PROFILES = {
+    "single": {"arraysize": 1, "prefetchrows": 2},
+    "list": {
+        "arraysize": int(os.getenv("DB_LIST_ARRAYSIZE", "500")),
+        "prefetchrows": int(os.getenv("DB_LIST_PREFETCHROWS", "500")),
+    },
+}
+
+_pool = None
+_async_pool = None
+
+def _make_dsn():
+    return oracledb.makedsn(DB_CONFIG["host"], DB_CONFIG["port"], service_name=DB_CONFIG["service_name"])
+
+def create_pool():
+    global _pool
+    if _pool is None:
+        _pool = oracledb.create_pool(
+            user=DB_CONFIG["user"],
+            password=DB_CONFIG["password"],
+            dsn=_make_dsn(),
+            min=POOL_CONFIG["min"],
+            max=POOL_CONFIG["max"],
+            increment=POOL_CONFIG["increment"],
+            ping_interval=POOL_CONFIG["ping_interval"],
+            wait_timeout=POOL_CONFIG["wait_timeout"],
+            timeout=POOL_CONFIG["timeout"],
+            getmode=oracledb.POOL_GETMODE_TIMEDWAIT,
+            **_CALLBACKS,
+        )
+    return _pool
+
+def create_async_pool():
+    # asyncio 连接池（Thin 模式），供已改为 async def 的接口使用
+    global _async_pool
+    if _async_pool is None:
+        _async_pool = oracledb.create_pool_async(
+            user=DB_CONFIG["user"],
+            password=DB_CONFIG["password"],
+            dsn=_make_dsn(),
+            min=ASYNC_POOL_CONFIG["min"],
+            max=ASYNC_POOL_CONFIG["max"],
+            increment=ASYNC_POOL_CONFIG["increment"],
+            ping_interval=ASYNC_POOL_CONFIG["ping_interval"],
+            wait_timeout=ASYNC_POOL_CONFIG["wait_timeout"],
+            timeout=ASYNC_POOL_CONFIG["timeout"],
+            getmode=oracledb.POOL_GETMODE_TIMEDWAIT,
+            **_CALLBACKS,
+        )
+    return _async_pool
+
+def close_pool():
+    global _pool
+    if _pool is not None:
+        _pool.close(force=True)
+        _pool = None
+
+async def close_async_pool():
+    global _async_pool
+    if _async_pool is not None:
+        await _async_pool.close(force=True)
+        _async_pool = None
+
+def get_pool():
+    return _pool
+
+def _stats_of(pool):
+    if pool is None:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "min": pool.min,
+        "max": pool.max,
+        "increment": pool.increment,
+        "opened": pool.opened,
+        "busy": pool.busy,
+        "idle": pool.opened - pool.busy,
+        "ping_interval": pool.ping_interval,
+        "wait_timeout": pool.wait_timeout,
+        "timeout": pool.timeout,
+    }
+
+def pool_stats():
+    stats = _stats_of(_pool)
+    stats["async"] = _stats_of(_async_pool)
+    return stats
+
+def _raise_if_pool_timeout(e):
+    # 等待超时（DPY-4005 / ORA-24457）时返回 503，让客户端稍后重试
+    error = e.args[0] if e.args else None
+    full_code = getattr(error, "full_code", "")
+    if full_code in ("DPY-4005", "ORA-24457"):
+        raise HTTPException(status_code=503, detail="数据库繁忙，请稍后重试")
 
 def get_oracle_conn():
-    # Navicat配置：host=localhost, port=1521, service_name=FREE, username=system, password=111111
-    dsn = oracledb.makedsn('localhost', 1521, service_name='FREE')
-    conn = oracledb.connect(user='system', password='111111', dsn=dsn)
-    return conn 
\ No newline at end of file
+    # 连接池已创建时从池中取连接，conn.close() 会把连接归还给池；
+    # 未创建连接池时（如独立脚本）退回到单独建立连接。返回的连接按语句指纹统计耗时、记录慢查询（见 query_log）
+    if _pool is None:
+        return timed(oracledb.connect(user=DB_CONFIG["user"], password=DB_CONFIG["password"], dsn=_make_dsn(), **_CALLBACKS))
+    try:
+        return timed(_pool.acquire())
+    except oracledb.DatabaseError as e:
+        _raise_if_pool_timeout(e)
+        raise
+
+async def get_async_conn():
+    # 与 get_oracle_conn 对应的异步版本，用完后需 await conn.close()
+    if _async_pool is None:
+        return timed(await oracledb.connect_async(user=DB_CONFIG["user"], password=DB_CONFIG["password"], dsn=_make_dsn(), **_CALLBACKS), is_async=True)
+    try:
+        return timed(await _async_pool.acquire(), is_async=True)
+    except oracledb.DatabaseError as e:
+        _raise_if_pool_timeout(e)
+        raise
+
+def db_now(conn):
+    # 数据库服务器的当前时间（与 SYSDATE 同一时钟，不带时区）。StudyLog.study_time 等按天汇总的时间都取这个时钟，
+    # 与仪表盘、统计查询里的 TRUNC(SYSDATE) 划分的日期一致
+    cursor = conn.cursor()
+    try:
+        cursor.execute('SELECT CAST(SYSTIMESTAMP AS TIMESTAMP) FROM dual')
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+
+def tune_cursor(cursor, profile):
+    # 按 FETCH_PROFILES 设置游标的 arraysize/prefetchrows，返回游标本身
+    settings = FETCH_PROFILES[profile]
+    cursor.arraysize = settings["arraysize"]
+    cursor.prefetchrows = settings["prefetchrows"]
+    return cursor
+
+def get_db():
+    # FastAPI 依赖：请求期间持有一个池连接，请求结束后归还
+    conn = get_oracle_conn()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+async def get_async_db():
+    # 异步接口使用的 FastAPI 依赖
+    conn = await get_async_conn()
+    try:
+        yield conn
+    finally:
+        await conn.close()
@@ -0,0 +1,55 @@
+import decimal
+import logging
+import os
+from functools import lru_cache
+import orjson
+from fastapi.exceptions import ResponseValidationError
+from fastapi.responses import Response
+from pydantic import TypeAdapter, ValidationError
+
+logger = logging.getLogger(__name__)
+
+# 列表类接口的快速序列化配置，默认关闭，设置 FAST_RESPONSE_ENABLED=1 开启
+FAST_RESPONSE_CONFIG = {
+    "enabled": os.getenv("FAST_RESPONSE_ENABLED", "0") == "1",
+    # 调试模式：快速路径返回前仍按 response_model 校验一遍，字段缺失或类型不符直接报错
+    "validate": os.getenv("FAST_RESPONSE_VALIDATE", "0") == "1",
+}
+
+def _default(value):
+    # orjson 不认识 Decimal（Oracle 的 NUMBER 在开启 fetch_decimals 时返回），按 float 输出
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    raise TypeError
+
+def encode(content) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return encode(content)
+
+@lru_cache(maxsize=None)
+def _adapter(model):
+    return TypeAdapter(model)
+
+def check(content, model, config=FAST_RESPONSE_CONFIG):
+    # 调试模式下按 model 校验直接组装的响应数据
+    if not config["validate"]:
+        return
+    try:
+        _adapter(model).validate_python(content)
+    except ValidationError as e:
+        logger.error("fast response does not match %s: %s", model, e)
+        raise ResponseValidationError(errors=e.errors(), body=content)
+
+def fast_json(content, model, config=FAST_RESPONSE_CONFIG):
+    # content 为按 model 字段名直接由查询结果组装的 dict / list，不再逐行创建 pydantic 对象。
+    # 开启时返回 orjson 编码的响应，FastAPI 不再按 response_model 校验和序列化（接口文档仍使用 response_model）；
+    # 关闭时原样返回，由 FastAPI 按 response_model 校验，结果与快速路径相同
+    if not config["enabled"]:
+        return content
+    check(content, model, config)
+    return FastJSONResponse(content)
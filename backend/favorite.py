@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Optional
 from db_config import get_oracle_conn
+from fast_response import fast_json
 
 router = APIRouter()
 
@@ -18,14 +19,14 @@ def get_favorite(user_id: int):
     try:
         cursor.execute('SELECT fav_id, user_id, word_id, fav_time FROM FavoriteWord WHERE user_id=:1 ORDER BY fav_time DESC', (user_id,))
         favorites = [
-            FavoriteWord(
-                fav_id=row[0],
-                user_id=row[1],
-                word_id=row[2],
-                fav_time=row[3].strftime('%Y-%m-%dT%H:%M:%S')
-            ) for row in cursor.fetchall()
+            {
+                "fav_id": row[0],
+                "user_id": row[1],
+                "word_id": row[2],
+                "fav_time": row[3].strftime('%Y-%m-%dT%H:%M:%S')
+            } for row in cursor.fetchall()
         ]
-        return favorites
+        return fast_json(favorites, List[FavoriteWord])
     finally:
         cursor.close()
         conn.close()
@@ -0,0 +1,118 @@
+import gzip
+import os
+import tempfile
+from typing import Iterable, Optional
+from fastapi import Request
+from fastapi.responses import Response
+from fast_response import encode, check, fast_json
+from word_cache import VersionBoard
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 词表、单词等目录类接口的 HTTP 条件缓存配置
+HTTP_CACHE_CONFIG = {
+    "enabled": os.getenv("HTTP_CACHE_ENABLED", "1") == "1",
+    # 0 表示浏览器每次都带 If-None-Match 向服务器验证（no-cache），未变化时返回 304；
+    # 大于 0 时在该秒数内直接使用本地副本，修改后最多延迟这么久才能看到
+    "max_age": int(os.getenv("HTTP_CACHE_MAX_AGE", "0")),
+    # 数据在接口之外被修改（直接执行 SQL 导入）或响应格式变化时，改变该值让已发出的 ETag 全部失效
+    "etag_salt": os.getenv("HTTP_CACHE_ETAG_SALT", "1"),
+    # 响应体超过该字节数才压缩；安装 brotli 包后优先使用 br，否则使用 gzip
+    "compress_min_size": int(os.getenv("HTTP_COMPRESS_MIN_SIZE", "1024")),
+    "gzip_level": int(os.getenv("HTTP_GZIP_LEVEL", "6")),
+    "brotli_quality": int(os.getenv("HTTP_BROTLI_QUALITY", "5")),
+    # 同一主机上各 worker 共享的按 list_id 分桶的版本戳文件，最后一个槽位是全部词表的版本戳
+    "version_file": os.getenv("HTTP_CACHE_VERSION_FILE", os.path.join(tempfile.gettempdir(), "dancisystem_list_versions.bin")),
+    "version_buckets": int(os.getenv("HTTP_CACHE_VERSION_BUCKETS", "4096")),
+}
+
+list_versions = VersionBoard(HTTP_CACHE_CONFIG["version_file"], HTTP_CACHE_CONFIG["version_buckets"])
+
+def touch_lists(list_ids: Iterable[Optional[int]]):
+    # 词表信息或词表中的单词变化并提交后调用：更新这些词表和全部词表的版本戳
+    for list_id in set(list_ids):
+        if list_id is not None:
+            list_versions.bump(list_id)
+    list_versions.bump_catalogue()
+
+def list_version(list_id: Optional[int]) -> int:
+    # 未指定词表时返回全部词表的版本戳；查询数据库之前读取
+    return list_versions.current(list_id) if list_id else list_versions.catalogue()
+
+def make_etag(*parts) -> str:
+    # 弱 ETag：同一内容的压缩和未压缩版本共用
+    return 'W/"' + '-'.join(str(p) for p in (HTTP_CACHE_CONFIG["etag_salt"], *parts)) + '"'
+
+def _matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag[2:]
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+def _headers(etag: str):
+    max_age = HTTP_CACHE_CONFIG["max_age"]
+    return {
+        "ETag": etag,
+        # 带 user_id 的词表列表包含私有词表，只允许浏览器缓存，不允许共享缓存
+        "Cache-Control": f"private, max-age={max_age}, must-revalidate" if max_age > 0 else "private, no-cache",
+        "Vary": "Accept-Encoding",
+    }
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    # If-None-Match 与当前版本一致时直接返回 304，不访问数据库
+    if HTTP_CACHE_CONFIG["enabled"] and _matches(request, etag):
+        return Response(status_code=304, headers=_headers(etag))
+    return None
+
+def _accepted(header: str):
+    # 解析 Accept-Encoding，忽略 q=0 的编码
+    result = set()
+    for item in header.split(","):
+        name, _, params = item.partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            result.add(name.strip().lower())
+    return result
+
+def _compress(request: Request, body: bytes):
+    if len(body) < HTTP_CACHE_CONFIG["compress_min_size"]:
+        return body, None
+    accepted = _accepted(request.headers.get("accept-encoding", ""))
+    if brotli is not None and ("br" in accepted or "*" in accepted):
+        return brotli.compress(body, quality=HTTP_CACHE_CONFIG["brotli_quality"]), "br"
+    if "gzip" in accepted or "*" in accepted:
+        return gzip.compress(body, compresslevel=HTTP_CACHE_CONFIG["gzip_level"]), "gzip"
+    return body, None
+
+def cached_json(request: Request, content, etag: str, model=None):
+    # 带 ETag、Cache-Control 的 JSON 响应，按 Accept-Encoding 压缩；关闭时按原来的方式返回
+    if not HTTP_CACHE_CONFIG["enabled"]:
+        return fast_json(content, model) if model is not None else content
+    if model is not None:
+        check(content, model)
+    body, encoding = _compress(request, encode(content))
+    headers = _headers(etag)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def stats():
+    return {
+        "enabled": HTTP_CACHE_CONFIG["enabled"],
+        "max_age": HTTP_CACHE_CONFIG["max_age"],
+        "brotli": brotli is not None,
+        "catalogue_version": list_versions.catalogue(),
+    }
@@ -0,0 +1,118 @@
+from typing import Dict, Iterable, List, Tuple
+from db_config import tune_cursor
+
+# Oracle 的 IN 列表最多 1000 个表达式，按块拆分
+CHUNK_SIZE = 1000
+
+def _chunks(ids: List[int]):
+    for i in range(0, len(ids), CHUNK_SIZE):
+        yield ids[i:i + CHUNK_SIZE]
+
+def _in_binds(chunk: List[int], prefix: str = 'id') -> Tuple[str, Dict[str, int]]:
+    names = [f'{prefix}{i}' for i in range(len(chunk))]
+    return ', '.join(':' + n for n in names), dict(zip(names, chunk))
+
+def _text(value):
+    # 默认 fetch_lobs=False，CLOB 已是 str；开启 DB_FETCH_LOBS 时同步连接下 str() 会读出 LOB 内容
+    return str(value) if value is not None else ''
+
+async def _text_async(value):
+    # 开启 DB_FETCH_LOBS 时异步连接下 CLOB 以 AsyncLOB 返回，需要 await 读取
+    if value is None:
+        return ''
+    if hasattr(value, 'read'):
+        return await value.read()
+    return str(value)
+
+def _unique(ids: Iterable[int]) -> List[int]:
+    return list(dict.fromkeys(i for i in ids if i is not None))
+
+_WORD_SQL = 'SELECT word_id, word, list_id FROM Word WHERE word_id IN ({})'
+_TRANSLATION_SQL = 'SELECT word_id, translation, word_type FROM WordTranslation WHERE word_id IN ({}) ORDER BY word_id, word_type, translation_id'
+_PHRASE_SQL = 'SELECT word_id, phrase, translation FROM WordPhrase WHERE word_id IN ({}) ORDER BY word_id, phrase_id'
+_DIFFICULTY_SQL = 'SELECT list_id, difficulty FROM WordList WHERE list_id IN ({})'
+
+def _assemble(rows, translations, phrases, difficulties=None) -> List[dict]:
+    words = []
+    for word_id, word, list_id in rows:
+        item = {
+            "word_id": word_id,
+            "word": word,
+            "translations": translations.get(word_id, []),
+            "phrases": phrases.get(word_id, []),
+            "list_id": list_id,
+        }
+        if difficulties is not None:
+            item["difficulty"] = difficulties.get(list_id) or ''
+        words.append(item)
+    return words
+
+def hydrate_words(cursor, rows, with_difficulty: bool = False) -> List[dict]:
+    # rows 为 (word_id, word, list_id) 序列，按原顺序返回带翻译、短语（及词表难度）的单词
+    rows = list(rows)
+    word_ids = _unique(r[0] for r in rows)
+    translations: Dict[int, List[dict]] = {}
+    phrases: Dict[int, List[dict]] = {}
+    tune_cursor(cursor, "list")
+    for chunk in _chunks(word_ids):
+        placeholders, binds = _in_binds(chunk)
+        cursor.execute(_TRANSLATION_SQL.format(placeholders), binds)
+        for word_id, t, ty in cursor.fetchall():
+            translations.setdefault(word_id, []).append({"translation": _text(t), "type": ty if ty is not None else ''})
+        cursor.execute(_PHRASE_SQL.format(placeholders), binds)
+        for word_id, p, tr in cursor.fetchall():
+            phrases.setdefault(word_id, []).append({"phrase": _text(p), "translation": _text(tr)})
+    difficulties = None
+    if with_difficulty:
+        difficulties = {}
+        for chunk in _chunks(_unique(r[2] for r in rows)):
+            placeholders, binds = _in_binds(chunk)
+            cursor.execute(_DIFFICULTY_SQL.format(placeholders), binds)
+            difficulties.update((list_id, d) for list_id, d in cursor.fetchall())
+    return _assemble(rows, translations, phrases, difficulties)
+
+def load_words(cursor, word_ids, with_difficulty: bool = False) -> List[dict]:
+    # 按 word_id 批量加载完整单词，返回顺序与传入顺序一致，不存在的 id 被忽略
+    word_ids = _unique(word_ids)
+    found = {}
+    for chunk in _chunks(word_ids):
+        placeholders, binds = _in_binds(chunk)
+        cursor.execute(_WORD_SQL.format(placeholders), binds)
+        for row in cursor.fetchall():
+            found[row[0]] = row
+    return hydrate_words(cursor, [found[i] for i in word_ids if i in found], with_difficulty)
+
+async def hydrate_words_async(cursor, rows, with_difficulty: bool = False) -> List[dict]:
+    # hydrate_words 的异步版本
+    rows = list(rows)
+    word_ids = _unique(r[0] for r in rows)
+    translations: Dict[int, List[dict]] = {}
+    phrases: Dict[int, List[dict]] = {}
+    tune_cursor(cursor, "list")
+    for chunk in _chunks(word_ids):
+        placeholders, binds = _in_binds(chunk)
+        await cursor.execute(_TRANSLATION_SQL.format(placeholders), binds)
+        for word_id, t, ty in await cursor.fetchall():
+            translations.setdefault(word_id, []).append({"translation": await _text_async(t), "type": ty if ty is not None else ''})
+        await cursor.execute(_PHRASE_SQL.format(placeholders), binds)
+        for word_id, p, tr in await cursor.fetchall():
+            phrases.setdefault(word_id, []).append({"phrase": await _text_async(p), "translation": await _text_async(tr)})
+    difficulties = None
+    if with_difficulty:
+        difficulties = {}
+        for chunk in _chunks(_unique(r[2] for r in rows)):
+            placeholders, binds = _in_binds(chunk)
+            await cursor.execute(_DIFFICULTY_SQL.format(placeholders), binds)
+            difficulties.update((list_id, d) for list_id, d in await cursor.fetchall())
+    return _assemble(rows, translations, phrases, difficulties)
+
+async def load_words_async(cursor, word_ids, with_difficulty: bool = False) -> List[dict]:
+    # load_words 的异步版本
+    word_ids = _unique(word_ids)
+    found = {}
+    for chunk in _chunks(word_ids):
+        placeholders, binds = _in_binds(chunk)
+        await cursor.execute(_WORD_SQL.format(placeholders), binds)
+        for row in await cursor.fetchall():
+            found[row[0]] = row
+    return await hydrate_words_async(cursor, [found[i] for i in word_ids if i in found], with_difficulty)
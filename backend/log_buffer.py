@@ -0,0 +1,346 @@
+import datetime
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import List, Optional
+from db_config import get_oracle_conn, db_now
+from study_rollup import apply_study_logs
+from user_cache import dashboard_cache
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# 学习记录写缓冲配置，默认关闭，设置 STUDYLOG_BUFFER_ENABLED=1 开启
+LOG_BUFFER_CONFIG = {
+    "enabled": os.getenv("STUDYLOG_BUFFER_ENABLED", "0") == "1",
+    # 内存队列上限，写满后新请求最多等待 put_timeout 秒，仍然满则返回 503
+    "max_queue": int(os.getenv("STUDYLOG_BUFFER_MAX_QUEUE", "10000")),
+    "put_timeout": float(os.getenv("STUDYLOG_BUFFER_PUT_TIMEOUT", "1.0")),
+    # 攒够 batch_size 条或距上次写入超过 flush_interval 毫秒时写库
+    "batch_size": int(os.getenv("STUDYLOG_BUFFER_BATCH_SIZE", "500")),
+    "flush_interval": int(os.getenv("STUDYLOG_BUFFER_FLUSH_INTERVAL", "200")),
+    # 落盘文件目录；fsync=1 时请求返回前记录已同步到磁盘，进程或机器崩溃都不丢记录（并发请求合并为一次 fsync）
+    "spool_dir": os.getenv("STUDYLOG_BUFFER_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "dancisystem_studylog_spool")),
+    "fsync": os.getenv("STUDYLOG_BUFFER_FSYNC", "1") == "1",
+}
+
+STUDY_STATUSES = ("known", "unknown", "learning")
+
+_INSERT_SQL = 'INSERT INTO StudyLog (user_id, word_id, study_time, status) VALUES (:1, :2, :3, :4)'
+
+class BufferFull(Exception):
+    pass
+
+def insert_logs(conn, rows) -> int:
+    # rows 为 (user_id, word_id, study_time, status)；外键不存在等单行错误只跳过该行，不影响整批
+    # 写入成功的行在同一事务中累加到每日汇总
+    cursor = conn.cursor()
+    try:
+        cursor.executemany(_INSERT_SQL, rows, batcherrors=True)
+        errors = cursor.getbatcherrors()
+        for error in errors:
+            logger.warning("study log row %s rejected: %s", error.offset, error.message)
+        rejected = {error.offset for error in errors}
+        apply_study_logs(cursor, [row for i, row in enumerate(rows) if i not in rejected])
+        return len(rows) - len(errors)
+    finally:
+        cursor.close()
+
+class StudyLogBuffer:
+    # 写后缓冲：记录先追加到本进程的落盘文件并放入内存队列，立即返回；
+    # 后台线程按批量或时间间隔用 executemany 写库，提交成功后才删除对应的落盘文件。
+    # 进程崩溃后残留的落盘文件在下次启动时重放（至少一次：提交后、删除文件前崩溃会重复写入这一批）。
+    # 每个落盘文件在删除前一直由本进程持有 flock，进程退出后锁自动释放，重放时只处理拿得到锁的文件。
+    def __init__(self, config=LOG_BUFFER_CONFIG):
+        self.config = config
+        self.enabled = config["enabled"]
+        self._queue = deque()
+        self._cond = threading.Condition()
+        # 与 _cond 共用一把锁，只用于唤醒等待 fsync 的请求，不惊动写库线程
+        self._sync_done = threading.Condition(self._cond)
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._segment = None
+        self._segment_path = None
+        self._sequence = 0
+        # 落盘文件路径 -> 持有 flock 的文件描述符，文件删除后关闭
+        self._segment_locks = {}
+        # 组提交：已追加与已 fsync 的批次序号，同一时刻只有一个请求在 fsync，其余等待它完成
+        self._appended = 0
+        self._synced = 0
+        self._syncing = False
+        # 数据库时钟减去本机时钟；记录时间按数据库时钟，put 时用本机时间加上该差值，不必每次访问数据库
+        self._clock_offset = datetime.timedelta(0)
+        # 写库失败的批次连同其落盘文件保留下来，下次优先重试
+        self._retry_rows: List[tuple] = []
+        self._retry_segments: List[str] = []
+        self.accepted = 0
+        self.flushed = 0
+        self.rejected = 0
+        self.flushes = 0
+        self.failures = 0
+        self.replayed = 0
+        self.full = 0
+        self.syncs = 0
+
+    def _open_segment(self):
+        self._sequence += 1
+        self._segment_path = os.path.join(self.config["spool_dir"], f"studylog-{os.getpid()}-{int(time.time() * 1000)}-{self._sequence}.spool")
+        self._segment = open(self._segment_path, "a", encoding="utf-8")
+        fd = os.open(self._segment_path, os.O_RDONLY)
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        self._segment_locks[self._segment_path] = fd
+
+    def _remove_segment(self, path):
+        # 先删除再释放锁，重放方拿到锁后能看出文件已被删除
+        os.remove(path)
+        fd = self._segment_locks.pop(path, None)
+        if fd is not None:
+            os.close(fd)
+
+    def _rotate(self) -> Optional[str]:
+        # 关闭当前落盘文件并换一个新的，返回旧文件路径（没有写入过则直接删除）；
+        # 还没有 fsync 的追加在这里一起同步，等待中的请求随之返回
+        path = self._segment_path
+        if self.config["fsync"] and self._synced < self._appended:
+            os.fsync(self._segment.fileno())
+            self._synced = self._appended
+            self.syncs += 1
+            self._sync_done.notify_all()
+        self._segment.close()
+        self._open_segment()
+        if os.path.getsize(path) == 0:
+            self._remove_segment(path)
+            return None
+        return path
+
+    @property
+    def active(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+        os.makedirs(self.config["spool_dir"], exist_ok=True)
+        try:
+            conn = get_oracle_conn()
+            try:
+                self._sync_clock(conn)
+            finally:
+                conn.close()
+        except Exception:
+            # 数据库暂时不可用时先按本机时钟记录，第一次写库时校准
+            logger.exception("study log buffer could not read the database clock")
+        self.replay()
+        self._stopping = False
+        self._open_segment()
+        self._thread = threading.Thread(target=self._run, name="studylog-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        # 关闭时把队列中剩余的记录写完
+        if self._thread is None:
+            return
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._thread = None
+        try:
+            self.flush()
+        except Exception:
+            # 落盘文件保留，下次启动时重放
+            logger.exception("study log flush on shutdown failed")
+        self._segment.close()
+        if os.path.exists(self._segment_path) and os.path.getsize(self._segment_path) == 0:
+            self._remove_segment(self._segment_path)
+        # 没写进库的落盘文件释放锁，留给下次启动重放
+        for fd in self._segment_locks.values():
+            os.close(fd)
+        self._segment_locks.clear()
+
+    def put(self, events):
+        # events 为 (user_id, word_id, status) 序列，记录时间取接收时刻（数据库时钟）；队列满时阻塞等待，超时抛出 BufferFull
+        study_time = datetime.datetime.now() + self._clock_offset
+        rows = [(user_id, word_id, study_time, status) for user_id, word_id, status in events]
+        deadline = time.monotonic() + self.config["put_timeout"]
+        with self._cond:
+            while len(self._queue) + len(self._retry_rows) + len(rows) > self.config["max_queue"]:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or len(rows) > self.config["max_queue"]:
+                    self.full += 1
+                    raise BufferFull()
+                self._cond.notify_all()
+                self._cond.wait(remaining)
+            # 先追加到落盘文件再入队；fsync 在锁外进行，确认返回给客户端时记录已经写到磁盘
+            self._segment.write(''.join(
+                json.dumps([r[0], r[1], r[2].strftime('%Y-%m-%dT%H:%M:%S.%f'), r[3]]) + '\n' for r in rows
+            ))
+            self._segment.flush()
+            self._appended += 1
+            sequence = self._appended
+            self._queue.extend(rows)
+            self.accepted += len(rows)
+            if len(self._queue) >= self.config["batch_size"]:
+                self._cond.notify_all()
+        if self.config["fsync"]:
+            self._sync(sequence)
+
+    def _sync(self, sequence: int):
+        # 组提交：没有请求在 fsync 时由当前请求负责，一次同步到目前为止的全部追加；
+        # 否则等待进行中的 fsync 结束，若仍未覆盖自己的追加再接手下一次
+        while True:
+            with self._cond:
+                while self._syncing and self._synced < sequence:
+                    self._sync_done.wait()
+                if self._synced >= sequence:
+                    return
+                self._syncing = True
+                target = self._appended
+                # 复制描述符，轮换落盘文件时关闭原文件不影响这次 fsync
+                fd = os.dup(self._segment.fileno())
+            synced = False
+            try:
+                os.fsync(fd)
+                synced = True
+            finally:
+                os.close(fd)
+                # fsync 失败时不推进序号，等待的请求各自重试
+                with self._cond:
+                    self._syncing = False
+                    if synced:
+                        self._synced = max(self._synced, target)
+                        self.syncs += 1
+                    self._sync_done.notify_all()
+
+    def _run(self):
+        interval = self.config["flush_interval"] / 1000
+        while True:
+            with self._cond:
+                if not self._stopping and len(self._queue) < self.config["batch_size"]:
+                    self._cond.wait(interval)
+                if self._stopping:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("study log flush failed")
+                # 数据库不可用时等一个间隔再重试，避免空转
+                with self._cond:
+                    if not self._stopping:
+                        self._cond.wait(interval)
+
+    def flush(self):
+        # 队列与当前落盘文件在同一把锁下一起取出，保证文件里的记录与本批次一致
+        with self._cond:
+            if not self._retry_rows and not self._queue:
+                return
+            if self._queue:
+                self._retry_segments.extend(p for p in [self._rotate()] if p)
+                self._retry_rows.extend(self._queue)
+                self._queue.clear()
+            rows = list(self._retry_rows)
+            segments = list(self._retry_segments)
+        try:
+            written = self._write(rows)
+        except Exception:
+            with self._cond:
+                self.failures += 1
+            raise
+        with self._cond:
+            # 写库期间新的失败批次不会出现（只有一个写入线程），直接清空
+            del self._retry_rows[:len(rows)]
+            del self._retry_segments[:len(segments)]
+            self.flushed += written
+            self.rejected += len(rows) - written
+            self.flushes += 1
+            self._cond.notify_all()
+        for path in segments:
+            self._remove_segment(path)
+
+    def _sync_clock(self, conn):
+        self._clock_offset = db_now(conn) - datetime.datetime.now()
+
+    def _write(self, rows) -> int:
+        conn = get_oracle_conn()
+        try:
+            # 每次写库顺带校准时钟差
+            self._sync_clock(conn)
+            written = 0
+            for i in range(0, len(rows), self.config["batch_size"]):
+                written += insert_logs(conn, rows[i:i + self.config["batch_size"]])
+            # 整批只提交一次
+            conn.commit()
+            dashboard_cache.invalidate(row[0] for row in rows)
+            return written
+        finally:
+            conn.close()
+
+    def replay(self):
+        # 重放已退出进程残留的落盘文件（包括重放到一半的文件）。仍在使用的文件由写入进程持有 flock，
+        # 拿不到锁就跳过；多个 worker 同时启动时也只有拿到锁的一个重放同一个文件。
+        # 没有 fcntl 的平台上无法判断，按单进程部署处理，全部重放
+        for path in sorted(glob.glob(os.path.join(self.config["spool_dir"], "studylog-*"))):
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except OSError:
+                continue
+            try:
+                if fcntl is not None:
+                    try:
+                        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        continue
+                # 打开之后、拿到锁之前原进程可能已写库并删除了文件
+                if os.fstat(fd).st_nlink == 0:
+                    continue
+                self._replay_file(path)
+            finally:
+                os.close(fd)
+
+    def _replay_file(self, path):
+        rows = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    user_id, word_id, study_time, status = json.loads(line)
+                except ValueError:
+                    # 崩溃时写了一半的最后一行
+                    continue
+                rows.append((user_id, word_id, datetime.datetime.strptime(study_time, '%Y-%m-%dT%H:%M:%S.%f'), status))
+        try:
+            written = self._write(rows) if rows else 0
+        except Exception:
+            logger.exception("study log replay failed: %s", path)
+            return
+        self.replayed += written
+        os.remove(path)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "enabled": self.enabled,
+                "queued": len(self._queue),
+                "retrying": len(self._retry_rows),
+                "max_queue": self.config["max_queue"],
+                "accepted": self.accepted,
+                "flushed": self.flushed,
+                "rejected": self.rejected,
+                "flushes": self.flushes,
+                "failures": self.failures,
+                "replayed": self.replayed,
+                "full": self.full,
+                "syncs": self.syncs,
+            }
+
+study_log_buffer = StudyLogBuffer()
@@ -1,7 +1,19 @@
-from fastapi import FastAPI, HTTPException
+import logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Depends
+from fastapi.responses import Response
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
-from db_config import get_oracle_conn
+from db_config import create_pool, close_pool, create_async_pool, close_async_pool, get_db, get_async_conn, get_oracle_conn, pool_stats, tune_cursor
+from word_cache import word_cache
+from user_cache import dashboard_cache
+from http_cache import stats as http_cache_stats
+from query_log import query_log, capture_plan, ORDERS as QUERY_ORDERS
+from metrics import MetricsMiddleware, register_collector, snapshot_writer, render as render_metrics
+from log_buffer import study_log_buffer
+from study_rollup import rebuild_rollup, check_rollup
+from snapshot import snapshot, refresh_snapshot
+from search_index import word_index, translation_index, fuzzy_index, search_indexes, rebuild_indexes
 from fastapi.middleware.cors import CORSMiddleware
 import datetime
 from users import router as users_router
@@ -15,8 +27,33 @@ from checkin import router as checkin_router
 from statistics import router as statistics_router
 from test import router as test_router
 from search import router as search_router
+from cohort import router as cohort_router
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 启动时创建连接池，关闭时释放所有连接
+    create_pool()
+    create_async_pool()
+    # 构建单词和释义搜索索引；数据库暂时不可用时不阻止启动，第一次搜索时在后台构建
+    try:
+        rebuild_indexes()
+    except Exception:
+        logger.exception("search index build at startup failed")
+    # 开启写缓冲时重放残留的落盘文件并启动后台写库线程
+    study_log_buffer.start()
+    # 定期写出本进程的指标，供 /metrics 汇总所有 worker
+    snapshot_writer.start()
+    try:
+        yield
+    finally:
+        snapshot_writer.stop()
+        study_log_buffer.stop()
+        await close_async_pool()
+        close_pool()
+
+app = FastAPI(lifespan=lifespan)
 
 # 允许跨域（开发用）
 app.add_middleware(
@@ -26,6 +63,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# 按路由统计请求耗时、状态码和数据库往返，/metrics 输出
+app.add_middleware(MetricsMiddleware)
 
 # ------------------ 数据模型 ------------------
 class User(BaseModel):
@@ -63,9 +102,8 @@ class DashboardData(BaseModel):
 
 # ------------------ 登录接口 ------------------
 @app.post("/api/login", response_model=LoginResponse)
-def login(data: LoginRequest):
-    conn = get_oracle_conn()
-    cursor = conn.cursor()
+def login(data: LoginRequest, conn=Depends(get_db)):
+    cursor = tune_cursor(conn.cursor(), "single")
     try:
         cursor.execute(
             'SELECT user_id, username, role, email, create_time FROM "User" WHERE username=:username AND password=:password AND role=:role',
@@ -85,56 +123,179 @@ def login(data: LoginRequest):
             return {"success": False, "message": "用户名或密码错误"}
     finally:
         cursor.close()
-        conn.close()
 
 # ------------------ 仪表盘接口 ------------------
+# 每周学习目标
+WEEKLY_GOAL = 200
+
+# 整个仪表盘一条语句、一次往返：第一行为各项计数（标量子查询），其后为最近学习的单词和即将复习的单词
+# totalWords 为学过的不同单词数，WordMastery 每个 (用户, 单词) 一行，与 COUNT(DISTINCT word_id) FROM StudyLog 相同，
+# 前提是已有记录已回填（python study_rollup.py rebuild）；recentWords 仍是最近 5 条学习记录（含重复单词），
+# 按 (user_id, study_time) 索引倒序取前 5 行
+DASHBOARD_SQL = """
+    SELECT CAST('stats' AS VARCHAR2(10)) as kind, 0 as rk, NULL as word_id, NULL as word, NULL as review_type,
+           (SELECT NVL(SUM(log_count), 0) FROM StudyDailyRollup WHERE user_id = :user_id AND study_date = TRUNC(SYSDATE)) as n1,
+           (SELECT COUNT(*) FROM WordMastery WHERE user_id = :user_id) as n2,
+           (SELECT MAX(streak) FROM (SELECT COUNT(*) AS streak FROM (SELECT checkin_date, ROW_NUMBER() OVER (ORDER BY checkin_date DESC) rn FROM CheckInLog WHERE user_id = :user_id) GROUP BY checkin_date - rn)) as n3,
+           (SELECT AVG(accuracy_rate) FROM CheckInLog WHERE user_id = :user_id) as n4,
+           (SELECT COUNT(*) FROM ReviewSchedule WHERE user_id = :user_id AND review_date >= TRUNC(SYSDATE) AND review_date < TRUNC(SYSDATE) + 1) as n5,
+           (SELECT NVL(SUM(log_count), 0) FROM StudyDailyRollup WHERE user_id = :user_id AND study_date >= TRUNC(SYSDATE) - 7) as n6
+    FROM dual
+    UNION ALL
+    SELECT 'recent', ROWNUM, word_id, word, NULL, NULL, NULL, NULL, NULL, NULL, NULL
+    FROM (
+        SELECT s.word_id, w.word
+        FROM StudyLog s JOIN Word w ON w.word_id = s.word_id
+        WHERE s.user_id = :user_id
+        ORDER BY s.study_time DESC
+        FETCH FIRST 5 ROWS ONLY
+    )
+    UNION ALL
+    SELECT 'upcoming', ROWNUM, NULL, word, review_type, cnt, NULL, NULL, NULL, NULL, NULL
+    FROM (
+        SELECT w.word, '第' || TO_CHAR(r.repeat_count + 1) || '天复习' as review_type, COUNT(*) as cnt
+        FROM ReviewSchedule r JOIN Word w ON r.word_id = w.word_id
+        WHERE r.user_id = :user_id AND r.review_date >= SYSDATE
+        GROUP BY w.word, r.repeat_count
+        ORDER BY MIN(r.review_date)
+        FETCH FIRST 3 ROWS ONLY
+    )
+    ORDER BY 1, 2
+"""
+
+async def load_dashboard(conn, user_id: int):
+    cursor = conn.cursor()
+    try:
+        # 最多 1 + 5 + 3 行，预取行数大于结果行数时执行与取数在同一次往返内完成
+        cursor.arraysize = 16
+        cursor.prefetchrows = 16
+        await cursor.execute(DASHBOARD_SQL, user_id=user_id)
+        rows = await cursor.fetchall()
+    finally:
+        cursor.close()
+    stats = next(r for r in rows if r[0] == 'stats')
+    recent_words = [{"word_id": r[2], "word": r[3]} for r in rows if r[0] == 'recent']
+    upcoming_reviews = [{"word": r[3], "type": r[4], "count": r[5]} for r in rows if r[0] == 'upcoming']
+    while len(upcoming_reviews) < 3:
+        upcoming_reviews.append({"word": "-", "type": "第1天复习", "count": 0})
+    return {
+        "todayStudied": stats[5],
+        "totalWords": stats[6],
+        "streak": stats[7] or 0,
+        "accuracy": int(stats[8] or 0),
+        "todayReview": stats[9],
+        "weeklyGoal": WEEKLY_GOAL,
+        "weeklyProgress": stats[10],
+        "recentWords": recent_words,
+        "upcomingReviews": upcoming_reviews,
+    }
+
 @app.get("/api/dashboard/{user_id}", response_model=DashboardData)
-def get_dashboard(user_id: int):
+async def get_dashboard(user_id: int):
+    # 短期缓存：该用户写入学习记录、复习或打卡后立即失效；命中时不占用连接
+    cached = dashboard_cache.get(user_id)
+    if cached is not None:
+        return cached
+    version = dashboard_cache.version(user_id)
+    conn = await get_async_conn()
+    try:
+        dashboard = await load_dashboard(conn, user_id)
+    finally:
+        await conn.close()
+    dashboard_cache.put(user_id, dashboard, version)
+    return dashboard
+
+# ------------------ 运维接口 ------------------
+@app.get("/api/admin/pool")
+def get_pool_stats():
+    return pool_stats()
+
+@app.get("/api/admin/cache")
+def get_cache_stats():
+    return {
+        "words": word_cache.stats(),
+        "search_index": word_index.stats(),
+        "translation_index": translation_index.stats(),
+        "fuzzy_index": fuzzy_index.stats(),
+        "index_sync": search_indexes.stats(),
+        "dashboard": dashboard_cache.stats(),
+        "http": http_cache_stats(),
+    }
+
+def _collect_metrics():
+    # 连接池、缓存和写缓冲的现有统计，随 /metrics 一起输出
+    pools = pool_stats()
+    for name, stats in (("sync", pools), ("async", pools["async"])):
+        if stats["enabled"]:
+            for state in ("opened", "busy", "idle", "max"):
+                yield "db_pool_connections", (name, state), stats[state]
+    for name, stats in (("words", word_cache.stats()), ("dashboard", dashboard_cache.stats())):
+        yield "cache_entries", (name,), stats["entries"]
+        yield "cache_hits_total", (name,), stats["hits"]
+        yield "cache_misses_total", (name,), stats["misses"]
+        yield "cache_invalidations_total", (name,), stats["invalidations"]
+    buffer = study_log_buffer.stats()
+    yield "studylog_buffer_queued", (), buffer["queued"] + buffer["retrying"]
+    yield "studylog_buffer_flushed_total", (), buffer["flushed"]
+
+register_collector(_collect_metrics)
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    # Prometheus 文本格式
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/api/admin/slow-queries")
+def get_slow_queries(order: str = "total", limit: int = 20):
+    # 本 worker 内按语句指纹汇总的耗时排行，order 可选 total / p99 / max / count / avg
+    if order not in QUERY_ORDERS:
+        raise HTTPException(status_code=400, detail=f"order 只能是 {', '.join(QUERY_ORDERS)}")
+    return query_log.top(order, limit)
+
+@app.delete("/api/admin/slow-queries")
+def reset_slow_queries():
+    query_log.reset()
+    return {"message": "慢查询统计已清空"}
+
+@app.post("/api/admin/slow-queries/plans")
+def capture_slow_query_plans(fingerprint: Optional[str] = None, order: str = "total", limit: int = 5):
+    # 获取指定语句或排行前 limit 条语句的执行计划
+    if order not in QUERY_ORDERS:
+        raise HTTPException(status_code=400, detail=f"order 只能是 {', '.join(QUERY_ORDERS)}")
+    if fingerprint is not None and query_log.get(fingerprint) is None:
+        raise HTTPException(status_code=404, detail="未找到该语句")
+    fingerprints = [fingerprint] if fingerprint is not None else query_log.worst(order, limit)
     conn = get_oracle_conn()
     cursor = conn.cursor()
     try:
-        cursor.execute('SELECT COUNT(*) FROM StudyLog WHERE user_id=:user_id AND TRUNC(study_time) = TRUNC(SYSDATE)', user_id=user_id)
-        today_studied = cursor.fetchone()[0]
-        cursor.execute('SELECT COUNT(DISTINCT word_id) FROM StudyLog WHERE user_id=:user_id', user_id=user_id)
-        total_words = cursor.fetchone()[0]
-        cursor.execute('SELECT MAX(streak) FROM (SELECT COUNT(*) AS streak FROM (SELECT checkin_date, ROW_NUMBER() OVER (ORDER BY checkin_date DESC) rn FROM CheckInLog WHERE user_id=:user_id) GROUP BY checkin_date - rn)', user_id=user_id)
-        streak = cursor.fetchone()[0] or 0
-        cursor.execute('SELECT AVG(accuracy_rate) FROM CheckInLog WHERE user_id=:user_id', user_id=user_id)
-        accuracy = int(cursor.fetchone()[0] or 0)
-        cursor.execute('SELECT COUNT(*) FROM ReviewSchedule WHERE user_id=:user_id AND TRUNC(review_date) = TRUNC(SYSDATE)', user_id=user_id)
-        today_review = cursor.fetchone()[0]
-        weekly_goal = 200
-        cursor.execute('SELECT COUNT(*) FROM StudyLog WHERE user_id=:user_id AND study_time >= TRUNC(SYSDATE) - 7', user_id=user_id)
-        weekly_progress = cursor.fetchone()[0]
-        cursor.execute('''SELECT w.word_id, w.word FROM StudyLog s JOIN Word w ON s.word_id=w.word_id WHERE s.user_id=:user_id ORDER BY s.study_time DESC FETCH FIRST 5 ROWS ONLY''', user_id=user_id)
-        recent_words = [ {"word_id": r[0], "word": r[1]} for r in cursor.fetchall() ]
-        cursor.execute('''
-            SELECT w.word, 
-                   '第' || TO_CHAR(r.repeat_count + 1) || '天复习' AS type, 
-                   COUNT(*) AS cnt 
-            FROM ReviewSchedule r 
-            JOIN Word w ON r.word_id=w.word_id 
-            WHERE r.user_id=:user_id AND r.review_date >= SYSDATE 
-            GROUP BY w.word, r.repeat_count
-        ''', user_id=user_id)
-        upcoming_reviews = [ {"word": r[0], "type": r[1], "count": r[2]} for r in cursor.fetchall() ]
-        while len(upcoming_reviews) < 3:
-            upcoming_reviews.append({"word": "-", "type": "第1天复习", "count": 0})
-        return {
-            "todayStudied": today_studied,
-            "totalWords": total_words,
-            "streak": streak,
-            "accuracy": accuracy,
-            "todayReview": today_review,
-            "weeklyGoal": weekly_goal,
-            "weeklyProgress": weekly_progress,
-            "recentWords": recent_words,
-            "upcomingReviews": upcoming_reviews[:3],
-        }
+        return [plan for plan in (capture_plan(cursor, fp) for fp in fingerprints) if plan is not None]
     finally:
         cursor.close()
         conn.close()
 
+@app.get("/api/admin/studylog-buffer")
+def get_studylog_buffer_stats():
+    return study_log_buffer.stats()
+
+@app.post("/api/admin/study-rollup/rebuild")
+def rebuild_study_rollup(user_id: Optional[int] = None):
+    # 从 StudyLog 重建每日学习汇总，不传 user_id 时重建全部用户
+    return rebuild_rollup(user_id)
+
+@app.get("/api/admin/study-rollup/check")
+def check_study_rollup(user_id: Optional[int] = None, limit: int = 100, repair: bool = False):
+    # 比对汇总与原始记录，repair=true 时重新汇总不一致的天
+    return check_rollup(user_id, limit, repair)
+
+@app.get("/api/admin/snapshot")
+def get_snapshot_stats():
+    return snapshot.stats()
+
+@app.post("/api/admin/snapshot/refresh")
+def refresh_analytics_snapshot(full: bool = False):
+    # 增量刷新班级统计用的列式快照，full=true 时整体重建
+    return refresh_snapshot(full)
+
 # 注册路由
 app.include_router(users_router, prefix="/api")
 app.include_router(words_router, prefix="/api")
@@ -145,5 +306,6 @@ app.include_router(wrongwords_router, prefix="/api")
 app.include_router(favorite_router, prefix="/api")
 app.include_router(checkin_router, prefix="/api")
 app.include_router(statistics_router, prefix="/api")
+app.include_router(cohort_router, prefix="/api")
 app.include_router(test_router, prefix="/api")
 app.include_router(search_router, prefix="/api")
\ No newline at end of file
@@ -0,0 +1,306 @@
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 请求与数据库访问指标配置
+METRICS_CONFIG = {
+    "enabled": os.getenv("METRICS_ENABLED", "1") == "1",
+    # 在响应中附带 Server-Timing 头（数据库往返次数和耗时），浏览器开发者工具中可见
+    "server_timing": os.getenv("METRICS_SERVER_TIMING", "0") == "1",
+    # 各 worker 定期把自己的指标写到该目录，/metrics 汇总所有 worker
+    "spool_dir": os.getenv("METRICS_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "dancisystem_metrics")),
+    "flush_interval": float(os.getenv("METRICS_FLUSH_INTERVAL", "5")),
+}
+
+PREFIX = "dancisystem_"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 每个请求的数据库往返次数，N+1 查询的接口会落在大的桶里
+ROUND_TRIP_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100, 200)
+
+# 指标名 -> (类型, 说明, 标签名, 直方图分桶)
+DEFINITIONS = {
+    "http_requests_total": ("counter", "HTTP 请求数", ("method", "route", "status"), None),
+    "http_request_duration_seconds": ("histogram", "HTTP 请求耗时", ("method", "route"), LATENCY_BUCKETS),
+    "http_requests_in_flight": ("gauge", "正在处理的 HTTP 请求数", (), None),
+    "db_round_trips_total": ("counter", "数据库网络往返次数", ("route",), None),
+    "db_statements_total": ("counter", "执行的 SQL 语句数", ("route",), None),
+    "db_rows_fetched_total": ("counter", "取回的行数", ("route",), None),
+    "db_seconds_total": ("counter", "等待数据库往返的总时间", ("route",), None),
+    "db_round_trips_per_request": ("histogram", "每个请求的数据库往返次数", ("route",), ROUND_TRIP_BUCKETS),
+    "db_pool_connections": ("gauge", "连接池连接数", ("pool", "state"), None),
+    "cache_entries": ("gauge", "缓存条目数", ("cache",), None),
+    "cache_hits_total": ("counter", "缓存命中次数", ("cache",), None),
+    "cache_misses_total": ("counter", "缓存未命中次数", ("cache",), None),
+    "cache_invalidations_total": ("counter", "缓存失效次数", ("cache",), None),
+    "studylog_buffer_queued": ("gauge", "写缓冲中等待写库的学习记录数", (), None),
+    "studylog_buffer_flushed_total": ("counter", "写缓冲已写库的学习记录数", (), None),
+}
+
+class Registry:
+    # 本进程的指标值；直方图存各桶计数（非累计）加 sum、count
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}  # (name, labels) -> float 或 list
+
+    def inc(self, name: str, labels=(), value: float = 1.0):
+        with self._lock:
+            self._values[(name, labels)] = self._values.get((name, labels), 0.0) + value
+
+    def set(self, name: str, labels=(), value: float = 0.0):
+        with self._lock:
+            self._values[(name, labels)] = float(value)
+
+    def observe(self, name: str, labels, value: float):
+        buckets = DEFINITIONS[name][3]
+        with self._lock:
+            entry = self._values.get((name, labels))
+            if entry is None:
+                entry = self._values[(name, labels)] = [0] * len(buckets) + [0.0, 0]
+            index = bisect_left(buckets, value)
+            if index < len(buckets):
+                entry[index] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            return [[name, list(labels), list(value) if isinstance(value, list) else value] for (name, labels), value in self._values.items()]
+
+registry = Registry()
+
+# 采集时调用，返回 (指标名, 标签, 值) 序列；用于连接池、缓存等已有的统计
+_collectors: List[Callable] = []
+
+def register_collector(collector: Callable):
+    _collectors.append(collector)
+
+def _collected():
+    samples = []
+    for collector in _collectors:
+        try:
+            samples.extend([name, list(labels), value] for name, labels, value in collector())
+        except Exception:
+            logger.exception("metrics collector failed")
+    return samples
+
+# ------------------ 数据库访问 ------------------
+class RequestStats:
+    __slots__ = ("round_trips", "statements", "rows", "db_seconds")
+
+    def __init__(self):
+        self.round_trips = 0
+        self.statements = 0
+        self.rows = 0
+        self.db_seconds = 0.0
+
+# 当前请求的数据库统计；同步接口在线程池中执行时上下文随之复制，引用的是同一个对象
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+# 不在请求中的数据库访问（写缓冲后台线程、启动时建索引）记到这个标签下
+BACKGROUND = "background"
+
+def _record_db(field: str, value):
+    stats = _current.get()
+    if stats is not None:
+        setattr(stats, field, getattr(stats, field) + value)
+    else:
+        registry.inc({"round_trips": "db_round_trips_total", "statements": "db_statements_total",
+                      "rows": "db_rows_fetched_total", "db_seconds": "db_seconds_total"}[field], (BACKGROUND,), value)
+
+def round_trip_callback(name, *args):
+    # python-oracledb（Thin 模式）每次网络往返之前调用，返回的函数在往返完成后调用
+    start = time.perf_counter()
+
+    def done(*args):
+        _record_db("round_trips", 1)
+        _record_db("db_seconds", time.perf_counter() - start)
+    return done
+
+_FETCHES = ("fetchone", "fetchmany", "fetchall")
+
+def operation_callback(name, *args):
+    # 每次数据库操作之前调用，返回的函数接收操作结果（或抛出的异常）
+    if name in ("execute", "executemany"):
+        _record_db("statements", 1)
+        return None
+    if name not in _FETCHES:
+        return None
+
+    def done(result=None, *args):
+        if isinstance(result, list):
+            _record_db("rows", len(result))
+        elif result is not None and not isinstance(result, BaseException):
+            _record_db("rows", 1)
+    return done
+
+def driver_callbacks():
+    # 传给 create_pool / connect 的回调参数，关闭指标时不设置
+    if not METRICS_CONFIG["enabled"]:
+        return {}
+    return {"round_trip_callback": round_trip_callback, "operation_callback": operation_callback}
+
+# ------------------ HTTP 中间件 ------------------
+def _route(scope) -> str:
+    # 使用路由模板（如 /api/words/{word_id}）而不是实际路径，避免标签数量无限增长
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+class MetricsMiddleware:
+    def __init__(self, app, config=METRICS_CONFIG):
+        self.app = app
+        self.config = config
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.config["enabled"]:
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.config["server_timing"]:
+                    elapsed = (time.perf_counter() - start) * 1000
+                    timing = f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.round_trips} round trips, {stats.rows} rows", app;dur={elapsed:.1f}'
+                    message = dict(message, headers=list(message.get("headers", [])) + [
+                        (b"server-timing", timing.encode()),
+                        (b"timing-allow-origin", b"*"),
+                    ])
+            await send(message)
+
+        registry.inc("http_requests_in_flight")
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            registry.inc("http_requests_in_flight", (), -1)
+            _current.reset(token)
+            route = _route(scope)
+            registry.inc("http_requests_total", (scope["method"], route, str(status)))
+            registry.observe("http_request_duration_seconds", (scope["method"], route), time.perf_counter() - start)
+            registry.observe("db_round_trips_per_request", (route,), stats.round_trips)
+            if stats.round_trips or stats.statements:
+                registry.inc("db_round_trips_total", (route,), stats.round_trips)
+                registry.inc("db_statements_total", (route,), stats.statements)
+                registry.inc("db_rows_fetched_total", (route,), stats.rows)
+                registry.inc("db_seconds_total", (route,), stats.db_seconds)
+
+# ------------------ 多 worker 汇总与输出 ------------------
+def _spool_path(pid: int) -> str:
+    return os.path.join(METRICS_CONFIG["spool_dir"], f"metrics-{pid}.json")
+
+def write_snapshot():
+    # 原子替换本进程的指标文件
+    os.makedirs(METRICS_CONFIG["spool_dir"], exist_ok=True)
+    path = _spool_path(os.getpid())
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(registry.samples() + _collected(), f)
+    os.replace(path + ".tmp", path)
+
+def _merge(snapshots):
+    merged = {}
+    for samples in snapshots:
+        for name, labels, value in samples:
+            key = (name, tuple(labels))
+            if key not in merged:
+                merged[key] = list(value) if isinstance(value, list) else value
+            elif isinstance(value, list):
+                merged[key] = [a + b for a, b in zip(merged[key], value)]
+            else:
+                merged[key] += value
+    return merged
+
+def _load_snapshots():
+    # 超过三个写入间隔没有更新的文件属于已退出的 worker，删除
+    snapshots = []
+    stale_before = time.time() - 3 * METRICS_CONFIG["flush_interval"]
+    for path in glob.glob(os.path.join(METRICS_CONFIG["spool_dir"], "metrics-*.json")):
+        if path == _spool_path(os.getpid()):
+            continue
+        try:
+            if os.path.getmtime(path) < stale_before:
+                os.remove(path)
+                continue
+            with open(path, encoding="utf-8") as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+def _format_value(value) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+def render() -> str:
+    # 本进程的实时指标加上其他 worker 最近一次写入的指标，按 Prometheus 文本格式输出
+    merged = _merge([registry.samples() + _collected()] + _load_snapshots())
+    lines = []
+    for name, (kind, help_text, label_names, buckets) in DEFINITIONS.items():
+        series = sorted((labels, value) for (n, labels), value in merged.items() if n == name)
+        if not series:
+            continue
+        lines.append(f"# HELP {PREFIX}{name} {help_text}")
+        lines.append(f"# TYPE {PREFIX}{name} {kind}")
+        for labels, value in series:
+            if kind != "histogram":
+                lines.append(f"{PREFIX}{name}{_format_labels(label_names, labels)} {_format_value(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets, value):
+                cumulative += count
+                lines.append(f"{PREFIX}{name}_bucket{_format_labels(label_names, labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{PREFIX}{name}_bucket{_format_labels(label_names, labels, [('le', '+Inf')])} {value[-1]}")
+            lines.append(f"{PREFIX}{name}_sum{_format_labels(label_names, labels)} {_format_value(value[-2])}")
+            lines.append(f"{PREFIX}{name}_count{_format_labels(label_names, labels)} {value[-1]}")
+    return "\n".join(lines) + "\n"
+
+class SnapshotWriter:
+    # 后台线程定期写出本进程的指标，供处理 /metrics 的其他 worker 汇总
+    def __init__(self, config=METRICS_CONFIG):
+        self.config = config
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if not self.config["enabled"] or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.config["flush_interval"]):
+            try:
+                write_snapshot()
+            except Exception:
+                logger.exception("metrics snapshot failed")
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        try:
+            os.remove(_spool_path(os.getpid()))
+        except OSError:
+            pass
+
+snapshot_writer = SnapshotWriter()
@@ -0,0 +1,364 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Optional
+import oracledb
+
+logger = logging.getLogger(__name__)
+
+# 慢查询日志配置
+QUERY_LOG_CONFIG = {
+    "enabled": os.getenv("QUERY_LOG_ENABLED", "1") == "1",
+    # 单次执行（execute 加上之后的 fetch）超过该毫秒数记一条慢查询日志，附带绑定变量
+    "threshold_ms": float(os.getenv("QUERY_LOG_THRESHOLD_MS", "200")),
+    "log_binds": os.getenv("QUERY_LOG_BINDS", "1") == "1",
+    # 最多统计的不同语句数，超出后新语句只计入 dropped
+    "max_statements": int(os.getenv("QUERY_LOG_MAX_STATEMENTS", "2000")),
+    # 每个语句保留最近多少次耗时用于计算 p99
+    "samples": int(os.getenv("QUERY_LOG_SAMPLES", "1000")),
+}
+
+# 名字包含这些词的绑定变量在日志中不输出值
+_SECRET_BINDS = ("password", "token", "secret")
+_BIND_VALUE_MAX = 200
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_BIND_LIST = re.compile(r"\(\s*:\w+(?:\s*,\s*:\w+)+\s*\)")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+
+@lru_cache(maxsize=4096)
+def fingerprint(sql: str):
+    # 字符串和数字字面量替换为 ?，IN 列表中个数不定的绑定变量合并为 :list，空白压缩为一个空格；
+    # f-string 拼入的 FETCH FIRST {limit} 等因此归为同一条语句
+    text = _STRING.sub("'?'", sql)
+    text = _BIND_LIST.sub("(:list)", text)
+    text = _NUMBER.sub("?", text)
+    text = _SPACE.sub(" ", text).strip()
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16], text
+
+def _format_binds(binds):
+    def value(name, v):
+        if name is not None and any(word in str(name).lower() for word in _SECRET_BINDS):
+            return "***"
+        text = repr(v)
+        return text if len(text) <= _BIND_VALUE_MAX else text[:_BIND_VALUE_MAX] + "..."
+    if isinstance(binds, dict):
+        return {k: value(k, v) for k, v in binds.items()}
+    if isinstance(binds, (list, tuple)):
+        return [value(None, v) for v in binds]
+    return binds
+
+class _Statement:
+    __slots__ = ("sql", "example", "count", "total", "max", "rows", "slow", "samples", "plan")
+
+    def __init__(self, sql: str, example: str, samples: int):
+        self.sql = sql
+        self.example = example  # 最近一次执行的原始语句，获取执行计划时使用
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.slow = 0
+        self.samples = deque(maxlen=samples)
+        self.plan = None
+
+    def p99(self) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(round(0.99 * (len(ordered) - 1))))]
+
+    def to_dict(self, fp: str):
+        return {
+            "fingerprint": fp,
+            "sql": self.sql,
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "avg_ms": round(self.total * 1000 / self.count, 3) if self.count else 0.0,
+            "p99_ms": round(self.p99() * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+            "rows": self.rows,
+            "slow": self.slow,
+            "has_plan": self.plan is not None,
+        }
+
+ORDERS = {
+    "total": lambda s: s.total,
+    "p99": lambda s: s.p99(),
+    "max": lambda s: s.max,
+    "count": lambda s: s.count,
+    "avg": lambda s: s.total / s.count if s.count else 0.0,
+}
+
+class QueryLog:
+    # 本进程内按语句指纹汇总执行次数、总耗时、p99 和取回行数
+    def __init__(self, config=QUERY_LOG_CONFIG):
+        self.config = config
+        self._statements = {}  # fingerprint -> _Statement
+        self._lock = threading.Lock()
+        self.dropped = 0
+        self.since = time.time()
+
+    def record(self, sql: str, elapsed: float, rows: int, binds=None):
+        fp, text = fingerprint(sql)
+        with self._lock:
+            statement = self._statements.get(fp)
+            if statement is None:
+                if len(self._statements) >= self.config["max_statements"]:
+                    self.dropped += 1
+                    return
+                statement = self._statements[fp] = _Statement(text, sql, self.config["samples"])
+            statement.example = sql
+            statement.count += 1
+            statement.total += elapsed
+            statement.max = max(statement.max, elapsed)
+            statement.rows += rows
+            statement.samples.append(elapsed)
+            slow = elapsed * 1000 >= self.config["threshold_ms"]
+            if slow:
+                statement.slow += 1
+        if slow:
+            logger.warning(
+                "slow query %s %.1fms rows=%d sql=%s binds=%s",
+                fp, elapsed * 1000, rows, text,
+                _format_binds(binds) if self.config["log_binds"] else "-",
+            )
+
+    def top(self, order: str = "total", limit: int = 20):
+        key = ORDERS[order]
+        with self._lock:
+            ranked = sorted(self._statements.items(), key=lambda item: key(item[1]), reverse=True)[:limit]
+            return {
+                "since": time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.since)),
+                "threshold_ms": self.config["threshold_ms"],
+                "statements": len(self._statements),
+                "dropped": self.dropped,
+                "top": [statement.to_dict(fp) for fp, statement in ranked],
+            }
+
+    def worst(self, order: str = "total", limit: int = 5):
+        key = ORDERS[order]
+        with self._lock:
+            ranked = sorted(self._statements.items(), key=lambda item: key(item[1]), reverse=True)[:limit]
+            return [fp for fp, _ in ranked]
+
+    def get(self, fp: str) -> Optional[_Statement]:
+        with self._lock:
+            return self._statements.get(fp)
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self.dropped = 0
+            self.since = time.time()
+
+query_log = QueryLog()
+
+# ------------------ 计时游标 ------------------
+# 一次执行从 execute 开始，累加之后各次 fetch 的耗时和行数，到同一游标下一次 execute 或 close 时记录
+# 游标和连接都用组合包装驱动对象，不继承驱动类：只改写下面列出的方法，其余属性的读写（arraysize、var、
+# call_timeout、commit 等）原样转给驱动对象，只依赖驱动的公开接口
+
+_DRIVER_OPTIONS = ("suspend_on_success", "fetch_lobs", "fetch_decimals")
+
+class _Wrapper:
+    _own = ()  # 保存在包装对象自身上的属性名，其他属性写到被包装的驱动对象上
+
+    def __init__(self, target):
+        object.__setattr__(self, "_target", target)
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+    def __setattr__(self, name, value):
+        if name in self._own:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._target, name, value)
+
+class _Timing(_Wrapper):
+    _own = ("_query", "record")
+    _query = None  # [sql, binds, elapsed, rows]
+    record = True  # 为 False 时不记录（获取执行计划本身）
+
+    def _begin(self, statement, parameters, kwargs, elapsed):
+        if not self.record or not isinstance(statement, str):
+            return
+        binds = parameters if parameters is not None else {k: v for k, v in kwargs.items() if k not in _DRIVER_OPTIONS}
+        self._query = [statement, binds, elapsed, 0]
+
+    def _add(self, elapsed, result):
+        if self._query is None:
+            return
+        self._query[2] += elapsed
+        if isinstance(result, list):
+            self._query[3] += len(result)
+        elif result is not None:
+            self._query[3] += 1
+
+    def _finish(self):
+        if self._query is not None:
+            statement, binds, elapsed, rows = self._query
+            self._query = None
+            query_log.record(statement, elapsed, rows, binds)
+
+    def _record_many(self, statement, parameters, elapsed):
+        if self.record and isinstance(statement, str):
+            count = len(parameters) if isinstance(parameters, (list, tuple)) else parameters
+            query_log.record(statement, elapsed, 0, f"<{count} rows>")
+
+    def close(self):
+        self._finish()
+        self._target.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class TimedCursor(_Timing):
+    def execute(self, statement, parameters=None, **kwargs):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            return self._target.execute(statement, parameters, **kwargs)
+        finally:
+            self._begin(statement, parameters, kwargs, time.perf_counter() - start)
+
+    def executemany(self, statement, parameters, **kwargs):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            return self._target.executemany(statement, parameters, **kwargs)
+        finally:
+            self._record_many(statement, parameters, time.perf_counter() - start)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = self._target.fetchone()
+        self._add(time.perf_counter() - start, row)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        start = time.perf_counter()
+        rows = self._target.fetchmany(*args, **kwargs)
+        self._add(time.perf_counter() - start, rows)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = self._target.fetchall()
+        self._add(time.perf_counter() - start, rows)
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+class TimedAsyncCursor(_Timing):
+    async def execute(self, statement, parameters=None, **kwargs):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            return await self._target.execute(statement, parameters, **kwargs)
+        finally:
+            self._begin(statement, parameters, kwargs, time.perf_counter() - start)
+
+    async def executemany(self, statement, parameters, **kwargs):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            return await self._target.executemany(statement, parameters, **kwargs)
+        finally:
+            self._record_many(statement, parameters, time.perf_counter() - start)
+
+    async def fetchone(self):
+        start = time.perf_counter()
+        row = await self._target.fetchone()
+        self._add(time.perf_counter() - start, row)
+        return row
+
+    async def fetchmany(self, *args, **kwargs):
+        start = time.perf_counter()
+        rows = await self._target.fetchmany(*args, **kwargs)
+        self._add(time.perf_counter() - start, rows)
+        return rows
+
+    async def fetchall(self):
+        start = time.perf_counter()
+        rows = await self._target.fetchall()
+        self._add(time.perf_counter() - start, rows)
+        return rows
+
+    async def __aiter__(self):
+        while (row := await self.fetchone()) is not None:
+            yield row
+
+class TimedConnection(_Wrapper):
+    def cursor(self, *args, **kwargs):
+        return TimedCursor(self._target.cursor(*args, **kwargs))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._target.close()
+
+class TimedAsyncConnection(_Wrapper):
+    def cursor(self, *args, **kwargs):
+        return TimedAsyncCursor(self._target.cursor(*args, **kwargs))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._target.close()
+
+def timed(conn, is_async: bool = False):
+    # 包装从连接池取出或单独建立的连接；关闭时原样返回驱动连接
+    if not QUERY_LOG_CONFIG["enabled"]:
+        return conn
+    return TimedAsyncConnection(conn) if is_async else TimedConnection(conn)
+
+# ------------------ 执行计划 ------------------
+_EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "MERGE")
+
+_CURSOR_CACHE_SQL = '''
+    SELECT sql_id, child_number FROM v$sql
+    WHERE sql_text = SUBSTR(:text, 1, 1000) AND DBMS_LOB.COMPARE(sql_fulltext, TO_CLOB(:text)) = 0
+    ORDER BY last_active_time DESC
+    FETCH FIRST 1 ROWS ONLY
+'''
+
+def capture_plan(cursor, fp: str):
+    # 优先取共享池中该语句实际使用的执行计划；已被淘汰时用 EXPLAIN PLAN 估算
+    statement = query_log.get(fp)
+    if statement is None:
+        return None
+    sql = statement.example
+    cursor.record = False
+    try:
+        cursor.execute(_CURSOR_CACHE_SQL, text=sql)
+        row = cursor.fetchone()
+        if row:
+            cursor.execute("SELECT plan_table_output FROM TABLE(DBMS_XPLAN.DISPLAY_CURSOR(:sql_id, :child, 'TYPICAL'))", sql_id=row[0], child=row[1])
+            plan, source = [r[0] for r in cursor.fetchall()], "cursor_cache"
+        elif sql.lstrip().split(None, 1)[0].upper() in _EXPLAINABLE:
+            # 指纹是十六进制串，可以直接作为 STATEMENT_ID 字面量
+            cursor.execute(f"EXPLAIN PLAN SET STATEMENT_ID = '{fp}' FOR {sql}")
+            cursor.execute("SELECT plan_table_output FROM TABLE(DBMS_XPLAN.DISPLAY('PLAN_TABLE', :id, 'TYPICAL'))", id=fp)
+            plan, source = [r[0] for r in cursor.fetchall()], "explain_plan"
+            cursor.connection.rollback()
+        else:
+            plan, source = [], "unsupported"
+    except oracledb.DatabaseError as e:
+        # 缺少 v$sql 权限或语句无法 EXPLAIN（如带 RETURNING INTO）
+        plan, source = [str(e)], "error"
+    statement.plan = {"source": source, "plan": plan, "captured_at": time.strftime('%Y-%m-%dT%H:%M:%S')}
+    return dict(statement.to_dict(fp), **statement.plan)
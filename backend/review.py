@@ -1,8 +1,13 @@
 import datetime
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import List, Optional
-from db_config import get_oracle_conn
+import numpy as np
+from fastapi import APIRouter, HTTPException, Depends, Query
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+from db_config import get_oracle_conn, get_async_db, tune_cursor, db_now
+from hydrate import hydrate_words_async
+from scheduler import SCHEDULER_CONFIG, RECALL_SQL, review as schedule_review, retune_schedules, to_days, from_days
+from user_cache import dashboard_cache
+from fast_response import fast_json
 
 router = APIRouter()
 
@@ -15,25 +20,23 @@ class ReviewSchedule(BaseModel):
     memory_strength: Optional[float] = None
 
 @router.get("/review", response_model=List[ReviewSchedule])
-def get_review(user_id: int):
-    conn = get_oracle_conn()
-    cursor = conn.cursor()
+async def get_review(user_id: int, conn=Depends(get_async_db)):
+    cursor = tune_cursor(conn.cursor(), "list")
     try:
-        cursor.execute('SELECT schedule_id, user_id, word_id, review_date, repeat_count, memory_strength FROM ReviewSchedule WHERE user_id=:1 ORDER BY review_date', (user_id,))
+        await cursor.execute('SELECT schedule_id, user_id, word_id, review_date, repeat_count, memory_strength FROM ReviewSchedule WHERE user_id=:1 ORDER BY review_date', (user_id,))
         reviews = [
-            ReviewSchedule(
-                schedule_id=row[0],
-                user_id=row[1],
-                word_id=row[2],
-                review_date=row[3].strftime('%Y-%m-%dT%H:%M:%S'),
-                repeat_count=row[4],
-                memory_strength=float(row[5]) if row[5] is not None else None
-            ) for row in cursor.fetchall()
+            {
+                "schedule_id": row[0],
+                "user_id": row[1],
+                "word_id": row[2],
+                "review_date": row[3].strftime('%Y-%m-%dT%H:%M:%S'),
+                "repeat_count": row[4],
+                "memory_strength": float(row[5]) if row[5] is not None else None
+            } for row in await cursor.fetchall()
         ]
-        return reviews
+        return fast_json(reviews, List[ReviewSchedule])
     finally:
         cursor.close()
-        conn.close()
 
 class UpdateReviewRequest(BaseModel):
     review_date: Optional[str] = None
@@ -42,6 +45,7 @@ class UpdateReviewRequest(BaseModel):
 
 @router.put("/review/{schedule_id}")
 def update_review(schedule_id: int, data: UpdateReviewRequest):
+    # 手动改过的复习日期与上次复习时间 + 间隔不再一致，每晚的 retune 会保留它，直到下一次作答重新排期
     conn = get_oracle_conn()
     cursor = conn.cursor()
     try:
@@ -58,10 +62,12 @@ def update_review(schedule_id: int, data: UpdateReviewRequest):
             params['memory_strength'] = data.memory_strength
         if not sets:
             raise HTTPException(status_code=400, detail="无更新内容")
-        sql = 'UPDATE ReviewSchedule SET ' + ', '.join(sets) + ' WHERE schedule_id=:schedule_id'
+        sql = 'UPDATE ReviewSchedule SET ' + ', '.join(sets) + ' WHERE schedule_id=:schedule_id RETURNING user_id INTO :user_id'
         params['schedule_id'] = schedule_id
+        params['user_id'] = cursor.var(int)
         cursor.execute(sql, params)
         conn.commit()
+        dashboard_cache.invalidate(params['user_id'].getvalue() or [])
         return {"success": True}
     finally:
         cursor.close()
@@ -87,6 +93,7 @@ def create_review(data: CreateReviewRequest):
             user_id=data.user_id, word_id=data.word_id, review_date=review_date_dt, repeat_count=data.repeat_count, memory_strength=data.memory_strength, schedule_id=schedule_id_var
         )
         conn.commit()
+        dashboard_cache.invalidate([data.user_id])
         return ReviewSchedule(
             schedule_id=schedule_id_var.getvalue()[0] if isinstance(schedule_id_var.getvalue(), list) else schedule_id_var.getvalue(),
             user_id=data.user_id,
@@ -98,3 +105,167 @@ def create_review(data: CreateReviewRequest):
     finally:
         cursor.close()
         conn.close()
+
+@router.post("/review/retune")
+def retune_reviews(user_id: Optional[int] = None):
+    # 按当前调度参数整理复习计划：为旧数据补齐间隔和上次复习时间，间隔超出 max_interval 等参数变化时重排复习日期，
+    # 手动改过的复习日期保留，不改写记忆强度；不传 user_id 时处理全部用户，一般由每晚的定时任务调用
+    return retune_schedules(user_id)
+
+# 一次最多返回的到期卡片数、一次最多提交的作答数（Oracle IN 列表上限）
+DUE_LIMIT = 200
+MAX_ANSWERS = 1000
+
+class DueReview(ReviewSchedule):
+    # 按遗忘曲线估算的当前回忆概率，越低越优先复习
+    recall_probability: float
+    word: Dict[str, Any]
+
+class DueQueue(BaseModel):
+    due_count: int
+    items: List[DueReview]
+
+@router.get("/review/due", response_model=DueQueue)
+async def get_due_reviews(user_id: int, limit: int = Query(20, ge=1, le=DUE_LIMIT), conn=Depends(get_async_db)):
+    # 只返回已到期的卡片，按当前回忆概率从低到高排序（逾期越久、间隔越短越靠前），并补全单词详情
+    cursor = tune_cursor(conn.cursor(), "list")
+    try:
+        await cursor.execute(f'''
+            WITH due AS (
+                SELECT r.schedule_id, r.user_id, r.word_id, r.review_date, r.repeat_count, r.memory_strength,
+                       w.word, w.list_id,
+                       {RECALL_SQL.format(r="r")} as recall
+                FROM ReviewSchedule r
+                JOIN Word w ON w.word_id = r.word_id
+                WHERE r.user_id = :user_id AND r.review_date <= SYSDATE
+            )
+            SELECT schedule_id, user_id, word_id, review_date, repeat_count, memory_strength, word, list_id,
+                   recall,
+                   COUNT(*) OVER () as due_count
+            FROM due
+            ORDER BY recall, review_date, schedule_id
+            FETCH FIRST :limit ROWS ONLY
+        ''', user_id=user_id, retention=SCHEDULER_CONFIG["target_retention"], limit=limit)
+        rows = await cursor.fetchall()
+        words = await hydrate_words_async(cursor, [(row[2], row[6], row[7]) for row in rows])
+        items = [
+            DueReview(
+                schedule_id=row[0],
+                user_id=row[1],
+                word_id=row[2],
+                review_date=row[3].strftime('%Y-%m-%dT%H:%M:%S'),
+                repeat_count=row[4],
+                memory_strength=float(row[5]) if row[5] is not None else None,
+                recall_probability=round(float(row[8]), 4),
+                word=word
+            ) for row, word in zip(rows, words)
+        ]
+        return DueQueue(due_count=rows[0][9] if rows else 0, items=items)
+    finally:
+        cursor.close()
+
+class ReviewAnswer(BaseModel):
+    schedule_id: int
+    # 作答质量 0~5，>= 3 视为记住
+    grade: int = Field(..., ge=0, le=5)
+    answered_at: Optional[str] = None
+
+class ReviewAnswersRequest(BaseModel):
+    user_id: int
+    answers: List[ReviewAnswer]
+
+class ReviewAnswerResult(BaseModel):
+    schedule_id: int
+    review_date: str
+    repeat_count: int
+    interval_days: float
+    memory_strength: float
+
+class ReviewAnswersResponse(BaseModel):
+    updated: int
+    results: List[ReviewAnswerResult]
+    not_found: List[int]
+
+_ANSWER_UPDATE = '''
+    UPDATE ReviewSchedule
+    SET repeat_count = :1, ease_factor = :2, interval_days = :3,
+        last_review_time = DATE '1970-01-01' + :4,
+        review_date = DATE '1970-01-01' + :5,
+        memory_strength = :6
+    WHERE schedule_id = :7
+'''
+
+@router.post("/review/answers", response_model=ReviewAnswersResponse)
+def submit_review_answers(data: ReviewAnswersRequest):
+    # 一次提交整个复习会话的作答：一次查询取出当前状态，调度引擎按数组计算，一次 executemany 写回并提交
+    if not data.answers:
+        raise HTTPException(status_code=400, detail="没有作答记录")
+    if len(data.answers) > MAX_ANSWERS:
+        raise HTTPException(status_code=400, detail=f"一次最多提交 {MAX_ANSWERS} 条作答")
+    try:
+        answered = [datetime.datetime.strptime(a.answered_at, "%Y-%m-%dT%H:%M:%S") if a.answered_at else None for a in data.answers]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="answered_at 格式应为 YYYY-MM-DDTHH:MM:SS")
+    conn = get_oracle_conn()
+    cursor = conn.cursor()
+    try:
+        # 没有给出作答时间的按数据库时钟，与到期筛选和回忆概率使用的 SYSDATE 一致
+        if None in answered:
+            now = db_now(conn)
+            answered = [now if value is None else value for value in answered]
+        answered = [to_days(value) for value in answered]
+        ids = list(dict.fromkeys(a.schedule_id for a in data.answers))
+        names = [f'id{i}' for i in range(len(ids))]
+        cursor.execute(
+            f'SELECT schedule_id, repeat_count, ease_factor, interval_days FROM ReviewSchedule WHERE user_id = :user_id AND schedule_id IN ({", ".join(":" + n for n in names)})',
+            dict(zip(names, ids), user_id=data.user_id)
+        )
+        state = {row[0]: [row[1], row[2], row[3]] for row in cursor.fetchall()}
+        # 同一张卡片在一次会话中可能作答多次，按提交顺序分轮计算，后一次作答基于前一次的结果
+        pending = sorted(
+            (answered[i], i) for i, a in enumerate(data.answers) if a.schedule_id in state
+        )
+        final = {}
+        while pending:
+            seen = set()
+            current, rest = [], []
+            for item in pending:
+                schedule_id = data.answers[item[1]].schedule_id
+                (rest if schedule_id in seen else current).append(item)
+                seen.add(schedule_id)
+            batch = [data.answers[i] for _, i in current]
+            result = schedule_review(
+                [state[a.schedule_id][0] for a in batch],
+                np.array([state[a.schedule_id][1] for a in batch], dtype=np.float64),
+                np.array([state[a.schedule_id][2] for a in batch], dtype=np.float64),
+                [a.grade for a in batch],
+                [days for days, _ in current],
+            )
+            for k, a in enumerate(batch):
+                state[a.schedule_id] = [int(result["repeat_count"][k]), float(result["ease_factor"][k]), float(result["interval_days"][k])]
+                final[a.schedule_id] = (
+                    int(result["repeat_count"][k]), float(result["ease_factor"][k]), float(result["interval_days"][k]),
+                    float(result["last_review"][k]), float(result["review_date"][k]), float(result["memory_strength"][k]),
+                    a.schedule_id,
+                )
+            pending = rest
+        if final:
+            cursor.executemany(_ANSWER_UPDATE, list(final.values()))
+            conn.commit()
+            dashboard_cache.invalidate([data.user_id])
+        return ReviewAnswersResponse(
+            updated=len(final),
+            results=[
+                ReviewAnswerResult(
+                    schedule_id=row[6],
+                    review_date=from_days(row[4]).strftime('%Y-%m-%dT%H:%M:%S'),
+                    repeat_count=row[0],
+                    interval_days=row[2],
+                    memory_strength=row[5]
+                ) for row in final.values()
+            ],
+            not_found=[i for i in ids if i not in state]
+        )
+    finally:
+        cursor.close()
+        conn.close()
@@ -0,0 +1,172 @@
+import argparse
+import datetime
+import json
+import os
+import time
+import numpy as np
+from db_config import get_oracle_conn
+
+# 间隔重复调度参数
+SCHEDULER_CONFIG = {
+    # SM-2 难度系数的初始值和下限
+    "initial_ease": float(os.getenv("SCHEDULER_INITIAL_EASE", "2.5")),
+    "min_ease": float(os.getenv("SCHEDULER_MIN_EASE", "1.3")),
+    # 间隔（天）的上限，以及作答后对新间隔整体缩放的系数
+    "max_interval": float(os.getenv("SCHEDULER_MAX_INTERVAL", "365")),
+    "interval_modifier": float(os.getenv("SCHEDULER_INTERVAL_MODIFIER", "1.0")),
+    # 到期那一刻预期的回忆概率；当前回忆概率按遗忘曲线 target_retention ** (已过天数 / 间隔) 衰减
+    "target_retention": float(os.getenv("SCHEDULER_TARGET_RETENTION", "0.9")),
+    # 批量重算时每批从服务器端游标取回、写回的行数
+    "batch_size": int(os.getenv("SCHEDULER_BATCH_SIZE", "50000")),
+}
+
+# 作答质量 0~5（SM-2），>= PASS_GRADE 视为记住
+PASS_GRADE = 3
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+def to_days(value: datetime.datetime) -> float:
+    # 时间统一换算成自 1970-01-01 起的天数，与 SQL 中 CAST(... AS DATE) - DATE '1970-01-01' 一致
+    return (value - _EPOCH).total_seconds() / 86400
+
+def from_days(days: float) -> datetime.datetime:
+    return _EPOCH + datetime.timedelta(days=float(days))
+
+def _ease(ease, config):
+    ease = np.asarray(ease, dtype=np.float64)
+    return np.where(np.isnan(ease), config["initial_ease"], np.maximum(ease, config["min_ease"]))
+
+def implied_interval(repeat_count, ease):
+    # 没有保存间隔的旧数据按 SM-2 的标准序列推算：1, 6, 6 * EF, 6 * EF^2 ...
+    n = np.asarray(repeat_count, dtype=np.float64)
+    n = np.where(np.isnan(n), 0, n)
+    ease = np.asarray(ease, dtype=np.float64)
+    return np.where(n <= 1, 1.0, 6.0 * np.power(ease, np.maximum(n - 2, 0)))
+
+def review(repeat_count, ease, interval, grade, now_days, config=SCHEDULER_CONFIG):
+    # 按 SM-2 规则由作答质量计算下一次复习，所有参数可以是标量或等长数组，返回各列的新值
+    n = np.asarray(repeat_count, dtype=np.float64)
+    n = np.where(np.isnan(n), 0, n)
+    q = np.clip(np.asarray(grade, dtype=np.float64), 0, 5)
+    interval = np.asarray(interval, dtype=np.float64)
+    passed = q >= PASS_GRADE
+    ease = np.maximum(_ease(ease, config) + 0.1 - (5 - q) * (0.08 + (5 - q) * 0.02), config["min_ease"])
+    previous = np.where(np.isnan(interval) | (interval <= 0), implied_interval(n, ease), interval)
+    next_interval = np.where(n == 0, 1.0, np.where(n == 1, 6.0, np.rint(previous * ease)))
+    next_interval = np.where(passed, next_interval * config["interval_modifier"], 1.0)
+    next_interval = np.clip(next_interval, 1.0, config["max_interval"])
+    now_days = np.asarray(now_days, dtype=np.float64)
+    return {
+        "repeat_count": np.where(passed, n + 1, 0).astype(np.int64),
+        "ease_factor": np.round(ease, 2),
+        "interval_days": next_interval,
+        "last_review": np.broadcast_to(now_days, next_interval.shape).astype(np.float64),
+        "review_date": now_days + next_interval,
+        # 刚复习完，回忆概率为 1，之后读取时按遗忘曲线衰减（RECALL_SQL）
+        "memory_strength": np.ones_like(next_interval),
+    }
+
+# 复习日期与「上次复习时间 + 间隔」相差超过该值（天）的行视为手动改过日期；DATE 列只精确到秒
+_MOVED_TOLERANCE = 60 / 86400
+
+def retune(repeat_count, ease, interval, last_review, review_date, config=SCHEDULER_CONFIG):
+    # 不产生新作答，按当前参数重新计算每行的间隔和复习日期。
+    # 复习日期与上次复习时间、间隔不一致的行是通过 PUT /review/{id} 手动改过日期的，保留原复习日期。
+    # 记忆强度不随时间写回，读取时按遗忘曲线计算（见 RECALL_SQL）
+    ease = np.round(_ease(ease, config), 2)
+    stored = np.asarray(interval, dtype=np.float64)
+    review_date = np.asarray(review_date, dtype=np.float64)
+    last_review = np.asarray(last_review, dtype=np.float64)
+    moved = (stored > 0) & (np.abs(review_date - last_review - stored) > _MOVED_TOLERANCE)
+    interval = np.where(np.isnan(stored) | (stored <= 0), implied_interval(repeat_count, ease), stored)
+    interval = np.clip(interval, 1.0, config["max_interval"])
+    # 没有上次复习时间的旧数据，用原复习日期倒推
+    last_review = np.where(np.isnan(last_review), review_date - interval, last_review)
+    return {
+        "ease_factor": ease,
+        "interval_days": interval,
+        "last_review": last_review,
+        "review_date": np.where(moved, review_date, last_review + interval),
+    }
+
+# 当前回忆概率（遗忘曲线 target_retention ** (已过天数 / 间隔)）的 SQL 表达式，读取时计算、不写回表。
+# {r} 为 ReviewSchedule 的别名，需绑定 :retention；没有上次复习时间的旧数据用复习日期倒推
+RECALL_SQL = '''POWER(:retention, GREATEST(
+    SYSDATE
+    - NVL(CAST({r}.last_review_time AS DATE), CAST({r}.review_date AS DATE) - GREATEST(NVL({r}.interval_days, 0), 1)), 0
+) / GREATEST(NVL({r}.interval_days, 0), 1))'''
+
+_RETUNE_SELECT = '''
+    SELECT schedule_id, repeat_count, ease_factor, interval_days,
+           CAST(last_review_time AS DATE) - DATE '1970-01-01',
+           CAST(review_date AS DATE) - DATE '1970-01-01'
+    FROM ReviewSchedule
+'''
+
+_RETUNE_UPDATE = '''
+    UPDATE ReviewSchedule
+    SET ease_factor = :1, interval_days = :2,
+        last_review_time = DATE '1970-01-01' + :3,
+        review_date = DATE '1970-01-01' + :4
+    WHERE schedule_id = :5
+'''
+
+def retune_schedules(user_id=None, config=SCHEDULER_CONFIG):
+    # 批量重算某个用户（user_id 为 None 时为全部用户）的复习计划：
+    # 服务器端游标逐批取行，每批转换成数组一次性计算，只把有变化的行用 executemany 写回。
+    # 参数不变时只有缺少状态列的旧数据需要补齐，其余行不会被改写
+    started = time.perf_counter()
+    conn = get_oracle_conn()
+    cursor = conn.cursor()
+    write_cursor = conn.cursor()
+    try:
+        query = _RETUNE_SELECT
+        params = {}
+        if user_id is not None:
+            query += ' WHERE user_id = :user_id'
+            params['user_id'] = user_id
+        cursor.arraysize = config["batch_size"]
+        cursor.prefetchrows = config["batch_size"]
+        cursor.execute(query, params)
+        scanned = updated = 0
+        while True:
+            rows = cursor.fetchmany(config["batch_size"])
+            if not rows:
+                break
+            scanned += len(rows)
+            columns = np.array(rows, dtype=np.float64).T
+            schedule_id, repeat_count, ease, interval, last_review, review_date = columns
+            result = retune(repeat_count, ease, interval, last_review, review_date, config)
+            changed = (
+                np.isnan(ease) | np.isnan(interval) | np.isnan(last_review)
+                | (result["ease_factor"] != ease)
+                | (result["interval_days"] != interval)
+                | (np.abs(result["review_date"] - review_date) > 1 / 86400)
+            )
+            if changed.any():
+                batch = np.column_stack([
+                    result["ease_factor"], result["interval_days"], result["last_review"],
+                    result["review_date"], schedule_id,
+                ])[changed]
+                rows_out = batch.tolist()
+                for row in rows_out:
+                    row[4] = int(row[4])
+                write_cursor.executemany(_RETUNE_UPDATE, rows_out)
+                conn.commit()
+                updated += len(rows_out)
+        return {
+            "scanned": scanned,
+            "updated": updated,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+    finally:
+        write_cursor.close()
+        cursor.close()
+        conn.close()
+
+if __name__ == "__main__":
+    # 供定时任务调用，整理复习计划（见 retune_schedules）：python scheduler.py [--user-id N]
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--user-id", type=int, default=None)
+    args = parser.parse_args()
+    print(json.dumps(retune_schedules(args.user_id)))
@@ -1,7 +1,18 @@
-from fastapi import APIRouter, Query, HTTPException
+import asyncio
+import csv
+import io
+import json
+import os
+import oracledb
+from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
-from db_config import get_oracle_conn
+from db_config import get_oracle_conn, get_async_conn, tune_cursor
+from hydrate import hydrate_words_async, load_words
+from users import require_admin
+from search_index import word_index, translation_index, fuzzy_index, ensure_indexes_fresh, FUZZY_MAX_DISTANCE, MAX_RESULTS
 
 router = APIRouter()
 
@@ -9,133 +20,417 @@ class SearchResult(BaseModel):
     words: List[Dict[str, Any]]
     lists: List[Dict[str, Any]]
     users: List[Dict[str, Any]]
+    partial: bool = False
+    timed_out: List[str] = []
 
-@router.get("/search")
-def global_search(query: str = Query(..., min_length=1), type: str = Query("all")):
+class WordSuggestion(BaseModel):
+    word_id: int
+    word: str
+    list_id: Optional[int] = None
+
+@router.get("/search/suggest", response_model=List[WordSuggestion])
+def suggest_words(q: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=50)):
+    # 输入联想：走内存索引，只有其他 worker 修改过单词时才从数据库重新加载这些单词
+    ensure_indexes_fresh()
+    return word_index.search(q, limit)
+
+@router.get("/search/translation")
+def search_by_translation(q: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=50)):
+    # 按中文释义反查单词：倒排索引给出排序后的 word_id，只补全前 limit 个
+    ensure_indexes_fresh()
+    ranked = translation_index.search(q, limit)
+    if not ranked:
+        return []
     conn = get_oracle_conn()
     cursor = conn.cursor()
     try:
-        result = {"words": [], "lists": [], "users": []}
-        
-        if type in ["words", "all"]:
-            cursor.execute('SELECT word_id, word, list_id FROM Word WHERE LOWER(word) LIKE LOWER(:query)', query=f'%{query}%')
-            for word_id, word, list_id in cursor.fetchall():
-                cursor.execute('SELECT translation, word_type FROM WordTranslation WHERE word_id = :word_id ORDER BY word_type', word_id=word_id)
-                translations = [{"translation": t, "type": ty} for t, ty in cursor.fetchall()]
-                cursor.execute('SELECT phrase, translation FROM WordPhrase WHERE word_id = :word_id', word_id=word_id)
-                phrases = [{"phrase": str(p), "translation": str(tr)} for p, tr in cursor.fetchall()]
-                result["words"].append({
-                    "word_id": word_id,
-                    "word": word,
-                    "translations": translations,
-                    "phrases": phrases,
-                    "list_id": list_id
-                })
-        
-        if type in ["lists", "all"]:
-            cursor.execute("SELECT l.list_id, l.list_name, l.description, l.creator_id, TO_CHAR(l.create_time, 'YYYY-MM-DD HH24:MI:SS') as create_time, l.is_public, (SELECT COUNT(*) FROM Word w WHERE w.list_id = l.list_id) as word_count FROM WordList l WHERE LOWER(l.list_name) LIKE LOWER(:query) OR LOWER(l.description) LIKE LOWER(:query)", query=f'%{query}%')
-            for row in cursor.fetchall():
-                result["lists"].append({
-                    "list_id": row[0],
-                    "list_name": row[1],
-                    "description": row[2],
-                    "creator_id": row[3],
-                    "create_time": row[4],
-                    "is_public": row[5],
-                    "word_count": row[6]
-                })
-        
-        if type in ["users", "all"]:
-            cursor.execute("SELECT user_id, username, role, email, TO_CHAR(create_time, 'YYYY-MM-DD HH24:MI:SS') as create_time FROM \"User\" WHERE LOWER(username) LIKE LOWER(:query) OR LOWER(email) LIKE LOWER(:query)", query=f'%{query}%')
-            for row in cursor.fetchall():
-                result["users"].append({
-                    "user_id": row[0],
-                    "username": row[1],
-                    "role": row[2],
-                    "email": row[3],
-                    "create_time": row[4]
-                })
-        
-        return result
+        words = {w["word_id"]: w for w in load_words(cursor, [word_id for word_id, _ in ranked])}
+        return [dict(words[word_id], score=score) for word_id, score in ranked if word_id in words]
     finally:
         cursor.close()
         conn.close()
 
-@router.get("/export")
-def export_data(user_id: int, type: str = Query("all")):
-    conn = get_oracle_conn()
+# 全局搜索各分支的默认超时（毫秒），超时的分支返回空结果并在响应中标记 partial
+SEARCH_BRANCH_TIMEOUT_MS = int(os.getenv("SEARCH_BRANCH_TIMEOUT_MS", "2000"))
+# 协程级超时比 call_timeout 多留一点余量，正常情况下由数据库侧先中止，连接可以安全归还连接池
+_BRANCH_GRACE_SECONDS = 0.25
+SEARCH_BRANCHES = ("words", "lists", "users")
+
+class _BranchTimeout(Exception):
+    pass
+
+async def _run_branch(timeout_ms, work):
+    # 每个分支使用独立的池连接；call_timeout 让数据库侧的往返也在超时后中止
+    conn = await get_async_conn()
+    try:
+        conn.call_timeout = timeout_ms
+        cursor = tune_cursor(conn.cursor(), "list")
+        try:
+            return await work(cursor)
+        except oracledb.DatabaseError as e:
+            error = e.args[0] if e.args else None
+            if getattr(error, "full_code", "") in ("DPY-4024", "ORA-03156"):
+                raise _BranchTimeout()
+            raise
+        finally:
+            cursor.close()
+    finally:
+        conn.call_timeout = 0
+        await conn.close()
+
+async def _search_words(query, limit, offset, fuzzy, max_distance, timeout_ms):
+    # 由内存索引排序并截断，只补全命中的这一页单词；重放其他 worker 的变更可能访问数据库，放到线程池执行
+    await run_in_threadpool(ensure_indexes_fresh)
+    if fuzzy:
+        # 拼写容错：按编辑距离、学习次数排序，结果带 distance 字段；max_distance 缺省时按查询长度自动决定
+        hits = fuzzy_index.search(query, offset + limit, max_distance)[offset:]
+    else:
+        hits = word_index.search(query, offset + limit)[offset:]
+    if not hits:
+        return []
+
+    async def work(cursor):
+        return await hydrate_words_async(cursor, [(h["word_id"], h["word"], h["list_id"]) for h in hits])
+
+    words = await _run_branch(timeout_ms, work)
+    if fuzzy:
+        for word, hit in zip(words, hits):
+            word["distance"] = hit["distance"]
+    return words
+
+async def _search_lists(query, limit, offset, timeout_ms):
+    async def work(cursor):
+        # 先筛出这一页词表，再与按 list_id 分组的单词计数连接，不再对每个词表执行一次相关子查询
+        await cursor.execute('''
+            WITH matched AS (
+                SELECT list_id, list_name, description, creator_id, create_time, is_public
+                FROM WordList
+                WHERE LOWER(list_name) LIKE LOWER(:query) OR LOWER(description) LIKE LOWER(:query)
+                ORDER BY list_id
+                OFFSET :offset ROWS FETCH NEXT :limit ROWS ONLY
+            ),
+            counts AS (
+                SELECT w.list_id, COUNT(*) as word_count
+                FROM Word w
+                JOIN matched m ON w.list_id = m.list_id
+                GROUP BY w.list_id
+            )
+            SELECT m.list_id, m.list_name, m.description, m.creator_id,
+                   TO_CHAR(m.create_time, 'YYYY-MM-DD HH24:MI:SS') as create_time, m.is_public,
+                   NVL(c.word_count, 0) as word_count
+            FROM matched m
+            LEFT JOIN counts c ON c.list_id = m.list_id
+            ORDER BY m.list_id
+        ''', query=f'%{query}%', offset=offset, limit=limit)
+        return [{
+            "list_id": row[0],
+            "list_name": row[1],
+            "description": row[2],
+            "creator_id": row[3],
+            "create_time": row[4],
+            "is_public": row[5],
+            "word_count": row[6]
+        } for row in await cursor.fetchall()]
+
+    return await _run_branch(timeout_ms, work)
+
+async def _search_users(query, limit, offset, timeout_ms):
+    async def work(cursor):
+        await cursor.execute(
+            "SELECT user_id, username, role, email, TO_CHAR(create_time, 'YYYY-MM-DD HH24:MI:SS') as create_time FROM \"User\" "
+            "WHERE LOWER(username) LIKE LOWER(:query) OR LOWER(email) LIKE LOWER(:query) "
+            "ORDER BY user_id OFFSET :offset ROWS FETCH NEXT :limit ROWS ONLY",
+            query=f'%{query}%', offset=offset, limit=limit)
+        return [{
+            "user_id": row[0],
+            "username": row[1],
+            "role": row[2],
+            "email": row[3],
+            "create_time": row[4]
+        } for row in await cursor.fetchall()]
+
+    return await _run_branch(timeout_ms, work)
+
+@router.get("/search")
+async def global_search(
+    query: str = Query(..., min_length=1),
+    type: str = Query("all"),
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    fuzzy: bool = Query(False),
+    max_distance: Optional[int] = Query(None, ge=0, le=FUZZY_MAX_DISTANCE),
+    timeout_ms: int = Query(SEARCH_BRANCH_TIMEOUT_MS, ge=1, le=30000),
+    # 各分支单独的分页参数，未指定时使用 limit / offset
+    words_limit: Optional[int] = Query(None, ge=1, le=200),
+    words_offset: Optional[int] = Query(None, ge=0),
+    lists_limit: Optional[int] = Query(None, ge=1, le=200),
+    lists_offset: Optional[int] = Query(None, ge=0),
+    users_limit: Optional[int] = Query(None, ge=1, le=200),
+    users_offset: Optional[int] = Query(None, ge=0),
+):
+    # type=all 时三个分支并发执行，总耗时取决于最慢的分支而不是三者之和
+    page = lambda value, default: default if value is None else value
+    branches = {}
+    if type in ["words", "all"]:
+        # 单词分支由内存索引排序，最多只保留前 MAX_RESULTS 个结果，超出部分无法分页取到
+        if page(words_offset, offset) + page(words_limit, limit) > MAX_RESULTS:
+            raise HTTPException(status_code=400, detail=f"单词搜索结果最多 {MAX_RESULTS} 条，offset + limit 不能超过该值")
+        branches["words"] = _search_words(query, page(words_limit, limit), page(words_offset, offset), fuzzy, max_distance, timeout_ms)
+    if type in ["lists", "all"]:
+        branches["lists"] = _search_lists(query, page(lists_limit, limit), page(lists_offset, offset), timeout_ms)
+    if type in ["users", "all"]:
+        branches["users"] = _search_users(query, page(users_limit, limit), page(users_offset, offset), timeout_ms)
+
+    async def guarded(coro):
+        # 超时的分支返回 None，不影响其他分支
+        try:
+            return await asyncio.wait_for(coro, timeout_ms / 1000 + _BRANCH_GRACE_SECONDS)
+        except (asyncio.TimeoutError, _BranchTimeout):
+            return None
+
+    outcomes = await asyncio.gather(*(guarded(coro) for coro in branches.values()))
+    result = {name: [] for name in SEARCH_BRANCHES}
+    timed_out = []
+    for name, outcome in zip(branches, outcomes):
+        if outcome is None:
+            timed_out.append(name)
+        else:
+            result[name] = outcome
+    result["partial"] = bool(timed_out)
+    result["timed_out"] = timed_out
+    return result
+
+# 导出时服务器端游标每次取回的行数，也是每个输出块包含的行数
+EXPORT_BATCH_SIZE = 1000
+# 班级导出一次最多指定的学生数（Oracle IN 列表上限）
+EXPORT_MAX_USERS = 1000
+
+EXPORT_MEDIA_TYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+# CSV 为扁平结构：type=all 时单词和学习进度共用一组列，section 列区分来源
+USER_EXPORT_COLUMNS = ["section", "word_id", "word", "list_id", "translations", "phrases", "study_count", "last_study_time", "accuracy"]
+PROGRESS_EXPORT_COLUMNS = ["user_id", "username", "word_id", "word", "list_id", "study_count", "last_study_time", "accuracy"]
+
+_USER_WORDS_SQL = '''
+    SELECT w.word_id, w.word, w.list_id
+    FROM Word w
+    WHERE EXISTS (SELECT 1 FROM StudyLog s WHERE s.word_id = w.word_id AND s.user_id = :user_id)
+    ORDER BY w.word_id
+'''
+
+_USER_PROGRESS_SQL = '''
+    SELECT w.word,
+           COUNT(*) as study_count,
+           MAX(s.study_time) as last_study_time,
+           AVG(CASE WHEN s.status = 'known' THEN 1 ELSE 0 END) as accuracy
+    FROM StudyLog s
+    JOIN Word w ON s.word_id = w.word_id
+    WHERE s.user_id = :user_id
+    GROUP BY w.word
+    ORDER BY w.word
+'''
+
+def _format_time(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S') if value else None
+
+def _csv_cell(value):
+    # 嵌套的翻译、短语在 CSV 中拼成一个单元格
+    if isinstance(value, list):
+        return ' | '.join(
+            f"{item['phrase']}: {item['translation']}" if 'phrase' in item else item['translation']
+            for item in value
+        )
+    return '' if value is None else value
+
+async def _fetch_batches(cursor, query, params):
+    # 服务器端游标逐批取行，不把整个结果集放进内存
+    cursor.arraysize = EXPORT_BATCH_SIZE
+    cursor.prefetchrows = EXPORT_BATCH_SIZE
+    await cursor.execute(query, params)
+    while True:
+        rows = await cursor.fetchmany(EXPORT_BATCH_SIZE)
+        if not rows:
+            break
+        yield rows
+
+async def _user_word_batches(cursor, detail_cursor, user_id):
+    async for rows in _fetch_batches(cursor, _USER_WORDS_SQL, {"user_id": user_id}):
+        yield await hydrate_words_async(detail_cursor, rows)
+
+async def _user_progress_batches(cursor, user_id):
+    async for rows in _fetch_batches(cursor, _USER_PROGRESS_SQL, {"user_id": user_id}):
+        yield [{
+            "word": row[0],
+            "study_count": row[1],
+            "last_study_time": _format_time(row[2]),
+            "accuracy": float(row[3]) if row[3] is not None else 0
+        } for row in rows]
+
+async def _encode(sections, format, columns):
+    # sections 为 (名称, 异步批次迭代器) 列表，每个批次编码成一个输出块
+    if format == "json":
+        # 与原接口相同的 {"words": [...], "progress": [...]} 结构，分块输出
+        yield '{'
+        for index, (name, batches) in enumerate(sections):
+            yield ('' if index == 0 else ', ') + json.dumps(name) + ': ['
+            first = True
+            async for batch in batches:
+                chunk = ', '.join(json.dumps(item, ensure_ascii=False) for item in batch)
+                if chunk:
+                    yield ('' if first else ', ') + chunk
+                    first = False
+            yield ']'
+        yield '}'
+    elif format == "ndjson":
+        async for name, batch in _flatten(sections):
+            yield ''.join(json.dumps(dict(item, section=name), ensure_ascii=False) + '\n' for item in batch)
+    else:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        # 带 BOM，Excel 打开中文不乱码
+        buffer.write('\ufeff')
+        writer.writerow(columns)
+        async for name, batch in _flatten(sections):
+            for item in batch:
+                row = dict(item, section=name)
+                writer.writerow([_csv_cell(row.get(column)) for column in columns])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+
+async def _flatten(sections):
+    for name, batches in sections:
+        async for batch in batches:
+            yield name, batch
+
+def _check_format(format):
+    if format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="format 只支持 json、ndjson、csv")
+
+async def _started(batches):
+    # 先取出第一批（执行查询并取回第一批行），再返回从这一批开始的迭代器
+    try:
+        first = await batches.__anext__()
+    except StopAsyncIteration:
+        return batches
+
+    async def resumed():
+        yield first
+        async for batch in batches:
+            yield batch
+    return resumed()
+
+async def _export_response(stream, format, filename):
+    # 生成器在第一块之前取连接、执行第一条查询并取回第一批行；先取出第一块再返回响应，
+    # 连接池耗尽（503）、权限不足或 SQL 出错时仍能返回正常的错误响应，而不是截断的 200
+    try:
+        first = await stream.__anext__()
+    except StopAsyncIteration:
+        first = ''
+
+    async def body():
+        yield first
+        async for chunk in stream:
+            yield chunk
+
+    return StreamingResponse(
+        body(),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{format}"'},
+    )
+
+async def _stream_user_export(user_id, type, format):
+    conn = await get_async_conn()
     cursor = conn.cursor()
+    detail_cursor = conn.cursor()
     try:
-        result = {"words": [], "progress": []}
-        
+        sections = []
         if type in ["words", "all"]:
-            # 获取单词列表
-            cursor.execute('''
-                WITH word_data AS (
-                    SELECT DISTINCT w.word_id, w.word, w.list_id
-                    FROM Word w
-                    JOIN StudyLog s ON w.word_id = s.word_id
-                    WHERE s.user_id = :user_id
-                )
-                SELECT * FROM word_data
-            ''', user_id=user_id)
-            
-            words = cursor.fetchall()
-            
-            # 对每个单词获取翻译和短语
-            for word_id, word, list_id in words:
-                # 获取翻译
-                cursor.execute('''
-                    SELECT translation, word_type
-                    FROM WordTranslation
-                    WHERE word_id = :word_id
-                    ORDER BY word_type
-                ''', word_id=word_id)
-                
-                translations = []
-                for trans, word_type in cursor.fetchall():
-                    translations.append({"translation": trans, "type": word_type})
-                
-                # 获取短语
-                cursor.execute('''
-                    SELECT phrase, translation
-                    FROM WordPhrase
-                    WHERE word_id = :word_id
-                ''', word_id=word_id)
-                
-                phrases = []
-                for phrase, trans in cursor.fetchall():
-                    phrases.append({"phrase": str(phrase), "translation": str(trans)})
-                
-                result["words"].append({
-                    "word_id": word_id,
-                    "word": word,
-                    "translations": translations,
-                    "phrases": phrases,
-                    "list_id": list_id
-                })
-        
+            sections.append(("words", _user_word_batches(cursor, detail_cursor, user_id)))
         if type in ["progress", "all"]:
-            cursor.execute('''
-                SELECT w.word, 
-                       COUNT(*) as study_count,
-                       MAX(s.study_time) as last_study_time,
-                       AVG(CASE WHEN s.status = 'known' THEN 1 ELSE 0 END) as accuracy
-                FROM StudyLog s
-                JOIN Word w ON s.word_id = w.word_id
-                WHERE s.user_id = :user_id
-                GROUP BY w.word
-            ''', user_id=user_id)
-            
-            for row in cursor.fetchall():
-                result["progress"].append({
-                    "word": row[0],
-                    "study_count": row[1],
-                    "last_study_time": row[2].strftime('%Y-%m-%d %H:%M:%S') if row[2] else None,
-                    "accuracy": float(row[3]) if row[3] is not None else 0
-                })
-        
-        return result
+            sections.append(("progress", _user_progress_batches(cursor, user_id)))
+        # 两部分共用一个游标，只能提前执行第一部分的查询
+        if sections:
+            sections[0] = (sections[0][0], await _started(sections[0][1]))
+        async for chunk in _encode(sections, format, USER_EXPORT_COLUMNS):
+            yield chunk
+    finally:
+        detail_cursor.close()
+        cursor.close()
+        await conn.close()
+
+@router.get("/export")
+async def export_data(user_id: int, type: str = Query("all"), format: str = Query("json", description="json / ndjson / csv")):
+    # 逐批查询、补全、编码并立即发送，内存占用与导出行数无关
+    _check_format(format)
+    return await _export_response(_stream_user_export(user_id, type, format), format, f"export_{user_id}")
+
+async def _stream_progress_export(list_id, user_ids, format):
+    conn = await get_async_conn()
+    cursor = conn.cursor()
+    try:
+        conditions = []
+        params = {}
+        if list_id is not None:
+            conditions.append('w.list_id = :list_id')
+            params["list_id"] = list_id
+        if user_ids:
+            names = [f'uid{i}' for i in range(len(user_ids))]
+            conditions.append(f"s.user_id IN ({', '.join(':' + n for n in names)})")
+            params.update(zip(names, user_ids))
+        query = f'''
+            SELECT s.user_id, u.username, w.word_id, w.word, w.list_id,
+                   COUNT(*) as study_count,
+                   MAX(s.study_time) as last_study_time,
+                   AVG(CASE WHEN s.status = 'known' THEN 1 ELSE 0 END) as accuracy
+            FROM StudyLog s
+            JOIN Word w ON s.word_id = w.word_id
+            JOIN "User" u ON s.user_id = u.user_id
+            WHERE {' AND '.join(conditions)}
+            GROUP BY s.user_id, u.username, w.word_id, w.word, w.list_id
+            ORDER BY s.user_id, w.word_id
+        '''
+
+        async def batches():
+            async for rows in _fetch_batches(cursor, query, params):
+                yield [{
+                    "user_id": row[0],
+                    "username": row[1],
+                    "word_id": row[2],
+                    "word": row[3],
+                    "list_id": row[4],
+                    "study_count": row[5],
+                    "last_study_time": _format_time(row[6]),
+                    "accuracy": float(row[7]) if row[7] is not None else 0
+                } for row in rows]
+
+        async for chunk in _encode([("progress", await _started(batches()))], format, PROGRESS_EXPORT_COLUMNS):
+            yield chunk
     finally:
         cursor.close()
-        conn.close() 
\ No newline at end of file
+        await conn.close()
+
+@router.get("/export/progress", dependencies=[Depends(require_admin)])
+async def export_progress(
+    list_id: Optional[int] = None,
+    user_ids: Optional[str] = Query(None, description="逗号分隔的学生 ID，用于导出一个班级"),
+    format: str = Query("csv", description="json / ndjson / csv"),
+):
+    # 教师导出：某个词表下所有学生、或指定一组学生（班级）的逐词学习进度；目前只对管理员开放（见 users.require_admin）
+    _check_format(format)
+    try:
+        ids = [int(i) for i in user_ids.split(',') if i.strip()] if user_ids else []
+    except ValueError:
+        raise HTTPException(status_code=400, detail="user_ids 格式错误")
+    if list_id is None and not ids:
+        raise HTTPException(status_code=400, detail="需要指定 list_id 或 user_ids")
+    if len(ids) > EXPORT_MAX_USERS:
+        raise HTTPException(status_code=400, detail=f"一次最多导出 {EXPORT_MAX_USERS} 名学生")
+    name = f"progress_list_{list_id}" if list_id is not None else "progress_users"
+    return await _export_response(_stream_progress_export(list_id, ids, format), format, name)
@@ -0,0 +1,685 @@
+import bisect
+import heapq
+import logging
+import math
+import os
+import re
+import threading
+from abc import ABC, abstractmethod
+from array import array
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+from fastapi import HTTPException
+from db_config import get_oracle_conn
+from hydrate import load_words
+from word_cache import word_changes, ChangeLog
+
+logger = logging.getLogger(__name__)
+
+# 子串匹配使用的 n-gram 长度，短于该长度的查询在内存词表上直接扫描
+NGRAM = 3
+# 单次查询最多返回的结果数
+MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "200"))
+# 其他 worker 的变更超过该条数（或变更日志被清理）时不再逐个重放，改为后台全量重建
+REPLAY_MAX = int(os.getenv("SEARCH_REPLAY_MAX", "5000"))
+# 变更日志超过该字节数（默认约 100 万条）时，下一次全量重建前把它换成新文件，各 worker 随后各自重建一次
+CHANGE_LOG_MAX = int(os.getenv("SEARCH_CHANGE_LOG_MAX", str(8 * 1024 * 1024)))
+
+def _ngrams(text: str) -> Set[str]:
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+class _CatalogueIndex(ABC):
+    # 全量构建在一个新对象中完成后整体替换，构建期间查询继续使用旧数据；
+    # 增量更新（本进程的写入和重放其他 worker 的变更）由 SearchIndexes 调用 add / remove
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built = False
+
+    def build(self, cursor):
+        fresh = type(self)()
+        fresh._load(cursor)
+        with self._lock:
+            for name, value in vars(fresh).items():
+                if name != "_lock":
+                    setattr(self, name, value)
+            self._built = True
+
+    @abstractmethod
+    def _load(self, cursor):
+        # 从数据库读取全部数据填充本对象（此时对象尚未对外可见，无需加锁）
+        ...
+
+    @abstractmethod
+    def add(self, words):
+        # words 为补全后的单词字典（word_id / word / list_id / translations / phrases），已存在的 word_id 先删除再加入
+        ...
+
+    @abstractmethod
+    def remove(self, word_ids):
+        ...
+
+    @property
+    def ready(self) -> bool:
+        return self._built
+
+class WordIndex(_CatalogueIndex):
+    # Word.word 的内存索引：有序数组做前缀匹配，n-gram 倒排表做子串匹配
+    def __init__(self):
+        super().__init__()
+        self._words: Dict[int, Tuple[str, Optional[int]]] = {}  # word_id -> (word, list_id)
+        self._sorted: List[Tuple[str, int]] = []                # (小写单词, word_id)
+        self._grams: Dict[str, Set[int]] = {}
+
+    def _load(self, cursor):
+        cursor.execute('SELECT word_id, word, list_id FROM Word')
+        for word_id, word, list_id in cursor.fetchall():
+            self._insert(word_id, word, list_id)
+        self._sorted.sort()
+
+    def _insert(self, word_id: int, word: str, list_id: Optional[int], keep_sorted: bool = False):
+        key = word.lower()
+        self._words[word_id] = (word, list_id)
+        if keep_sorted:
+            bisect.insort(self._sorted, (key, word_id))
+        else:
+            self._sorted.append((key, word_id))
+        for gram in _ngrams(key):
+            self._grams.setdefault(gram, set()).add(word_id)
+
+    def add(self, words):
+        with self._lock:
+            for w in words:
+                if w["word_id"] in self._words:
+                    self._delete(w["word_id"])
+                self._insert(w["word_id"], w["word"], w.get("list_id"), keep_sorted=True)
+
+    def remove(self, word_ids):
+        with self._lock:
+            for word_id in word_ids:
+                self._delete(word_id)
+
+    def _delete(self, word_id: int):
+        entry = self._words.pop(word_id, None)
+        if entry is None:
+            return
+        key = entry[0].lower()
+        i = bisect.bisect_left(self._sorted, (key, word_id))
+        if i < len(self._sorted) and self._sorted[i] == (key, word_id):
+            del self._sorted[i]
+        for gram in _ngrams(key):
+            posting = self._grams.get(gram)
+            if posting is not None:
+                posting.discard(word_id)
+                if not posting:
+                    del self._grams[gram]
+
+    def _prefix(self, q: str, limit: int) -> List[int]:
+        start = bisect.bisect_left(self._sorted, (q, -1))
+        ids = []
+        for key, word_id in self._sorted[start:]:
+            if not key.startswith(q) or len(ids) >= limit:
+                break
+            ids.append(word_id)
+        return ids
+
+    def _substring(self, q: str) -> List[int]:
+        if len(q) < NGRAM:
+            return [word_id for key, word_id in self._sorted if q in key]
+        postings = sorted((self._grams.get(g, set()) for g in _ngrams(q)), key=len)
+        candidates = set.intersection(*postings) if postings and postings[0] else set()
+        return [word_id for word_id in candidates if q in self._words[word_id][0].lower()]
+
+    def search(self, query: str, limit: int = 10, prefix_only: bool = False) -> List[dict]:
+        # 排序规则：完全匹配 > 前缀匹配（短词优先）> 子串匹配（匹配位置靠前、短词优先）
+        q = query.strip().lower()
+        if not q:
+            return []
+        limit = max(1, min(limit, MAX_RESULTS))
+        with self._lock:
+            # 前缀匹配按字典序取候选，多取一些再按长度排序
+            prefix_ids = self._prefix(q, limit * 4)
+            ranked = sorted(prefix_ids, key=lambda i: (len(self._words[i][0]), self._words[i][0].lower()))
+            if len(ranked) < limit and not prefix_only:
+                seen = set(ranked)
+                others = [i for i in self._substring(q) if i not in seen]
+                others.sort(key=lambda i: (self._words[i][0].lower().find(q), len(self._words[i][0]), self._words[i][0].lower()))
+                ranked.extend(others)
+            return [
+                {"word_id": word_id, "word": self._words[word_id][0], "list_id": self._words[word_id][1]}
+                for word_id in ranked[:limit]
+            ]
+
+    def stats(self):
+        with self._lock:
+            return {"ready": self.ready, "words": len(self._words), "ngrams": len(self._grams)}
+
+# 中文释义按标点、空白和词性标记（如 n. / vt.）切分成片段，再在片段内取字符二元组
+_SEGMENT_SPLIT = re.compile(r'[a-z]+\.|[\s,.;:!?，。；：！？、（）()\[\]【】<>《》"“”\'‘’…/\\|-]+')
+# 释义命中比短语释义命中权重更高
+SOURCE_WEIGHTS = {"translation": 1.0, "phrase": 0.6}
+# 单次查询最多打分的候选文档数；高频字的倒排表很长，超出时只保留最短的释义
+CANDIDATE_CAP = int(os.getenv("TRANSLATION_CANDIDATE_CAP", "1000"))
+# 按得分上界逐批计算候选时每批的个数
+_SCORE_BATCH = 32
+
+def _segments(text: str) -> List[str]:
+    return [seg for seg in _SEGMENT_SPLIT.split(text.lower()) if seg]
+
+def _bigrams(segments: List[str]) -> Set[str]:
+    grams = set()
+    for seg in segments:
+        grams.update(seg[i:i + 2] for i in range(len(seg) - 1))
+    return grams
+
+# 删除只做标记，已删除的文档超过该比例时在内存中压缩重建
+_COMPACT_RATIO = 0.25
+
+def _grown(values: np.ndarray, size: int) -> np.ndarray:
+    grown = np.empty(size, dtype=values.dtype)
+    grown[:len(values)] = values
+    return grown
+
+def _posting_bytes(table: Dict[str, array]) -> int:
+    return sum(p.buffer_info()[1] * p.itemsize for p in table.values())
+
+class TranslationIndex(_CatalogueIndex):
+    # WordTranslation.translation 与 WordPhrase.translation 的字符二元组倒排索引，用于按中文释义反查单词。
+    # 单字查询使用单字倒排表；多字查询对二元组倒排表求交集，按 idf 加权覆盖率、整段命中和来源权重排序。
+    # 每个 worker 各有一份，存储尽量紧凑：倒排表是按文档序号递增的 array('I')（每条 4 字节），
+    # 文档的 word_id、长度、来源放在 NumPy 数组中，释义片段以 UTF-8 拼接存放在一个 bytearray 里。
+    # 合成数据上 10 万条释义约占 40 MB（原先的集合实现约 150 MB），50 万个单词（约 150 万条释义和短语释义）约 200 MB（原先约 1.7 GB），
+    # 见 benchmarks/translation_index.py
+    def __init__(self):
+        super().__init__()
+        self._reset()
+
+    def _reset(self):
+        self._count = 0  # 文档数（含已删除）
+        self._live = 0
+        self._doc_word = np.empty(1024, dtype=np.int64)    # 文档序号 -> word_id，删除后置为 -1
+        self._doc_length = np.empty(1024, dtype=np.uint32)
+        self._doc_phrase = np.empty(1024, dtype=np.bool_)  # 是否来自短语释义
+        self._text_end = np.empty(1024, dtype=np.int64)    # 文档片段在 _text 中的结束位置
+        self._text = bytearray()                           # 各文档的片段以换行分隔、UTF-8 编码后依次拼接
+        self._grams: Dict[str, array] = {}
+        self._chars: Dict[str, array] = {}
+
+    def _load(self, cursor):
+        cursor.execute('SELECT word_id, translation FROM WordTranslation')
+        for word_id, text in cursor.fetchall():
+            self._insert(word_id, text, "translation")
+        cursor.execute('SELECT word_id, translation FROM WordPhrase')
+        for word_id, text in cursor.fetchall():
+            self._insert(word_id, text, "phrase")
+
+    def _insert(self, word_id: int, text, source: str):
+        segments = _segments(str(text) if text is not None else '')
+        if segments:
+            self._append(word_id, segments, source == "phrase")
+
+    def _append(self, word_id: int, segments: List[str], phrase: bool):
+        if self._count == len(self._doc_word):
+            size = self._count * 2
+            self._doc_word = _grown(self._doc_word, size)
+            self._doc_length = _grown(self._doc_length, size)
+            self._doc_phrase = _grown(self._doc_phrase, size)
+            self._text_end = _grown(self._text_end, size)
+        doc = self._count
+        self._doc_word[doc] = word_id
+        self._doc_length[doc] = sum(len(seg) for seg in segments)
+        self._doc_phrase[doc] = phrase
+        self._text += '\n'.join(segments).encode('utf-8')
+        self._text_end[doc] = len(self._text)
+        self._count += 1
+        self._live += 1
+        # 文档序号递增，追加后倒排表仍然有序
+        for gram in _bigrams(segments):
+            self._grams.setdefault(gram, array('I')).append(doc)
+        for char in set(''.join(segments)):
+            self._chars.setdefault(char, array('I')).append(doc)
+
+    def _segments_of(self, doc: int) -> List[str]:
+        start = int(self._text_end[doc - 1]) if doc else 0
+        return self._text[start:int(self._text_end[doc])].decode('utf-8').split('\n')
+
+    def add(self, words):
+        words = list(words)
+        with self._lock:
+            self._delete([w["word_id"] for w in words])
+            for word in words:
+                for t in word.get("translations", []):
+                    self._insert(word["word_id"], t["translation"], "translation")
+                for p in word.get("phrases", []):
+                    self._insert(word["word_id"], p["translation"], "phrase")
+
+    def remove(self, word_ids):
+        with self._lock:
+            self._delete(list(word_ids))
+
+    def _delete(self, word_ids: List[int]):
+        # 倒排表中保留已删除的文档，查询时按 _doc_word 过滤
+        if not word_ids or not self._count:
+            return
+        docs = self._doc_word[:self._count]
+        dead = np.isin(docs, np.asarray(word_ids, dtype=np.int64))
+        removed = int(dead.sum())
+        if not removed:
+            return
+        docs[dead] = -1
+        self._live -= removed
+        if self._count - self._live > self._count * _COMPACT_RATIO:
+            self._compact()
+
+    def _compact(self):
+        live = [
+            (int(self._doc_word[doc]), self._segments_of(doc), bool(self._doc_phrase[doc]))
+            for doc in np.flatnonzero(self._doc_word[:self._count] >= 0).tolist()
+        ]
+        self._reset()
+        for word_id, segments, phrase in live:
+            self._append(word_id, segments, phrase)
+
+    def _segment_bonus(self, segments: List[str], doc: int) -> float:
+        doc_segments = self._segments_of(doc)
+        if not all(any(seg in d for d in doc_segments) for seg in segments):
+            return 0.0
+        # 查询的每个片段都整段出现在释义中；其中有片段与释义的某一段完全相同时再加分
+        return 1.5 if any(seg == d for seg in segments for d in doc_segments) else 1.0
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[int, float]]:
+        # 返回按得分降序的 (word_id, score)
+        segments = _segments(query)
+        if not segments:
+            return []
+        limit = max(1, min(limit, MAX_RESULTS))
+        grams, table = sorted(_bigrams(segments)), self._grams
+        if not grams:
+            # 单字查询
+            grams, table = sorted(set(''.join(segments))), self._chars
+        with self._lock:
+            postings = [np.array(table.get(g, ()), dtype=np.uintc) for g in grams]
+            total = max(self._live, 1)
+            sizes = np.array([len(p) for p in postings])
+            weights = np.log1p(total / (1 + sizes))
+            # 所有二元组都命中的文档优先；不足 limit 个时放宽为命中任一二元组，从最稀有的二元组开始合并
+            order = np.argsort(sizes, kind="stable")
+            candidates = postings[order[0]]
+            for i in order[1:]:
+                candidates = np.intersect1d(candidates, postings[i], assume_unique=True)
+            if len(candidates) < limit:
+                for i in order:
+                    if len(candidates) >= CANDIDATE_CAP:
+                        break
+                    candidates = np.union1d(candidates, postings[i])
+            candidates = candidates[self._doc_word[candidates] >= 0]
+            if not len(candidates):
+                return []
+            if len(candidates) > CANDIDATE_CAP:
+                # 高频字的倒排表很长，只保留最短的释义（长度相同时文档序号小的优先）
+                candidates = candidates[np.argsort(self._doc_length[candidates], kind="stable")[:CANDIDATE_CAP]]
+            coverage = sum(w * np.isin(candidates, p, assume_unique=True) for w, p in zip(weights, postings)) / weights.sum()
+            # 释义越短，查询词在其中占比越大
+            query_length = sum(len(s) for s in segments)
+            base = coverage + query_length / (self._doc_length[candidates] + query_length) * 0.5
+            source_weight = np.where(self._doc_phrase[candidates], SOURCE_WEIGHTS["phrase"], SOURCE_WEIGHTS["translation"])
+            # 整段命中加分最多 1.5，按得分上界从高到低逐批计算；某批的最高上界已低于当前第 limit 名时，
+            # 剩下的候选都进不了结果，不必再解码释义
+            bound = (base + 1.5) * source_weight
+            order = np.argsort(-bound, kind="stable")
+            docs, word_ids = candidates[order].tolist(), self._doc_word[candidates][order].tolist()
+            base, source_weight, bound = base[order].tolist(), source_weight[order].tolist(), bound[order].tolist()
+            best: Dict[int, float] = {}
+            for start in range(0, len(docs), _SCORE_BATCH):
+                if len(best) >= limit and bound[start] < sorted(best.values(), reverse=True)[limit - 1]:
+                    break
+                for i in range(start, min(start + _SCORE_BATCH, len(docs))):
+                    score = (base[i] + self._segment_bonus(segments, docs[i])) * source_weight[i]
+                    if score > best.get(word_ids[i], 0.0):
+                        best[word_ids[i]] = score
+            ranked = sorted(best.items(), key=lambda item: (-item[1], item[0]))
+            return [(word_id, round(score, 4)) for word_id, score in ranked[:limit]]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "documents": self._live,
+                "deleted": self._count - self._live,
+                "bigrams": len(self._grams),
+                "chars": len(self._chars),
+                # 倒排表、文档数组和释义文本占用的字节数，不含字典本身的开销
+                "bytes": _posting_bytes(self._grams) + _posting_bytes(self._chars) + len(self._text)
+                         + sum(a.nbytes for a in (self._doc_word, self._doc_length, self._doc_phrase, self._text_end)),
+            }
+
+# 模糊搜索允许的最大编辑距离，以及生成删除变体时只看单词的前 FUZZY_PREFIX_LENGTH 个字母（SymSpell 的前缀截断，控制内存）
+FUZZY_MAX_DISTANCE = int(os.getenv("FUZZY_MAX_DISTANCE", "2"))
+FUZZY_PREFIX_LENGTH = int(os.getenv("FUZZY_PREFIX_LENGTH", "7"))
+
+def _deletes(text: str, distance: int) -> Set[str]:
+    # text 删除至多 distance 个字符得到的所有字符串（含自身）
+    result = {text}
+    frontier = {text}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))} - result
+        if not frontier:
+            break
+        result |= frontier
+    return result
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    # 限制上界的编辑距离（相邻字母交换算一次编辑），超过 max_distance 时返回 max_distance + 1
+    if a == b:
+        return 0
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    # 去掉公共前缀和后缀，只对中间不同的部分做动态规划
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a = a[start:len(a) - end]
+    b = b[start:len(b) - end]
+    if not a or not b:
+        return min(max(len(a), len(b)), max_distance + 1)
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous2 is not None and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+    return min(previous[-1], max_distance + 1)
+
+def auto_distance(query: str) -> int:
+    # 未指定编辑距离时按查询长度决定：短词允许的错误更少，避免候选过多、结果过杂
+    length = len(query.strip())
+    if length <= 2:
+        return 0
+    if length <= 5:
+        return 1
+    return 2
+
+def _variant_keys(term: str, distance: int) -> List[int]:
+    # 删除变体只保存 32 位哈希：不同变体哈希相同只会多出几个候选拼写，仍由编辑距离校验，不影响结果
+    return [hash(variant) & 0xFFFFFFFF for variant in _deletes(term[:FUZZY_PREFIX_LENGTH], distance)]
+
+class FuzzyWordIndex(_CatalogueIndex):
+    # Word.word 的拼写容错索引（SymSpell 删除变体）：每个拼写的前缀删除至多 FUZZY_MAX_DISTANCE 个字母后作为键，
+    # 查询时对查询词做同样的删除，命中键的拼写再计算真实编辑距离。结果按编辑距离、学习次数排序。
+    # 变体表是两列按哈希排序的 NumPy 数组（变体哈希 -> 拼写编号），每个 (变体, 拼写) 对占 8 字节；
+    # 全量构建之后新增的拼写记在一个小字典里，删除单词不改动变体表，查询时跳过已没有单词的拼写。
+    # 合成数据上 10 万个单词约 65 MB，50 万个单词约 290 MB（原先的字典实现约 1.5 GB），见 benchmarks/fuzzy_search.py
+    def __init__(self):
+        super().__init__()
+        self._words: Dict[int, Tuple[str, Optional[int]]] = {}  # word_id -> (word, list_id)
+        self._terms: Dict[str, int] = {}                        # 小写拼写 -> 拼写编号，分配后不再回收
+        self._term_text: List[str] = []                         # 拼写编号 -> 小写拼写
+        self._term_words: List[List[int]] = []                  # 拼写编号 -> word_id 列表
+        self._keys = np.empty(0, dtype=np.uint32)               # 变体哈希，升序
+        self._key_terms = np.empty(0, dtype=np.uint32)          # 与 _keys 对应的拼写编号
+        self._extra: Dict[int, List[int]] = {}                  # 全量构建之后新增拼写的变体哈希 -> 拼写编号
+        self._frequency: Dict[int, int] = {}                    # word_id -> StudyLog 记录数
+
+    def _load(self, cursor):
+        cursor.execute('SELECT word_id, word, list_id FROM Word')
+        rows = cursor.fetchall()
+        # 词频只在全量构建时统计，新增单词按 0 计；取自按 (用户, 单词) 汇总的 WordMastery，不扫描 StudyLog
+        cursor.execute('SELECT word_id, SUM(attempt_count) FROM WordMastery GROUP BY word_id')
+        self._frequency = dict(cursor.fetchall())
+        self._fill(rows)
+
+    def _fill(self, rows):
+        # 全量构建：先收集全部 (变体哈希, 拼写编号)，最后整体排序一次
+        keys, key_terms = array('I'), array('I')
+        for word_id, word, list_id in rows:
+            term_id = self._add_word(word_id, word, list_id)
+            if term_id is not None:
+                variant_keys = _variant_keys(self._term_text[term_id], FUZZY_MAX_DISTANCE)
+                keys.extend(variant_keys)
+                key_terms.extend([term_id] * len(variant_keys))
+        keys = np.array(keys, dtype=np.uint32)
+        order = np.argsort(keys, kind="stable")
+        self._keys = keys[order]
+        self._key_terms = np.array(key_terms, dtype=np.uint32)[order]
+
+    def _add_word(self, word_id: int, word: str, list_id: Optional[int]) -> Optional[int]:
+        # 返回新出现的拼写的编号（需要为它生成变体），拼写已存在时返回 None
+        key = word.lower()
+        self._words[word_id] = (word, list_id)
+        term_id = self._terms.get(key)
+        if term_id is not None:
+            self._term_words[term_id].append(word_id)
+            return None
+        term_id = len(self._term_text)
+        self._terms[key] = term_id
+        self._term_text.append(key)
+        self._term_words.append([word_id])
+        return term_id
+
+    def add(self, words):
+        with self._lock:
+            for w in words:
+                self._delete(w["word_id"])
+                term_id = self._add_word(w["word_id"], w["word"], w.get("list_id"))
+                if term_id is not None:
+                    for key in _variant_keys(self._term_text[term_id], FUZZY_MAX_DISTANCE):
+                        self._extra.setdefault(key, []).append(term_id)
+
+    def remove(self, word_ids):
+        with self._lock:
+            for word_id in word_ids:
+                self._delete(word_id)
+                self._frequency.pop(word_id, None)
+
+    def _delete(self, word_id: int):
+        entry = self._words.pop(word_id, None)
+        if entry is None:
+            return
+        term_id = self._terms.get(entry[0].lower())
+        if term_id is not None and word_id in self._term_words[term_id]:
+            self._term_words[term_id].remove(word_id)
+
+    def search(self, query: str, limit: int = 10, max_distance: Optional[int] = None) -> List[dict]:
+        q = query.strip().lower()
+        if not q:
+            return []
+        limit = max(1, min(limit, MAX_RESULTS))
+        if max_distance is None:
+            max_distance = auto_distance(q)
+        max_distance = max(0, min(max_distance, FUZZY_MAX_DISTANCE))
+        with self._lock:
+            keys = _variant_keys(q, max_distance)
+            probe = np.array(keys, dtype=np.uint32)
+            starts = np.searchsorted(self._keys, probe, side="left").tolist()
+            ends = np.searchsorted(self._keys, probe, side="right").tolist()
+            term_ids = set()
+            for key, start, end in zip(keys, starts, ends):
+                if end > start:
+                    term_ids.update(self._key_terms[start:end].tolist())
+                term_ids.update(self._extra.get(key, ()))
+            hits = []
+            for term_id in term_ids:
+                word_ids = self._term_words[term_id]
+                if not word_ids:
+                    continue
+                term = self._term_text[term_id]
+                # 长度差已超过上限的拼写不必计算编辑距离
+                if abs(len(term) - len(q)) > max_distance:
+                    continue
+                distance = edit_distance(q, term, max_distance)
+                if distance > max_distance:
+                    continue
+                for word_id in word_ids:
+                    hits.append((distance, -self._frequency.get(word_id, 0), term, word_id))
+            hits.sort()
+            return [
+                {"word_id": word_id, "word": self._words[word_id][0], "list_id": self._words[word_id][1], "distance": distance}
+                for distance, _, _, word_id in hits[:limit]
+            ]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "words": len(self._words),
+                "terms": sum(1 for word_ids in self._term_words if word_ids),
+                "deletes": len(self._keys) + sum(len(term_ids) for term_ids in self._extra.values()),
+                # 变体表占用的字节数，不含单词和拼写字典
+                "bytes": self._keys.nbytes + self._key_terms.nbytes,
+                "max_distance": FUZZY_MAX_DISTANCE,
+                "prefix_length": FUZZY_PREFIX_LENGTH,
+            }
+
+class SearchIndexes:
+    # 单词、释义、拼写容错三个索引共用一个变更日志位置。本进程的写入直接增量更新索引并把 word_id 追加到共享变更日志；
+    # 其他 worker 查询前从自己应用到的位置往后重放，只从数据库重新加载变化的单词。
+    # 需要全量重建时（日志被清理或积压过多）在后台线程执行，同一时间只有一个，完成前继续使用旧索引。
+    # 日志超过 CHANGE_LOG_MAX 时由下一次全量重建换成新文件，其他 worker 发现 inode 变化后各自重建一次，日志不会无限增长。
+    def __init__(self, indexes, changes: ChangeLog):
+        self.indexes = indexes
+        self.changes = changes
+        self._position: Optional[Tuple[int, int]] = None  # 已应用到的日志位置 (inode, 偏移)，None 表示尚未构建
+        self._position_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()  # 同一时间只有一个线程重放或重建
+        self.replayed = 0
+        self.rebuilds = 0
+        self.failures = 0
+
+    def _advance(self, file_id: int, start: int, end: int):
+        # 只有 start 之前的变更都已应用时才前进；否则中间还有其他 worker 的变更，留给下次重放
+        with self._position_lock:
+            if self._position == (file_id, start):
+                self._position = (file_id, end)
+
+    def _rebuild(self):
+        # 先取日志位置再扫描，扫描期间其他 worker 的写入会在之后重放（重复应用无害）。
+        # 日志过长时先换成新文件：本次扫描晚于旧日志中所有写入的提交，旧记录不再需要
+        if self.changes.end()[1] > CHANGE_LOG_MAX:
+            self.changes.reset()
+        position = self.changes.end()
+        conn = get_oracle_conn()
+        cursor = conn.cursor()
+        try:
+            cursor.arraysize = 5000
+            for index in self.indexes:
+                index.build(cursor)
+        finally:
+            cursor.close()
+            conn.close()
+        with self._position_lock:
+            self._position = position
+        self.rebuilds += 1
+
+    def rebuild(self):
+        with self._refresh_lock:
+            self._rebuild()
+
+    def _rebuild_in_background(self):
+        # 调用方已持有 _refresh_lock，由后台线程在重建结束后释放
+        def run():
+            try:
+                self._rebuild()
+            except Exception:
+                self.failures += 1
+                logger.exception("search index rebuild failed")
+            finally:
+                self._refresh_lock.release()
+
+        threading.Thread(target=run, name="search-index-rebuild", daemon=True).start()
+
+    def _replay(self, file_id: int, start: int, end: int):
+        word_ids = self.changes.read(start, end)
+        conn = get_oracle_conn()
+        cursor = conn.cursor()
+        try:
+            words = load_words(cursor, word_ids)
+        finally:
+            cursor.close()
+            conn.close()
+        # 已删除的单词查不到，remove 之后不再加入
+        for index in self.indexes:
+            index.remove(word_ids)
+            index.add(words)
+        self._advance(file_id, start, end)
+        self.replayed += len(word_ids)
+
+    def ensure_fresh(self):
+        # 没有新的变更时只读一次文件大小，不访问数据库
+        end = self.changes.end()
+        position = self._position
+        if position == end:
+            return
+        if position is None:
+            # 启动时数据库不可用、索引还没建成：在后台构建，本次请求返回 503
+            if self._refresh_lock.acquire(blocking=False):
+                self._rebuild_in_background()
+            raise HTTPException(status_code=503, detail="搜索索引正在构建，请稍后重试")
+        if not self._refresh_lock.acquire(blocking=False):
+            # 其他线程正在重放或重建，先使用现有索引
+            return
+        (file_id, start), (end_file_id, end_offset) = position, end
+        if (file_id != end_file_id or end_offset < start or end_offset > CHANGE_LOG_MAX
+                or (end_offset - start) // ChangeLog.RECORD_SIZE > REPLAY_MAX):
+            self._rebuild_in_background()
+            return
+        try:
+            self._replay(file_id, start, end_offset)
+        except Exception:
+            # 重放失败时继续使用现有索引，下次查询再试
+            self.failures += 1
+            logger.exception("search index replay failed")
+        finally:
+            self._refresh_lock.release()
+
+    def apply(self, added=(), removed=()):
+        # 单词写入数据库并提交后调用：增量更新本进程的索引，再追加到变更日志通知其他 worker。
+        # added 为补全后的单词字典，removed 为 word_id 序列
+        added = list(added)
+        removed = list(removed)
+        for index in self.indexes:
+            index.remove(removed)
+            index.add(added)
+        word_ids = [w["word_id"] for w in added] + removed
+        if not word_ids:
+            return
+        file_id, start, end = self.changes.append(word_ids)
+        self._advance(file_id, start, end)
+        # 只有本进程在写时其他 worker 不一定会查询，由写入方在日志过长时触发重建（重建时换新日志）
+        if end > CHANGE_LOG_MAX and self._refresh_lock.acquire(blocking=False):
+            self._rebuild_in_background()
+
+    def stats(self):
+        return {
+            "position": self._position,
+            "log_end": self.changes.end(),
+            "refreshing": self._refresh_lock.locked(),
+            "replayed": self.replayed,
+            "rebuilds": self.rebuilds,
+            "failures": self.failures,
+        }
+
+word_index = WordIndex()
+translation_index = TranslationIndex()
+fuzzy_index = FuzzyWordIndex()
+search_indexes = SearchIndexes((word_index, translation_index, fuzzy_index), word_changes)
+
+def rebuild_indexes():
+    search_indexes.rebuild()
+
+def ensure_indexes_fresh():
+    search_indexes.ensure_fresh()
+
+def apply_word_changes(added=(), removed=()):
+    search_indexes.apply(added, removed)
@@ -0,0 +1,330 @@
+import argparse
+import datetime
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import numpy as np
+from db_config import get_oracle_conn
+from log_buffer import STUDY_STATUSES
+from scheduler import SCHEDULER_CONFIG, RECALL_SQL
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# 分析快照配置：StudyLog / ReviewSchedule / WrongWord 导出为列式 .npy 文件，供班级统计读取，不再直接查询业务库
+SNAPSHOT_CONFIG = {
+    "dir": os.getenv("SNAPSHOT_DIR", os.path.join(tempfile.gettempdir(), "dancisystem_snapshot")),
+    # 从服务器端游标每批取回的行数
+    "batch_size": int(os.getenv("SNAPSHOT_BATCH_SIZE", "50000")),
+    # StudyLog 每次增量刷新追加一个分片，分片数超过 max_parts 时合并成一个
+    "max_parts": int(os.getenv("SNAPSHOT_MAX_PARTS", "16")),
+    # 水位以下尚未出现的 log_id（未提交的事务或回滚留下的空号）在之后 gap_retention 次刷新中继续重查
+    "gap_retention": int(os.getenv("SNAPSHOT_GAP_RETENTION", "10")),
+}
+
+# 单词/用户已删除时在 word_list / user_alive 中的标记，统计时排除
+DELETED = -2
+
+_MANIFEST = "manifest.json"
+_STATUS_SQL = "DECODE(status, " + ", ".join(f"'{s}', {i}" for i, s in enumerate(STUDY_STATUSES)) + ", -1)"
+
+class SnapshotMissing(Exception):
+    pass
+
+def _read_manifest(directory):
+    try:
+        with open(os.path.join(directory, _MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def _write_manifest(directory, manifest):
+    # 先写临时文件再改名，读取方看到的清单总是完整的
+    path = os.path.join(directory, _MANIFEST)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+def _write_columns(directory, name, columns):
+    path = os.path.join(directory, name)
+    os.makedirs(path, exist_ok=True)
+    for column, values in columns.items():
+        np.save(os.path.join(path, f"{column}.npy"), values)
+    return name
+
+def _load_columns(directory, name, mmap_mode="r"):
+    path = os.path.join(directory, name)
+    return {
+        file[:-4]: np.load(os.path.join(path, file), mmap_mode=mmap_mode)
+        for file in os.listdir(path) if file.endswith(".npy")
+    }
+
+def _encode(known, ids):
+    # 字典编码：known 为 编码 -> 原始 id 的数组，只追加不重排，已写出的分片中的编码始终有效
+    ids = np.asarray(ids, dtype=np.int64)
+    new = np.setdiff1d(np.unique(ids), known, assume_unique=True)
+    if new.size:
+        known = np.concatenate([known, new])
+    order = np.argsort(known, kind="stable")
+    codes = order[np.searchsorted(known[order], ids)]
+    return known, codes.astype(np.int32)
+
+def _fetch(cursor, sql, params, batch_size):
+    # 服务器端游标逐批取回，每批转换成 float64 数组（NULL 为 NaN）
+    cursor.arraysize = batch_size
+    cursor.prefetchrows = batch_size
+    cursor.execute(sql, params)
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield np.array(rows, dtype=np.float64)
+
+def _in_ranges(ids, gaps):
+    if not len(gaps):
+        return np.zeros(len(ids), dtype=bool)
+    lo, hi = gaps[:, 0], gaps[:, 1]
+    i = np.searchsorted(lo, ids, side="right") - 1
+    return (i >= 0) & (ids <= hi[np.maximum(i, 0)])
+
+def _missing(lo, hi, found):
+    # [lo, hi] 内没有出现在 found（已排序）中的连续区间
+    inside = found[(found >= lo) & (found <= hi)]
+    bounds = np.concatenate([[lo - 1], inside, [hi + 1]])
+    starts = np.nonzero(np.diff(bounds) > 1)[0]
+    return [(int(bounds[i] + 1), int(bounds[i + 1] - 1)) for i in starts]
+
+def _next_gaps(gaps, found, watermark, new_watermark, retention):
+    found = np.sort(found)
+    result = []
+    for lo, hi, age in gaps.tolist():
+        if age + 1 < retention:
+            result.extend((a, b, age + 1) for a, b in _missing(lo, hi, found))
+    if new_watermark > watermark:
+        result.extend((a, b, 0) for a, b in _missing(watermark + 1, new_watermark, found))
+    return sorted(result)
+
+class _RefreshLock:
+    # 同一目录同时只允许一个刷新进程（多个 worker 或定时任务重叠时）
+    def __init__(self, directory):
+        self.path = os.path.join(directory, ".lock")
+
+    def __enter__(self):
+        self.file = open(self.path, "w")
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+
+def refresh_snapshot(full: bool = False, config=SNAPSHOT_CONFIG):
+    # StudyLog 只追加，按 log_id 水位增量导出为新分片；ReviewSchedule / WrongWord 会原地更新，每次整表导出。
+    # 单词、词表和用户的当前状态同时导出，已删除的单词/用户在统计中排除；
+    # StudyLog 中被级联删除的记录不会从已有分片中移除，需要时用 full=True 重建。
+    directory = config["dir"]
+    os.makedirs(directory, exist_ok=True)
+    started = time.perf_counter()
+    with _RefreshLock(directory):
+        manifest = None if full else _read_manifest(directory)
+        if manifest is None:
+            manifest = {"version": 0, "watermark": 0, "gaps": [], "studylog": [], "catalogue": None}
+        version = manifest["version"] + 1
+        if manifest["catalogue"]:
+            dictionary = _load_columns(directory, manifest["catalogue"], mmap_mode=None)
+            users, words = dictionary["users"], dictionary["words"]
+        else:
+            users = words = np.empty(0, dtype=np.int64)
+        watermark = manifest["watermark"]
+        gaps = np.array(manifest["gaps"], dtype=np.int64).reshape(-1, 3)
+        batch_size = config["batch_size"]
+        conn = get_oracle_conn()
+        cursor = conn.cursor()
+        try:
+            # StudyLog 增量：从最早的未决空号开始重读，只保留水位以上或落在空号区间内的行
+            low = min(watermark, int(gaps[:, 0].min()) - 1) if len(gaps) else watermark
+            columns = {"user": [], "word": [], "day": [], "status": []}
+            found = []
+            for batch in _fetch(cursor, f'''
+                SELECT log_id, user_id, word_id, TRUNC(study_time) - DATE '1970-01-01', {_STATUS_SQL}
+                FROM StudyLog WHERE log_id > :low
+            ''', {"low": low}, batch_size):
+                log_id = batch[:, 0].astype(np.int64)
+                found.append(log_id)
+                batch = batch[((log_id > watermark) | _in_ranges(log_id, gaps)) & ~np.isnan(batch[:, 1:4]).any(axis=1)]
+                if not len(batch):
+                    continue
+                users, user_codes = _encode(users, batch[:, 1])
+                words, word_codes = _encode(words, batch[:, 2])
+                columns["user"].append(user_codes)
+                columns["word"].append(word_codes)
+                columns["day"].append(batch[:, 3].astype(np.int32))
+                columns["status"].append(batch[:, 4].astype(np.int8))
+            found = np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+            new_watermark = max(watermark, int(found.max())) if found.size else watermark
+            parts = list(manifest["studylog"])
+            exported = sum(len(c) for c in columns["user"])
+            if exported:
+                parts.append(_write_columns(directory, f"studylog-{version:06d}", {k: np.concatenate(v) for k, v in columns.items()}))
+            if len(parts) > config["max_parts"]:
+                loaded = [_load_columns(directory, part) for part in parts]
+                merged = {k: np.concatenate([p[k] for p in loaded]) for k in columns}
+                parts = [_write_columns(directory, f"studylog-{version:06d}-merged", merged)]
+
+            # ReviewSchedule / WrongWord 整表
+            review = {"user": [], "word": [], "repeat_count": [], "ease_factor": [], "interval_days": [], "memory_strength": [], "review_day": []}
+            # memory_strength 取快照时刻的回忆概率
+            for batch in _fetch(cursor, f'''
+                SELECT r.user_id, r.word_id, r.repeat_count, r.ease_factor, r.interval_days, {RECALL_SQL.format(r="r")},
+                       CAST(r.review_date AS DATE) - DATE '1970-01-01'
+                FROM ReviewSchedule r WHERE r.user_id IS NOT NULL AND r.word_id IS NOT NULL
+            ''', {"retention": SCHEDULER_CONFIG["target_retention"]}, batch_size):
+                users, user_codes = _encode(users, batch[:, 0])
+                words, word_codes = _encode(words, batch[:, 1])
+                review["user"].append(user_codes)
+                review["word"].append(word_codes)
+                for i, column in enumerate(["repeat_count", "ease_factor", "interval_days", "memory_strength", "review_day"], start=2):
+                    review[column].append(batch[:, i].astype(np.float32))
+            wrong = {"user": [], "word": [], "wrong_count": [], "last_wrong_day": []}
+            for batch in _fetch(cursor, '''
+                SELECT user_id, word_id, wrong_count, TRUNC(last_wrong_time) - DATE '1970-01-01'
+                FROM WrongWord WHERE user_id IS NOT NULL AND word_id IS NOT NULL
+            ''', {}, batch_size):
+                users, user_codes = _encode(users, batch[:, 0])
+                words, word_codes = _encode(words, batch[:, 1])
+                wrong["user"].append(user_codes)
+                wrong["word"].append(word_codes)
+                wrong["wrong_count"].append(np.nan_to_num(batch[:, 2], nan=1).astype(np.int32))
+                wrong["last_wrong_day"].append(np.nan_to_num(batch[:, 3], nan=-1).astype(np.int32))
+            review = {k: np.concatenate(v) if v else np.empty(0, dtype=np.float32 if k not in ("user", "word") else np.int32) for k, v in review.items()}
+            wrong = {k: np.concatenate(v) if v else np.empty(0, dtype=np.int32) for k, v in wrong.items()}
+
+            # 单词、词表、用户的当前状态（按编码对齐）
+            cursor.execute('SELECT word_id, NVL(list_id, -1), word FROM Word')
+            rows = cursor.fetchall()
+            word_ids = np.array([r[0] for r in rows], dtype=np.int64)
+            words, word_codes = _encode(words, word_ids)
+            word_list = np.full(len(words), DELETED, dtype=np.int64)
+            word_list[word_codes] = [r[1] for r in rows]
+            word_text = np.full(len(words), "", dtype=object)
+            word_text[word_codes] = [r[2] for r in rows]
+            cursor.execute('SELECT list_id, list_name FROM WordList')
+            rows = cursor.fetchall()
+            list_ids = np.array([r[0] for r in rows], dtype=np.int64)
+            list_names = np.array([r[1] or "" for r in rows], dtype=str)
+            cursor.execute('SELECT user_id FROM "User"')
+            users, user_codes = _encode(users, [r[0] for r in cursor.fetchall()])
+            user_alive = np.zeros(len(users), dtype=bool)
+            user_alive[user_codes] = True
+        finally:
+            cursor.close()
+            conn.close()
+
+        catalogue = _write_columns(directory, f"catalogue-{version:06d}", {
+            "users": users, "words": words, "word_list": word_list, "word_text": word_text.astype(str),
+            "list_ids": list_ids, "list_names": list_names, "user_alive": user_alive,
+        })
+        review_name = _write_columns(directory, f"review-{version:06d}", review)
+        wrong_name = _write_columns(directory, f"wrong-{version:06d}", wrong)
+        refreshed_at = datetime.datetime.now().strftime('%Y-%m-%dT%H:%M:%S')
+        _write_manifest(directory, {
+            "version": version,
+            "watermark": new_watermark,
+            "gaps": _next_gaps(gaps, found, watermark, new_watermark, config["gap_retention"]),
+            "studylog": parts,
+            "catalogue": catalogue,
+            "review": review_name,
+            "wrong": wrong_name,
+            "refreshed_at": refreshed_at,
+        })
+        # 清理不再被清单引用的目录；已打开的内存映射不受删除影响
+        keep = set(parts) | {catalogue, review_name, wrong_name}
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if os.path.isdir(path) and name not in keep:
+                shutil.rmtree(path, ignore_errors=True)
+        return {
+            "version": version,
+            "full": full,
+            "exported_logs": exported,
+            "watermark": new_watermark,
+            "parts": len(parts),
+            "refreshed_at": refreshed_at,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+class Snapshot:
+    # 读取端：按清单版本缓存内存映射的列，清单更新后下次访问时重新映射
+    def __init__(self, config=SNAPSHOT_CONFIG):
+        self.config = config
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._data = None
+
+    def load(self):
+        directory = self.config["dir"]
+        with self._lock:
+            # 读清单与映射文件之间刷新进程可能已删除旧目录，重读一次清单
+            for attempt in range(2):
+                try:
+                    mtime = os.stat(os.path.join(directory, _MANIFEST)).st_mtime_ns
+                    if mtime != self._mtime:
+                        self._data = self._map(directory)
+                        self._mtime = mtime
+                    return self._data
+                except FileNotFoundError:
+                    if attempt:
+                        raise SnapshotMissing()
+
+    def _map(self, directory):
+        manifest = _read_manifest(directory)
+        if manifest is None:
+            raise FileNotFoundError(_MANIFEST)
+        return {
+            "version": manifest["version"],
+            "watermark": manifest["watermark"],
+            "refreshed_at": manifest["refreshed_at"],
+            "studylog": [_load_columns(directory, part) for part in manifest["studylog"]],
+            "review": _load_columns(directory, manifest["review"]),
+            "wrong": _load_columns(directory, manifest["wrong"]),
+            **_load_columns(directory, manifest["catalogue"]),
+        }
+
+    def stats(self):
+        try:
+            data = self.load()
+        except SnapshotMissing:
+            return {"ready": False}
+        return {
+            "ready": True,
+            "version": data["version"],
+            "watermark": data["watermark"],
+            "refreshed_at": data["refreshed_at"],
+            "studylog_rows": sum(len(part["user"]) for part in data["studylog"]),
+            "studylog_parts": len(data["studylog"]),
+            "review_rows": len(data["review"]["user"]),
+            "wrong_rows": len(data["wrong"]["user"]),
+            "users": len(data["users"]),
+            "words": len(data["words"]),
+        }
+
+snapshot = Snapshot()
+
+if __name__ == "__main__":
+    # 供定时任务调用：python snapshot.py [--full]
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--full", action="store_true")
+    args = parser.parse_args()
+    print(json.dumps(refresh_snapshot(args.full), ensure_ascii=False, indent=2))
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
-from db_config import get_oracle_conn
+from db_config import get_oracle_conn, tune_cursor
+from fast_response import fast_json
 import datetime
 
 router = APIRouter()
@@ -33,163 +34,184 @@ class CategoryStats(BaseModel):
     learning_count: int
     not_started_count: int
 
-@router.get("/statistics/daily/{user_id}", response_model=List[DailyStats])
-def get_daily_statistics(user_id: int, days: int = 7):
+class StatisticsSummary(BaseModel):
+    daily: Optional[List[DailyStats]] = None
+    mastery: Optional[List[WordMasteryStats]] = None
+    weekly: Optional[List[WeeklyProgress]] = None
+    categories: Optional[List[CategoryStats]] = None
+
+# 各统计视图写成同一列布局的 SQL 片段，按需 UNION ALL 成一条语句：
+# section, rk（视图内排序）, t1, t2（文本）, d1（日期）, n1 ~ n4（数值）
+# user_days / user_words 为共享的 CTE，每日/每周视图共用该用户的每日汇总，掌握/分类视图共用该用户的单词掌握状态
+_SHARED = {
+    "user_days": """
+        user_days AS (
+            SELECT study_date, log_count, distinct_words, known_count
+            FROM StudyDailyRollup
+            WHERE user_id = :user_id AND study_date >= TRUNC(SYSDATE) - :span
+        )""",
+    "user_words": """
+        user_words AS (
+            SELECT m.word_id, m.attempt_count, m.correct_count, m.last_seen, m.mastery_level, w.word, w.list_id
+            FROM WordMastery m
+            JOIN Word w ON w.word_id = m.word_id
+            WHERE m.user_id = :user_id
+        )""",
+}
+
+_SECTIONS = {
+    "daily": ("user_days", ("days",), """
+        SELECT CAST('daily' AS VARCHAR2(20)) as section, ROW_NUMBER() OVER (ORDER BY study_date DESC) as rk,
+               NULL as t1, NULL as t2, study_date as d1,
+               distinct_words as n1,
+               known_count * 100 / NULLIF(log_count, 0) as n2,
+               log_count * 5 as n3,  -- 假设每个单词学习5分钟
+               NULL as n4
+        FROM user_days
+        WHERE study_date >= TRUNC(SYSDATE) - :days"""),
+    # 一周内的不同单词数不能由每天的数相加，从每日单词表去重
+    "weekly": ("user_days", ("weeks",), """
+        SELECT CAST('weekly' AS VARCHAR2(20)) as section, ROW_NUMBER() OVER (ORDER BY r.week_start DESC) as rk,
+               NULL as t1, NULL as t2, r.week_start as d1,
+               w.words_studied as n1, r.known_count * 100 / NULLIF(r.log_count, 0) as n2, r.study_days as n3, NULL as n4
+        FROM (
+            SELECT TRUNC(study_date, 'IW') as week_start,
+                   SUM(known_count) as known_count, SUM(log_count) as log_count, COUNT(*) as study_days
+            FROM user_days
+            WHERE study_date >= TRUNC(SYSDATE) - (:weeks * 7)
+            GROUP BY TRUNC(study_date, 'IW')
+        ) r
+        JOIN (
+            SELECT TRUNC(study_date, 'IW') as week_start, COUNT(DISTINCT word_id) as words_studied
+            FROM StudyDailyWord
+            WHERE user_id = :user_id AND study_date >= TRUNC(SYSDATE) - (:weeks * 7)
+            GROUP BY TRUNC(study_date, 'IW')
+        ) w ON w.week_start = r.week_start"""),
+    # 按最近学习时间取前 limit 个学过的单词，不足时用没学过的单词补足
+    "mastery": ("user_words", ("limit",), """
+        SELECT CAST('mastery' AS VARCHAR2(20)) as section, rk, word as t1, mastery_level as t2, last_seen as d1,
+               attempt_count as n1, correct_count * 100 / attempt_count as n2, NULL as n3, NULL as n4
+        FROM (SELECT uw.*, ROW_NUMBER() OVER (ORDER BY last_seen DESC, word_id) as rk FROM user_words uw)
+        WHERE rk <= :limit
+        UNION ALL
+        SELECT CAST('mastery' AS VARCHAR2(20)), (SELECT COUNT(*) FROM user_words) + ROWNUM, w.word, 'not_started', NULL, 0, 0, NULL, NULL
+        FROM Word w
+        WHERE NOT EXISTS (SELECT 1 FROM user_words uw WHERE uw.word_id = w.word_id)
+        AND ROWNUM <= :limit - (SELECT COUNT(*) FROM user_words)"""),
+    # 每个词表的单词数只数 Word 的 (list_id, word_id) 索引；用户的掌握情况只聚合该用户学过的单词
+    "categories": ("user_words", (), """
+        SELECT CAST('categories' AS VARCHAR2(20)) as section, ROW_NUMBER() OVER (ORDER BY NVL(wl.difficulty, '未分类')) as rk,
+               NVL(wl.difficulty, '未分类') as t1, NULL as t2, NULL as d1,
+               SUM(lw.word_count) as n1,
+               SUM(NVL(lm.mastered_count, 0)) as n2,
+               SUM(NVL(lm.learning_count, 0)) as n3,
+               SUM(lw.word_count - NVL(lm.mastered_count, 0) - NVL(lm.learning_count, 0)) as n4
+        FROM (
+            SELECT NVL(list_id, -1) as list_id, COUNT(*) as word_count
+            FROM Word
+            GROUP BY NVL(list_id, -1)
+        ) lw
+        LEFT JOIN (
+            SELECT NVL(list_id, -1) as list_id,
+                   SUM(CASE WHEN mastery_level = 'mastered' THEN 1 ELSE 0 END) as mastered_count,
+                   SUM(CASE WHEN mastery_level = 'learning' THEN 1 ELSE 0 END) as learning_count
+            FROM user_words
+            GROUP BY NVL(list_id, -1)
+        ) lm ON lm.list_id = lw.list_id
+        LEFT JOIN WordList wl ON wl.list_id = lw.list_id
+        GROUP BY wl.difficulty"""),
+}
+
+def _to_row(section, row):
+    # 按各视图模型的字段名组装 dict，由 fast_json 直接编码或交给 response_model 校验
+    _, _, t1, t2, d1, n1, n2, n3, n4 = row
+    if section == "daily":
+        return {
+            "date": d1.strftime('%Y-%m-%d'),
+            "words_studied": int(n1),
+            "accuracy_rate": float(n2) if n2 is not None else 0.0,
+            "time_spent": int(n3) if n3 is not None else 0
+        }
+    if section == "weekly":
+        return {
+            "week_start": d1.strftime('%Y-%m-%d'),
+            "words_studied": int(n1),
+            "average_accuracy": float(n2) if n2 is not None else 0.0,
+            "study_time": 0,  # 暂时移除学习时间统计
+            "streak_days": int(n3)
+        }
+    if section == "mastery":
+        return {
+            "word": t1,
+            "mastery_level": t2,
+            "last_review_date": d1.strftime('%Y-%m-%d') if d1 else None,
+            "review_count": int(n1),
+            "accuracy_rate": float(n2) if n2 is not None else 0.0
+        }
+    return {
+        "category": t1,
+        "word_count": int(n1),
+        "mastered_count": int(n2),
+        "learning_count": int(n3),
+        "not_started_count": int(n4)
+    }
+
+def _load_sections(cursor, user_id: int, sections, days: int = 7, weeks: int = 4, limit: int = 20):
+    # 选中的视图拼成一条语句，一次往返取回，按 section 分组
+    values = {"days": days, "weeks": weeks, "limit": limit}
+    params = {"user_id": user_id}
+    shared = []
+    for name in sections:
+        cte, binds, _ = _SECTIONS[name]
+        if cte not in shared:
+            shared.append(cte)
+        params.update((bind, values[bind]) for bind in binds)
+    if "user_days" in shared:
+        params["span"] = max(days if "daily" in sections else 0, weeks * 7 if "weekly" in sections else 0)
+    sql = (
+        "WITH " + ",".join(_SHARED[cte] for cte in shared)
+        + "\nSELECT * FROM (" + "\n        UNION ALL".join(_SECTIONS[name][2] for name in sections) + "\n)\nORDER BY section, rk"
+    )
+    tune_cursor(cursor, "list")
+    cursor.execute(sql, params)
+    result = {name: [] for name in sections}
+    for row in cursor.fetchall():
+        result[row[0]].append(_to_row(row[0], row))
+    return result
+
+def _statistics(user_id: int, sections, **options):
     conn = get_oracle_conn()
     cursor = conn.cursor()
     try:
-        sql = """
-        SELECT 
-            TRUNC(study_time) as study_date,
-            COUNT(DISTINCT word_id) as words_studied,
-            AVG(CASE WHEN status = 'correct' THEN 1 ELSE 0 END) * 100 as accuracy_rate,
-            COUNT(*) * 5 as time_spent  -- 假设每个单词学习5分钟
-        FROM StudyLog
-        WHERE user_id = :1
-        AND study_time >= TRUNC(SYSDATE) - :2
-        GROUP BY TRUNC(study_time)
-        ORDER BY study_date DESC
-        """
-        cursor.execute(sql, (user_id, days))
-        stats = []
-        for row in cursor.fetchall():
-            stats.append(DailyStats(
-                date=row[0].strftime('%Y-%m-%d'),
-                words_studied=row[1],
-                accuracy_rate=float(row[2]) if row[2] is not None else 0.0,
-                time_spent=int(row[3]) if row[3] is not None else 0
-            ))
-        return stats
+        return _load_sections(cursor, user_id, sections, **options)
     finally:
         cursor.close()
         conn.close()
 
+@router.get("/statistics/daily/{user_id}", response_model=List[DailyStats])
+def get_daily_statistics(user_id: int, days: int = 7):
+    return fast_json(_statistics(user_id, ["daily"], days=days)["daily"], List[DailyStats])
+
 @router.get("/statistics/mastery/{user_id}", response_model=List[WordMasteryStats])
 def get_word_mastery_statistics(user_id: int, limit: int = 20):
-    conn = get_oracle_conn()
-    cursor = conn.cursor()
-    try:
-        sql = """
-        WITH WordStats AS (
-            SELECT 
-                w.word,
-                COUNT(*) as review_count,
-                AVG(CASE WHEN sl.status = 'correct' THEN 1 ELSE 0 END) * 100 as accuracy_rate,
-                MAX(sl.study_time) as last_review_date
-            FROM Word w
-            LEFT JOIN StudyLog sl ON w.word_id = sl.word_id AND sl.user_id = :1
-            GROUP BY w.word
-        )
-        SELECT 
-            word,
-            CASE 
-                WHEN accuracy_rate >= 90 THEN 'mastered'
-                WHEN accuracy_rate >= 70 THEN 'learning'
-                ELSE 'not_started'
-            END as mastery_level,
-            last_review_date,
-            review_count,
-            accuracy_rate
-        FROM WordStats
-        ORDER BY last_review_date DESC NULLS LAST
-        FETCH FIRST :2 ROWS ONLY
-        """
-        cursor.execute(sql, (user_id, limit))
-        stats = []
-        for row in cursor.fetchall():
-            stats.append(WordMasteryStats(
-                word=row[0],
-                mastery_level=row[1],
-                last_review_date=row[2].strftime('%Y-%m-%d') if row[2] else None,
-                review_count=row[3],
-                accuracy_rate=float(row[4]) if row[4] is not None else 0.0
-            ))
-        return stats
-    finally:
-        cursor.close()
-        conn.close()
+    return fast_json(_statistics(user_id, ["mastery"], limit=limit)["mastery"], List[WordMasteryStats])
 
 @router.get("/statistics/weekly/{user_id}", response_model=List[WeeklyProgress])
 def get_weekly_statistics(user_id: int, weeks: int = 4):
-    conn = get_oracle_conn()
-    cursor = conn.cursor()
-    try:
-        sql = """
-        WITH WeeklyStats AS (
-            SELECT 
-                TRUNC(study_time, 'IW') as week_start,
-                COUNT(DISTINCT word_id) as words_studied,
-                AVG(CASE WHEN status = 'correct' THEN 1 ELSE 0 END) * 100 as average_accuracy,
-                COUNT(DISTINCT TRUNC(study_time)) as study_days
-            FROM StudyLog
-            WHERE user_id = :1
-            AND study_time >= TRUNC(SYSDATE) - (:2 * 7)
-            GROUP BY TRUNC(study_time, 'IW')
-        )
-        SELECT 
-            week_start,
-            words_studied,
-            average_accuracy,
-            study_days
-        FROM WeeklyStats
-        ORDER BY week_start DESC
-        """
-        cursor.execute(sql, (user_id, weeks))
-        stats = []
-        for row in cursor.fetchall():
-            stats.append(WeeklyProgress(
-                week_start=row[0].strftime('%Y-%m-%d'),
-                words_studied=row[1],
-                average_accuracy=float(row[2]) if row[2] is not None else 0.0,
-                study_time=0,  # 暂时移除学习时间统计
-                streak_days=row[3]
-            ))
-        return stats
-    finally:
-        cursor.close()
-        conn.close()
+    return fast_json(_statistics(user_id, ["weekly"], weeks=weeks)["weekly"], List[WeeklyProgress])
 
 @router.get("/statistics/categories/{user_id}", response_model=List[CategoryStats])
 def get_category_statistics(user_id: int):
-    conn = get_oracle_conn()
-    cursor = conn.cursor()
-    try:
-        sql = """
-        WITH WordMastery AS (
-            SELECT 
-                w.word_id,
-                w.list_id,
-                CASE 
-                    WHEN AVG(CASE WHEN sl.status = 'correct' THEN 1 ELSE 0 END) >= 0.9 THEN 'mastered'
-                    WHEN AVG(CASE WHEN sl.status = 'correct' THEN 1 ELSE 0 END) >= 0.7 THEN 'learning'
-                    ELSE 'not_started'
-                END as mastery_level
-            FROM Word w
-            LEFT JOIN StudyLog sl ON w.word_id = sl.word_id AND sl.user_id = :1
-            GROUP BY w.word_id, w.list_id
-        )
-        SELECT 
-            NVL(wl.difficulty, '未分类') as category,
-            COUNT(*) as word_count,
-            SUM(CASE WHEN mastery_level = 'mastered' THEN 1 ELSE 0 END) as mastered_count,
-            SUM(CASE WHEN mastery_level = 'learning' THEN 1 ELSE 0 END) as learning_count,
-            SUM(CASE WHEN mastery_level = 'not_started' THEN 1 ELSE 0 END) as not_started_count
-        FROM WordMastery wm
-        LEFT JOIN WordList wl ON wm.list_id = wl.list_id
-        GROUP BY wl.difficulty
-        ORDER BY category
-        """
-        cursor.execute(sql, (user_id,))
-        stats = []
-        for row in cursor.fetchall():
-            stats.append(CategoryStats(
-                category=row[0],
-                word_count=row[1],
-                mastered_count=row[2],
-                learning_count=row[3],
-                not_started_count=row[4]
-            ))
-        return stats
-    finally:
-        cursor.close()
-        conn.close() 
\ No newline at end of file
+    return fast_json(_statistics(user_id, ["categories"])["categories"], List[CategoryStats])
+
+@router.get("/statistics/summary/{user_id}", response_model=StatisticsSummary)
+def get_statistics_summary(user_id: int, sections: str = "daily,mastery,weekly,categories",
+                           days: int = 7, weeks: int = 4, limit: int = 20):
+    # 统计页一次取回多个视图：一个连接、一条语句；sections 逗号分隔，只计算选中的视图
+    selected = [name for name in _SECTIONS if name in {s.strip() for s in sections.split(',')}]
+    unknown = {s.strip() for s in sections.split(',') if s.strip()} - set(_SECTIONS)
+    if unknown or not selected:
+        raise HTTPException(status_code=400, detail=f"sections 只能是 {', '.join(_SECTIONS)}")
+    result = _statistics(user_id, selected, days=days, weeks=weeks, limit=limit)
+    # 未选中的视图为 null，与 StatisticsSummary 的默认值一致
+    return fast_json({name: result.get(name) for name in _SECTIONS}, StatisticsSummary)
@@ -0,0 +1,245 @@
+import argparse
+import datetime
+import json
+import logging
+from db_config import get_oracle_conn
+
+logger = logging.getLogger(__name__)
+
+# StudyDailyRollup：每个用户每天的学习记录数、不同单词数和各状态计数，由写入 StudyLog 的代码在同一事务中增量维护。
+# StudyDailyWord：每个用户每天学过的单词（去重），用于判断某个单词是否当天第一次出现，以及按周统计不同单词数。
+# WordMastery：每个用户每个单词的作答次数、known 次数和最近学习时间，掌握程度由表上的虚拟列按正确率给出。
+
+_DAY_WORD_INSERT = 'INSERT INTO StudyDailyWord (user_id, study_date, word_id) VALUES (:1, :2, :3)'
+_ROLLUP_ENSURE = 'INSERT INTO StudyDailyRollup (user_id, study_date) VALUES (:1, :2)'
+_ROLLUP_ADD = '''
+    UPDATE StudyDailyRollup
+    SET log_count = log_count + :1,
+        distinct_words = distinct_words + :2,
+        known_count = known_count + :3,
+        unknown_count = unknown_count + :4,
+        learning_count = learning_count + :5
+    WHERE user_id = :6 AND study_date = :7
+'''
+_MASTERY_ENSURE = 'INSERT INTO WordMastery (user_id, word_id) VALUES (:1, :2)'
+_MASTERY_ADD = '''
+    UPDATE WordMastery
+    SET attempt_count = attempt_count + :1,
+        correct_count = correct_count + :2,
+        last_seen = GREATEST(NVL(last_seen, TIMESTAMP '1970-01-01 00:00:00'), :3)
+    WHERE user_id = :4 AND word_id = :5
+'''
+
+# 计为答对的 status。新记录只会是 known / unknown / learning（见 STUDY_STATUSES），答对即 known；
+# 早期统计接口按 'correct' 计算正确率，库里若有这种旧记录同样计为答对，重建汇总后原有的正确率不会变低
+_CORRECT_STATUSES = ("known", "correct")
+
+# 从原始记录聚合，重建、局部刷新和一致性检查共用
+_AGGREGATE_SQL = '''
+    SELECT user_id, TRUNC(study_time) as study_date,
+           COUNT(*) as log_count,
+           COUNT(DISTINCT word_id) as distinct_words,
+           SUM(CASE WHEN status IN ('known', 'correct') THEN 1 ELSE 0 END) as known_count,
+           SUM(CASE WHEN status = 'unknown' THEN 1 ELSE 0 END) as unknown_count,
+           SUM(CASE WHEN status = 'learning' THEN 1 ELSE 0 END) as learning_count
+    FROM StudyLog
+    {where}
+    GROUP BY user_id, TRUNC(study_time)
+'''
+_MASTERY_AGGREGATE_SQL = '''
+    SELECT user_id, word_id,
+           COUNT(*) as attempt_count,
+           SUM(CASE WHEN status IN ('known', 'correct') THEN 1 ELSE 0 END) as correct_count,
+           MAX(study_time) as last_seen
+    FROM StudyLog
+    {where}
+    GROUP BY user_id, word_id
+'''
+_MASTERY_COLUMNS = 'user_id, word_id, attempt_count, correct_count, last_seen'
+_ROLLUP_COLUMNS = 'user_id, study_date, log_count, distinct_words, known_count, unknown_count, learning_count'
+_STATUS_COLUMN = {"known": 2, "correct": 2, "unknown": 3, "learning": 4}
+
+def _day(study_time: datetime.datetime) -> datetime.datetime:
+    return datetime.datetime.combine(study_time.date(), datetime.time())
+
+def _duplicates(cursor):
+    # executemany(batcherrors=True) 中主键冲突的行即已存在的行，其他错误记录日志后同样跳过
+    offsets = set()
+    for error in cursor.getbatcherrors():
+        if getattr(error, "full_code", "") != "ORA-00001":
+            logger.warning("study rollup row %s skipped: %s", error.offset, error.message)
+        offsets.add(error.offset)
+    return offsets
+
+def apply_study_logs(cursor, rows):
+    # rows 为本事务中已成功插入 StudyLog 的 (user_id, word_id, study_time, status)，由调用方提交
+    if not rows:
+        return
+    days = {}
+    for user_id, word_id, study_time, status in rows:
+        counts = days.setdefault((user_id, _day(study_time)), [0, 0, 0, 0, 0])
+        counts[0] += 1
+        if status in _STATUS_COLUMN:
+            counts[_STATUS_COLUMN[status]] += 1
+    # 插入成功的 (用户, 日期, 单词) 是当天第一次学这个单词
+    day_words = list(dict.fromkeys((user_id, _day(study_time), word_id) for user_id, word_id, study_time, _ in rows))
+    cursor.executemany(_DAY_WORD_INSERT, day_words, batcherrors=True)
+    existing = _duplicates(cursor)
+    for offset, (user_id, day, _) in enumerate(day_words):
+        if offset not in existing:
+            days[(user_id, day)][1] += 1
+    # 先确保汇总行存在（已存在则忽略），再累加，并发写入同一天时不会互相覆盖
+    keys = list(days)
+    cursor.executemany(_ROLLUP_ENSURE, keys, batcherrors=True)
+    _duplicates(cursor)
+    cursor.executemany(_ROLLUP_ADD, [tuple(days[key]) + key for key in keys])
+    _apply_mastery(cursor, rows)
+
+def _apply_mastery(cursor, rows):
+    # 同一单词在一批中多次出现时先合并，同样先确保行存在再累加
+    words = {}
+    for user_id, word_id, study_time, status in rows:
+        counts = words.setdefault((user_id, word_id), [0, 0, study_time])
+        counts[0] += 1
+        counts[1] += status in _CORRECT_STATUSES
+        counts[2] = max(counts[2], study_time)
+    keys = list(words)
+    cursor.executemany(_MASTERY_ENSURE, keys, batcherrors=True)
+    _duplicates(cursor)
+    cursor.executemany(_MASTERY_ADD, [tuple(words[key]) + key for key in keys])
+
+def days_touching_words(cursor, word_filter: str, params: dict):
+    # 删除单词前调用：取出学过这些单词的 (用户, 日期)，删除后用 refresh_days 重新汇总
+    cursor.execute(
+        f'SELECT DISTINCT user_id, study_date FROM StudyDailyWord WHERE word_id IN (SELECT word_id FROM Word WHERE {word_filter})',
+        params
+    )
+    return cursor.fetchall()
+
+def refresh_days(cursor, days):
+    # 从原始记录重新计算指定的 (用户, 日期)，由调用方提交
+    if not days:
+        return
+    binds = [{"user_id": user_id, "day": day} for user_id, day in days]
+    where = 'WHERE user_id = :user_id AND study_time >= :day AND study_time < :day + 1'
+    cursor.executemany('DELETE FROM StudyDailyWord WHERE user_id = :user_id AND study_date = :day', binds)
+    cursor.executemany('DELETE FROM StudyDailyRollup WHERE user_id = :user_id AND study_date = :day', binds)
+    cursor.executemany(
+        f'INSERT INTO StudyDailyWord (user_id, study_date, word_id) SELECT DISTINCT user_id, TRUNC(study_time), word_id FROM StudyLog {where}',
+        binds
+    )
+    cursor.executemany(
+        f'INSERT INTO StudyDailyRollup ({_ROLLUP_COLUMNS}) ' + _AGGREGATE_SQL.format(where=where),
+        binds
+    )
+
+def refresh_mastery(cursor, words):
+    # 从原始记录重新计算指定的 (用户, 单词)，由调用方提交
+    if not words:
+        return
+    binds = [{"user_id": user_id, "word_id": word_id} for user_id, word_id in words]
+    where = 'WHERE user_id = :user_id AND word_id = :word_id'
+    cursor.executemany(f'DELETE FROM WordMastery {where}', binds)
+    cursor.executemany(f'INSERT INTO WordMastery ({_MASTERY_COLUMNS}) ' + _MASTERY_AGGREGATE_SQL.format(where=where), binds)
+
+def rebuild_rollup(user_id=None):
+    # 回填或重建：删除某个用户（不传则全部用户）的每日汇总和掌握状态，从 StudyLog 一次性重新聚合
+    where = 'WHERE user_id = :user_id' if user_id is not None else ''
+    params = {"user_id": user_id} if user_id is not None else {}
+    conn = get_oracle_conn()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f'DELETE FROM StudyDailyWord {where}', params)
+        cursor.execute(f'DELETE FROM StudyDailyRollup {where}', params)
+        cursor.execute(
+            f'INSERT INTO StudyDailyWord (user_id, study_date, word_id) SELECT DISTINCT user_id, TRUNC(study_time), word_id FROM StudyLog {where}',
+            params
+        )
+        cursor.execute(f'INSERT INTO StudyDailyRollup ({_ROLLUP_COLUMNS}) ' + _AGGREGATE_SQL.format(where=where), params)
+        days = cursor.rowcount
+        cursor.execute(f'DELETE FROM WordMastery {where}', params)
+        cursor.execute(f'INSERT INTO WordMastery ({_MASTERY_COLUMNS}) ' + _MASTERY_AGGREGATE_SQL.format(where=where), params)
+        words = cursor.rowcount
+        conn.commit()
+        return {"user_id": user_id, "days": days, "words": words}
+    finally:
+        cursor.close()
+        conn.close()
+
+def check_rollup(user_id=None, limit: int = 100, repair: bool = False):
+    # 与原始记录比对，返回不一致的 (用户, 日期) 和 (用户, 单词)；repair=True 时重新汇总这些行
+    where = 'WHERE user_id = :user_id' if user_id is not None else ''
+    params = {"user_id": user_id} if user_id is not None else {}
+    conn = get_oracle_conn()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f'''
+            SELECT NVL(r.user_id, s.user_id), NVL(r.study_date, s.study_date),
+                   r.log_count, s.log_count, r.distinct_words, s.distinct_words,
+                   r.known_count, s.known_count, r.unknown_count, s.unknown_count,
+                   r.learning_count, s.learning_count
+            FROM (SELECT {_ROLLUP_COLUMNS} FROM StudyDailyRollup {where}) r
+            FULL OUTER JOIN ({_AGGREGATE_SQL.format(where=where)}) s
+              ON r.user_id = s.user_id AND r.study_date = s.study_date
+            WHERE r.user_id IS NULL OR s.user_id IS NULL
+               OR r.log_count <> s.log_count OR r.distinct_words <> s.distinct_words
+               OR r.known_count <> s.known_count OR r.unknown_count <> s.unknown_count
+               OR r.learning_count <> s.learning_count
+            ORDER BY 1, 2
+            FETCH FIRST :limit ROWS ONLY
+        ''', dict(params, limit=limit))
+        mismatches = []
+        for row in cursor.fetchall():
+            mismatches.append({
+                "user_id": row[0],
+                "study_date": row[1].strftime('%Y-%m-%d'),
+                "rollup": {"log_count": row[2], "distinct_words": row[4], "known_count": row[6], "unknown_count": row[8], "learning_count": row[10]},
+                "raw": {"log_count": row[3], "distinct_words": row[5], "known_count": row[7], "unknown_count": row[9], "learning_count": row[11]},
+            })
+        cursor.execute(f'''
+            SELECT NVL(m.user_id, s.user_id), NVL(m.word_id, s.word_id),
+                   m.attempt_count, s.attempt_count, m.correct_count, s.correct_count
+            FROM (SELECT {_MASTERY_COLUMNS} FROM WordMastery {where}) m
+            FULL OUTER JOIN ({_MASTERY_AGGREGATE_SQL.format(where=where)}) s
+              ON m.user_id = s.user_id AND m.word_id = s.word_id
+            WHERE m.user_id IS NULL OR s.user_id IS NULL
+               OR m.attempt_count <> s.attempt_count OR m.correct_count <> s.correct_count
+               OR m.last_seen <> s.last_seen
+            ORDER BY 1, 2
+            FETCH FIRST :limit ROWS ONLY
+        ''', dict(params, limit=limit))
+        mastery_mismatches = [
+            {"user_id": row[0], "word_id": row[1],
+             "mastery": {"attempt_count": row[2], "correct_count": row[4]},
+             "raw": {"attempt_count": row[3], "correct_count": row[5]}}
+            for row in cursor.fetchall()
+        ]
+        repaired = repair and bool(mismatches or mastery_mismatches)
+        if repaired:
+            refresh_days(cursor, [(m["user_id"], datetime.datetime.strptime(m["study_date"], '%Y-%m-%d')) for m in mismatches])
+            refresh_mastery(cursor, [(m["user_id"], m["word_id"]) for m in mastery_mismatches])
+            conn.commit()
+        return {
+            "consistent": not mismatches and not mastery_mismatches,
+            "mismatches": mismatches,
+            "mastery_mismatches": mastery_mismatches,
+            "repaired": repaired,
+        }
+    finally:
+        cursor.close()
+        conn.close()
+
+if __name__ == "__main__":
+    # python study_rollup.py rebuild [--user-id N]
+    # python study_rollup.py check [--user-id N] [--repair]
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["rebuild", "check"])
+    parser.add_argument("--user-id", type=int, default=None)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repair", action="store_true")
+    args = parser.parse_args()
+    if args.command == "rebuild":
+        result = rebuild_rollup(args.user_id)
+    else:
+        result = check_rollup(args.user_id, args.limit, args.repair)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
@@ -1,7 +1,12 @@
-from fastapi import APIRouter
+import oracledb
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List
-from db_config import get_oracle_conn
+from db_config import get_oracle_conn, db_now
+from log_buffer import study_log_buffer, insert_logs, BufferFull, STUDY_STATUSES
+from study_rollup import apply_study_logs
+from user_cache import dashboard_cache
+from fast_response import fast_json
 
 router = APIRouter()
 
@@ -17,6 +22,24 @@ class StudyLogCreate(BaseModel):
     word_id: int
     status: str
 
+class StudyLogBatch(BaseModel):
+    logs: List[StudyLogCreate]
+
+# 批量提交一次最多的记录数
+STUDYLOG_BATCH_MAX = 1000
+
+def _check_status(logs):
+    # 写缓冲开启时记录在写库前就已确认，非法状态要在入队前拒绝
+    for log in logs:
+        if log.status not in STUDY_STATUSES:
+            raise HTTPException(status_code=400, detail=f"status 只能是 {', '.join(STUDY_STATUSES)}")
+
+def _enqueue(logs):
+    try:
+        study_log_buffer.put([(log.user_id, log.word_id, log.status) for log in logs])
+    except BufferFull:
+        raise HTTPException(status_code=503, detail="学习记录写入繁忙，请稍后重试", headers={"Retry-After": "1"})
+
 @router.get("/studylog", response_model=List[StudyLog])
 def get_studylog(user_id: int, limit: int = 10):
     conn = get_oracle_conn()
@@ -25,32 +48,63 @@ def get_studylog(user_id: int, limit: int = 10):
         sql = f'SELECT log_id, user_id, word_id, study_time, status FROM StudyLog WHERE user_id=:1 ORDER BY study_time DESC FETCH FIRST {int(limit)} ROWS ONLY'
         cursor.execute(sql, (user_id,))
         logs = [
-            StudyLog(
-                log_id=row[0],
-                user_id=row[1],
-                word_id=row[2],
-                study_time=row[3].strftime('%Y-%m-%dT%H:%M:%S'),
-                status=row[4]
-            )
+            {
+                "log_id": row[0],
+                "user_id": row[1],
+                "word_id": row[2],
+                "study_time": row[3].strftime('%Y-%m-%dT%H:%M:%S'),
+                "status": row[4]
+            }
             for row in cursor.fetchall()
         ]
-        return logs
+        return fast_json(logs, List[StudyLog])
     finally:
         cursor.close()
         conn.close()
 
 @router.post("/study/log")
 def create_studylog(log: StudyLogCreate):
+    _check_status([log])
+    if study_log_buffer.active:
+        # 写后缓冲：已落盘并入队即返回，由后台线程批量写库
+        _enqueue([log])
+        return {"message": "Study log accepted", "queued": True}
     conn = get_oracle_conn()
     cursor = conn.cursor()
     try:
+        # 学习时间取数据库时钟并随插入返回，每日汇总按同一时间归到当天
         log_id_var = cursor.var(int)
+        study_time_var = cursor.var(oracledb.DB_TYPE_TIMESTAMP)
         cursor.execute(
-            'INSERT INTO StudyLog (user_id, word_id, study_time, status) VALUES (:1, :2, SYSDATE, :3) RETURNING log_id INTO :4',
-            (log.user_id, log.word_id, log.status, log_id_var)
+            'INSERT INTO StudyLog (user_id, word_id, study_time, status) VALUES (:1, :2, CAST(SYSTIMESTAMP AS TIMESTAMP), :3) RETURNING log_id, study_time INTO :4, :5',
+            (log.user_id, log.word_id, log.status, log_id_var, study_time_var)
         )
+        study_time = study_time_var.getvalue()[0]
+        apply_study_logs(cursor, [(log.user_id, log.word_id, study_time, log.status)])
         conn.commit()
+        dashboard_cache.invalidate([log.user_id])
         return {"message": "Study log created successfully", "log_id": log_id_var.getvalue()[0]}
     finally:
         cursor.close()
-        conn.close()
\ No newline at end of file
+        conn.close()
+
+@router.post("/study/log/batch")
+def create_studylog_batch(data: StudyLogBatch):
+    # 客户端攒一批翻卡记录一次提交
+    if not data.logs:
+        return {"accepted": 0, "queued": False}
+    if len(data.logs) > STUDYLOG_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"一次最多提交 {STUDYLOG_BATCH_MAX} 条记录")
+    _check_status(data.logs)
+    if study_log_buffer.active:
+        _enqueue(data.logs)
+        return {"accepted": len(data.logs), "queued": True}
+    conn = get_oracle_conn()
+    try:
+        study_time = db_now(conn)
+        inserted = insert_logs(conn, [(log.user_id, log.word_id, study_time, log.status) for log in data.logs])
+        conn.commit()
+        dashboard_cache.invalidate(log.user_id for log in data.logs)
+        return {"accepted": inserted, "rejected": len(data.logs) - inserted, "queued": False}
+    finally:
+        conn.close()
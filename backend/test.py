@@ -2,31 +2,21 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
-from db_config import get_oracle_conn
+from db_config import get_oracle_conn, db_now
+from hydrate import hydrate_words
+from study_rollup import apply_study_logs
+from user_cache import dashboard_cache
+from fast_response import fast_json
 
 # 导入单词相关的类型
 class WordTranslation(BaseModel):
     translation: str
     word_type: str
 
-    @classmethod
-    def from_db_row(cls, row):
-        # 处理 LOB 类型
-        translation = row[0].read() if hasattr(row[0], 'read') else str(row[0])
-        word_type = row[1].read() if hasattr(row[1], 'read') else str(row[1])
-        return cls(translation=translation, word_type=word_type)
-
 class WordPhrase(BaseModel):
     phrase: str
     translation: str
 
-    @classmethod
-    def from_db_row(cls, row):
-        # 处理 LOB 类型
-        phrase = row[0].read() if hasattr(row[0], 'read') else str(row[0])
-        translation = row[1].read() if hasattr(row[1], 'read') else str(row[1])
-        return cls(phrase=phrase, translation=translation)
-
 router = APIRouter()
 
 class TestQuestion(BaseModel):
@@ -59,6 +49,9 @@ def submit_test_result(test: SubmitTestRequest):
     conn = get_oracle_conn()
     cursor = conn.cursor()
     try:
+        # 与统计中的 TRUNC(SYSDATE) 使用同一个时钟
+        study_time = db_now(conn)
+        studied = []
         # 记录错误的答案
         for i, (question, answer) in enumerate(zip(test.questions, test.answers)):
             # 获取正确答案
@@ -119,15 +112,20 @@ def submit_test_result(test: SubmitTestRequest):
             # 记录学习状态
             status = 'known' if answer == correct_answer else 'unknown'
             cursor.execute('''
-                INSERT INTO StudyLog (user_id, word_id, status)
-                VALUES (:user_id, :word_id, :status)
+                INSERT INTO StudyLog (user_id, word_id, study_time, status)
+                VALUES (:user_id, :word_id, :study_time, :status)
             ''',
             user_id=test.user_id,
             word_id=question.word_id,
+            study_time=study_time,
             status=status
             )
+            studied.append((test.user_id, question.word_id, study_time, status))
         
+        # 同一事务中更新每日学习汇总
+        apply_study_logs(cursor, studied)
         conn.commit()
+        dashboard_cache.invalidate([test.user_id])
         
         # 返回测试结果
         return TestResult(
@@ -135,7 +133,7 @@ def submit_test_result(test: SubmitTestRequest):
             score=test.score,
             total_questions=test.total_questions,
             correct_answers=test.correct_answers,
-            test_date=datetime.now(),
+            test_date=study_time,
             test_type=test.test_type
         )
     except Exception as e:
@@ -150,39 +148,30 @@ def get_test_history(user_id: int, limit: Optional[int] = None):
     conn = get_oracle_conn()
     cursor = conn.cursor()
     try:
-        # 从StudyLog表中获取学习记录，按日期分组
+        # 按天的学习记录直接读每日汇总表
         sql = '''
-            WITH grouped_logs AS (
-                SELECT 
-                    s.user_id,
-                    TRUNC(s.study_time) as study_date,
-                    COUNT(DISTINCT s.word_id) as total_questions,
-                    SUM(CASE WHEN s.status = 'known' THEN 1 ELSE 0 END) as correct_answers
-                FROM StudyLog s
-                WHERE s.user_id = :user_id
-                GROUP BY s.user_id, TRUNC(s.study_time)
-            )
             SELECT 
                 user_id,
-                total_questions,
-                correct_answers,
+                distinct_words as total_questions,
+                known_count as correct_answers,
                 TO_CHAR(study_date, 'YYYY-MM-DD HH24:MI:SS') as test_date,
                 'vocabulary' as test_type
-            FROM grouped_logs
+            FROM StudyDailyRollup
+            WHERE user_id = :user_id
             ORDER BY study_date DESC
         '''
         if limit:
             sql += f' FETCH FIRST {int(limit)} ROWS ONLY'
         
         cursor.execute(sql, user_id=user_id)
-        return [TestResult(
-            user_id=r[0],
-            score=float(r[2]) / float(r[1]) * 100 if r[1] > 0 else 0,
-            total_questions=r[1],
-            correct_answers=r[2],
-            test_date=datetime.strptime(r[3], '%Y-%m-%d %H:%M:%S'),
-            test_type=r[4]
-        ) for r in cursor.fetchall()]
+        return fast_json([{
+            "user_id": r[0],
+            "score": float(r[2]) / float(r[1]) * 100 if r[1] > 0 else 0.0,
+            "total_questions": r[1],
+            "correct_answers": r[2],
+            "test_date": datetime.strptime(r[3], '%Y-%m-%d %H:%M:%S'),
+            "test_type": r[4]
+        } for r in cursor.fetchall()], List[TestResult])
     finally:
         cursor.close()
         conn.close()
@@ -194,42 +183,27 @@ def get_test_questions(count: int = 5):
     try:
         # 随机选择单词
         cursor.execute('''
-            SELECT word_id, word 
+            SELECT word_id, word, list_id 
             FROM Word 
             ORDER BY DBMS_RANDOM.VALUE 
             FETCH FIRST :1 ROWS ONLY
         ''', (count,))
-        words = cursor.fetchall()
+        # 批量获取翻译和短语
+        words = hydrate_words(cursor, cursor.fetchall())
 
         questions = []
-        for word_id, word in words:
-            # 获取翻译
-            cursor.execute('''
-                SELECT translation, word_type 
-                FROM WordTranslation 
-                WHERE word_id = :1
-            ''', (word_id,))
-            translations = [
-                WordTranslation.from_db_row(row)
-                for row in cursor.fetchall()
-            ]
-
-            # 获取短语
-            cursor.execute('''
-                SELECT phrase, translation 
-                FROM WordPhrase 
-                WHERE word_id = :1
-            ''', (word_id,))
-            phrases = [
-                WordPhrase.from_db_row(row)
-                for row in cursor.fetchall()
-            ]
-
+        for word in words:
             questions.append(TestQuestion(
-                word_id=word_id,
-                word=word,
-                translations=translations,
-                phrases=phrases
+                word_id=word["word_id"],
+                word=word["word"],
+                translations=[
+                    WordTranslation(translation=t["translation"], word_type=str(t["type"]))
+                    for t in word["translations"]
+                ],
+                phrases=[
+                    WordPhrase(phrase=p["phrase"], translation=p["translation"])
+                    for p in word["phrases"]
+                ]
             ))
 
         return questions
@@ -0,0 +1,130 @@
+import datetime
+import glob
+import json
+import os
+import pytest
+import log_buffer
+from log_buffer import LOG_BUFFER_CONFIG, BufferFull, StudyLogBuffer
+
+def make_buffer(spool_dir, written, fail=False, **overrides):
+    # 不启动写库线程；_write 只记录收到的批次，fail=True 时模拟数据库不可用
+    config = dict(LOG_BUFFER_CONFIG, spool_dir=str(spool_dir), enabled=True, **overrides)
+    buffer = StudyLogBuffer(config)
+
+    def write(rows):
+        if buffer.fail:
+            raise RuntimeError("database unavailable")
+        written.append(list(rows))
+        return len(rows)
+
+    buffer.fail = fail
+    buffer._write = write
+    return buffer
+
+def release(buffer):
+    # 没有启动写库线程时 stop() 不做任何事，测试结束时自己关闭落盘文件和锁
+    buffer._segment.close()
+    for fd in buffer._segment_locks.values():
+        os.close(fd)
+    buffer._segment_locks.clear()
+
+def segments(spool_dir):
+    return sorted(glob.glob(os.path.join(str(spool_dir), "studylog-*")))
+
+def write_segment(spool_dir, name, rows, tail=""):
+    path = os.path.join(str(spool_dir), name)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("".join(json.dumps(row) + "\n" for row in rows) + tail)
+    return path
+
+def test_put_spools_and_flush_removes_segment(tmp_path):
+    written = []
+    buffer = make_buffer(tmp_path, written)
+    buffer._open_segment()
+    buffer.put([(1, 10, "known"), (1, 11, "unknown")])
+    [path] = segments(tmp_path)
+    with open(path, encoding="utf-8") as f:
+        assert [json.loads(line)[:2] for line in f] == [[1, 10], [1, 11]]
+    assert buffer.syncs == 1
+    buffer.flush()
+    assert [(r[0], r[1], r[3]) for r in written[0]] == [(1, 10, "known"), (1, 11, "unknown")]
+    # 写库后旧落盘文件删除，只剩新换上的空文件
+    assert not os.path.exists(path)
+    assert len(segments(tmp_path)) == 1
+    assert buffer.stats()["flushed"] == 2
+    release(buffer)
+
+def test_failed_flush_keeps_rows_and_segment_for_retry(tmp_path):
+    written = []
+    buffer = make_buffer(tmp_path, written, fail=True, fsync=False)
+    buffer._open_segment()
+    buffer.put([(1, 10, "known")])
+    with pytest.raises(RuntimeError):
+        buffer.flush()
+    assert buffer.stats()["retrying"] == 1
+    assert len(segments(tmp_path)) == 2
+    buffer.put([(2, 20, "learning")])
+    buffer.fail = False
+    buffer.flush()
+    assert [(r[0], r[1]) for r in written[0]] == [(1, 10), (2, 20)]
+    assert len(segments(tmp_path)) == 1
+    release(buffer)
+
+def test_put_raises_when_queue_is_full(tmp_path):
+    buffer = make_buffer(tmp_path, [], fsync=False, max_queue=2, put_timeout=0)
+    buffer._open_segment()
+    buffer.put([(1, 10, "known"), (1, 11, "known")])
+    with pytest.raises(BufferFull):
+        buffer.put([(1, 12, "known")])
+    assert buffer.stats()["full"] == 1
+    release(buffer)
+
+def test_replay_writes_leftover_segment_and_skips_torn_line(tmp_path):
+    path = write_segment(tmp_path, "studylog-1-1-1.spool", [
+        [3, 30, "2024-03-01T08:00:00.000000", "known"],
+        [3, 31, "2024-03-01T08:00:01.500000", "unknown"],
+    ], tail='[3, 32, "2024-03-01')
+    written = []
+    make_buffer(tmp_path, written).replay()
+    assert written == [[
+        (3, 30, datetime.datetime(2024, 3, 1, 8, 0), "known"),
+        (3, 31, datetime.datetime(2024, 3, 1, 8, 0, 1, 500000), "unknown"),
+    ]]
+    assert not os.path.exists(path)
+
+def test_replay_keeps_segment_when_write_fails(tmp_path):
+    path = write_segment(tmp_path, "studylog-1-1-1.spool", [[3, 30, "2024-03-01T08:00:00.000000", "known"]])
+    buffer = make_buffer(tmp_path, [], fail=True)
+    buffer.replay()
+    assert os.path.exists(path)
+    assert buffer.replayed == 0
+
+@pytest.mark.skipif(log_buffer.fcntl is None, reason="需要 flock")
+def test_replay_skips_segments_locked_by_a_live_writer(tmp_path):
+    # 另一个 worker 正在使用的落盘文件由它持有 flock，重放方拿不到锁就跳过
+    live = make_buffer(tmp_path, [], fsync=False)
+    live._open_segment()
+    live.put([(1, 10, "known")])
+    leftover = write_segment(tmp_path, "studylog-0-0-0.spool", [[3, 30, "2024-03-01T08:00:00.000000", "known"]])
+    written = []
+    make_buffer(tmp_path, written).replay()
+    assert [[row[:2] for row in batch] for batch in written] == [[(3, 30)]]
+    assert not os.path.exists(leftover)
+    assert os.path.exists(live._segment_path)
+    release(live)
+
+def test_replay_skips_segment_removed_before_the_lock_was_taken(tmp_path, monkeypatch):
+    # 原进程在重放方打开文件之后、拿到锁之前写库并删除了文件
+    path = write_segment(tmp_path, "studylog-1-1-1.spool", [[3, 30, "2024-03-01T08:00:00.000000", "known"]])
+
+    class RemovingFlock:
+        LOCK_EX = LOCK_NB = 0
+
+        @staticmethod
+        def flock(fd, operation):
+            os.remove(path)
+
+    monkeypatch.setattr(log_buffer, "fcntl", RemovingFlock)
+    written = []
+    make_buffer(tmp_path, written).replay()
+    assert written == []
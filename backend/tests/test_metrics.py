@@ -0,0 +1,58 @@
+import json
+import os
+import pytest
+import metrics
+from metrics import Registry, LATENCY_BUCKETS, _merge, render
+
+@pytest.fixture
+def spool(tmp_path, monkeypatch):
+    monkeypatch.setitem(metrics.METRICS_CONFIG, "spool_dir", str(tmp_path))
+    monkeypatch.setattr(metrics, "registry", Registry())
+    monkeypatch.setattr(metrics, "_collectors", [])
+    return tmp_path
+
+def test_merge_adds_counters_and_histogram_buckets():
+    histogram = [0] * len(LATENCY_BUCKETS) + [0.0, 0]
+    first = list(histogram)
+    first[0], first[-2], first[-1] = 2, 0.006, 2
+    second = list(histogram)
+    second[3], second[-2], second[-1] = 1, 0.04, 1
+    merged = _merge([
+        [["http_requests_total", ["GET", "/api/words", "200"], 3.0], ["http_request_duration_seconds", ["GET", "/api/words"], first]],
+        [["http_requests_total", ["GET", "/api/words", "200"], 4.0], ["http_request_duration_seconds", ["GET", "/api/words"], second]],
+    ])
+    assert merged[("http_requests_total", ("GET", "/api/words", "200"))] == 7.0
+    value = merged[("http_request_duration_seconds", ("GET", "/api/words"))]
+    assert value[0] == 2 and value[3] == 1
+    assert value[-1] == 3
+    assert value[-2] == pytest.approx(0.046)
+    # 合并不改动输入
+    assert first[3] == 0
+
+def test_render_includes_other_workers_and_cumulative_buckets(spool):
+    metrics.registry.inc("http_requests_total", ("GET", "/api/words", "200"))
+    metrics.registry.observe("http_request_duration_seconds", ("GET", "/api/words"), 0.02)
+    metrics.registry.observe("http_request_duration_seconds", ("GET", "/api/words"), 20)
+    with open(os.path.join(spool, "metrics-999999.json"), "w", encoding="utf-8") as f:
+        json.dump([["http_requests_total", ["GET", "/api/words", "200"], 2.0]], f)
+    text = render()
+    assert 'dancisystem_http_requests_total{method="GET",route="/api/words",status="200"} 3' in text
+    assert "# TYPE dancisystem_http_request_duration_seconds histogram" in text
+    assert 'dancisystem_http_request_duration_seconds_bucket{method="GET",route="/api/words",le="0.01"} 0' in text
+    assert 'dancisystem_http_request_duration_seconds_bucket{method="GET",route="/api/words",le="0.025"} 1' in text
+    assert 'dancisystem_http_request_duration_seconds_bucket{method="GET",route="/api/words",le="10.0"} 1' in text
+    assert 'dancisystem_http_request_duration_seconds_bucket{method="GET",route="/api/words",le="+Inf"} 2' in text
+    assert 'dancisystem_http_request_duration_seconds_count{method="GET",route="/api/words"} 2' in text
+    # 没有数据的指标不输出
+    assert "db_pool_connections" not in text
+
+def test_render_drops_stale_worker_files_and_escapes_labels(spool):
+    stale = os.path.join(spool, "metrics-999998.json")
+    with open(stale, "w", encoding="utf-8") as f:
+        json.dump([["http_requests_total", ["GET", "/gone", "200"], 5.0]], f)
+    os.utime(stale, (0, 0))
+    metrics.registry.inc("cache_hits_total", ('a"b',), 2)
+    text = render()
+    assert "/gone" not in text
+    assert not os.path.exists(stale)
+    assert 'dancisystem_cache_hits_total{cache="a\\"b"} 2' in text
@@ -0,0 +1,119 @@
+import asyncio
+import pytest
+import query_log
+from query_log import QueryLog, fingerprint, timed
+
+def test_fingerprint_normalises_literals_lists_and_whitespace():
+    fp, text = fingerprint("SELECT * FROM Word\n  WHERE word = 'it''s' AND list_id IN (:a, :b, :c) FETCH FIRST 20 ROWS ONLY")
+    assert text == "SELECT * FROM Word WHERE word = '?' AND list_id IN (:list) FETCH FIRST ? ROWS ONLY"
+    assert fp == fingerprint("SELECT * FROM Word WHERE word = 'x' AND list_id IN (:a, :b) FETCH FIRST 50 ROWS ONLY")[0]
+    assert fp != fingerprint("SELECT * FROM Word WHERE word = 'x'")[0]
+    # 标识符中的数字不替换
+    assert fingerprint("SELECT col2 FROM t1 WHERE x = 5")[1] == "SELECT col2 FROM t1 WHERE x = ?"
+
+def test_query_log_ranks_and_limits_statements():
+    log = QueryLog(dict(query_log.QUERY_LOG_CONFIG, max_statements=2, threshold_ms=1000))
+    log.record("SELECT 1 FROM dual", 0.010, 1)
+    log.record("SELECT 2 FROM dual", 0.030, 1)
+    log.record("SELECT * FROM Word", 0.005, 40)
+    log.record("SELECT * FROM WordPhrase", 0.5, 1)
+    top = log.top("total")
+    assert [s["sql"] for s in top["top"]] == ["SELECT ? FROM dual", "SELECT * FROM Word"]
+    assert top["top"][0]["count"] == 2
+    assert top["top"][0]["max_ms"] == 30.0
+    assert top["dropped"] == 1
+    assert log.worst("count", 1) == [fingerprint("SELECT 1 FROM dual")[0]]
+
+def test_slow_queries_are_logged_without_secret_binds(caplog):
+    log = QueryLog(dict(query_log.QUERY_LOG_CONFIG, threshold_ms=100))
+    log.record('SELECT * FROM "User" WHERE username = :username AND password = :password', 0.2, 1, {"username": "ann", "password": "pw"})
+    assert log.top()["top"][0]["slow"] == 1
+    assert "'ann'" in caplog.text and "pw" not in caplog.text
+
+class FakeCursor:
+    arraysize = 100
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.closed = False
+
+    def execute(self, statement, parameters=None, **kwargs):
+        self.pending = list(self.rows)
+
+    def fetchone(self):
+        return self.pending.pop(0) if self.pending else None
+
+    def fetchall(self):
+        rows, self.pending = self.pending, []
+        return rows
+
+    def close(self):
+        self.closed = True
+
+class FakeConnection:
+    call_timeout = 0
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def cursor(self):
+        return FakeCursor(self.rows)
+
+class FakeAsyncCursor(FakeCursor):
+    async def execute(self, statement, parameters=None, **kwargs):
+        FakeCursor.execute(self, statement, parameters, **kwargs)
+
+    async def fetchone(self):
+        return FakeCursor.fetchone(self)
+
+class FakeAsyncConnection(FakeConnection):
+    def cursor(self):
+        return FakeAsyncCursor(self.rows)
+
+@pytest.fixture
+def fresh_log(monkeypatch):
+    log = QueryLog()
+    monkeypatch.setattr(query_log, "query_log", log)
+    return log
+
+def test_timed_connection_records_execute_and_fetches(fresh_log):
+    raw = FakeConnection([(1,), (2,)])
+    conn = timed(raw)
+    # 未改写的属性读写都转给驱动对象
+    conn.call_timeout = 500
+    assert raw.call_timeout == 500
+    cursor = conn.cursor()
+    cursor.arraysize = 7
+    assert cursor._target.arraysize == 7
+    cursor.execute("SELECT word FROM Word WHERE word_id = :id", id=1)
+    assert cursor.fetchall() == [(1,), (2,)]
+    with cursor:
+        cursor.execute("SELECT 1 FROM dual")
+        assert list(cursor) == [(1,), (2,)]
+    assert cursor._target.closed
+    stats = {s["sql"]: s for s in fresh_log.top()["top"]}
+    assert stats["SELECT word FROM Word WHERE word_id = :id"]["rows"] == 2
+    assert stats["SELECT ? FROM dual"]["rows"] == 2
+
+def test_timed_async_connection_records_rows(fresh_log):
+    async def run():
+        cursor = timed(FakeAsyncConnection([(1,), (2,), (3,)]), is_async=True).cursor()
+        await cursor.execute("SELECT word_id FROM Word")
+        rows = [row async for row in cursor]
+        cursor.close()
+        return rows
+    assert asyncio.run(run()) == [(1,), (2,), (3,)]
+    assert fresh_log.top()["top"][0]["rows"] == 3
+
+def test_plan_capture_queries_are_not_recorded(fresh_log):
+    cursor = timed(FakeConnection([(1,)])).cursor()
+    cursor.record = False
+    assert "record" not in vars(cursor._target)
+    cursor.execute("SELECT plan_table_output FROM dual")
+    cursor.close()
+    assert fresh_log.top()["top"] == []
+
+def test_disabled_query_log_returns_driver_connection(monkeypatch):
+    monkeypatch.setitem(query_log.QUERY_LOG_CONFIG, "enabled", False)
+    raw = FakeConnection([])
+    assert timed(raw) is raw
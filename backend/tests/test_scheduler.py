@@ -0,0 +1,63 @@
+import datetime
+import numpy as np
+from scheduler import SCHEDULER_CONFIG, review, retune, to_days, from_days, implied_interval
+
+NOW = to_days(datetime.datetime(2024, 3, 1, 8, 0))
+
+def test_days_round_trip():
+    value = datetime.datetime(2024, 3, 1, 8, 30, 15)
+    assert from_days(to_days(value)) == value
+
+def test_first_reviews_follow_sm2_sequence():
+    first = review(0, np.nan, np.nan, 5, NOW)
+    assert first["repeat_count"] == 1
+    assert first["interval_days"] == 1.0
+    assert first["ease_factor"] == 2.6
+    second = review(1, 2.5, 1.0, 4, NOW)
+    assert second["repeat_count"] == 2
+    assert second["interval_days"] == 6.0
+    third = review(2, 2.5, 6.0, 4, NOW)
+    assert third["interval_days"] == 15.0
+    assert third["review_date"] == NOW + 15.0
+    assert third["last_review"] == NOW
+    assert third["memory_strength"] == 1.0
+
+def test_failed_answer_resets_repetitions():
+    result = review(5, 1.35, 40.0, 1, NOW)
+    assert result["repeat_count"] == 0
+    assert result["interval_days"] == 1.0
+    assert result["ease_factor"] == SCHEDULER_CONFIG["min_ease"]
+
+def test_interval_is_capped():
+    result = review(10, 2.5, 300.0, 5, NOW)
+    assert result["interval_days"] == SCHEDULER_CONFIG["max_interval"]
+
+def test_missing_interval_uses_implied_sequence():
+    assert implied_interval(3, 2.5) == 15.0
+    assert review(3, 2.5, np.nan, 4, NOW)["interval_days"] == np.rint(15.0 * 2.5)
+
+def test_review_is_vectorized():
+    result = review([0, 1, 2], [2.5, 2.5, 2.5], [np.nan, 1.0, 6.0], [5, 2, 4], NOW)
+    assert result["repeat_count"].tolist() == [1, 0, 3]
+    assert result["interval_days"].tolist() == [1.0, 1.0, 15.0]
+    assert result["last_review"].tolist() == [NOW] * 3
+
+def test_retune_keeps_manually_moved_dates():
+    last = NOW - 10
+    moved = last + 6 + 2.5  # PUT /review/{id} 改过的复习日期
+    result = retune([2, 2], [2.5, 2.5], [6.0, 6.0], [last, last], [moved, last + 6])
+    assert result["review_date"].tolist() == [moved, last + 6]
+    assert result["interval_days"].tolist() == [6.0, 6.0]
+
+def test_retune_ignores_date_column_rounding():
+    last = NOW - 10
+    result = retune(2, 2.5, 6.0, last, last + 6 + 30 / 86400)
+    assert result["review_date"] == last + 6
+
+def test_retune_fills_legacy_rows():
+    review_date = NOW + 3
+    result = retune(3, np.nan, np.nan, np.nan, review_date)
+    assert result["ease_factor"] == SCHEDULER_CONFIG["initial_ease"]
+    assert result["interval_days"] == 15.0
+    assert result["last_review"] == review_date - 15.0
+    assert result["review_date"] == review_date
@@ -0,0 +1,115 @@
+from search_index import WordIndex, TranslationIndex, FuzzyWordIndex, edit_distance, auto_distance
+
+class FakeCursor:
+    # 按语句开头返回预置的行，供索引全量构建使用
+    def __init__(self, tables):
+        self.tables = tables
+        self.rows = []
+
+    def execute(self, sql, *args, **kwargs):
+        self.rows = next(rows for prefix, rows in self.tables.items() if sql.startswith(prefix))
+
+    def fetchall(self):
+        return list(self.rows)
+
+WORDS = [
+    (1, "able", 1),
+    (2, "ability", 1),
+    (3, "disable", 2),
+    (4, "Table", 2),
+    (5, "abandon", 1),
+    (6, "capable", 3),
+]
+
+def word_index():
+    index = WordIndex()
+    index.build(FakeCursor({"SELECT word_id, word, list_id FROM Word": WORDS}))
+    return index
+
+def ids(results):
+    return [r["word_id"] for r in results]
+
+def test_prefix_matches_rank_shorter_words_first():
+    index = word_index()
+    assert ids(index.search("ab", prefix_only=True)) == [1, 5, 2]
+    assert index.search("able")[0] == {"word_id": 1, "word": "able", "list_id": 1}
+
+def test_substring_matches_follow_prefix_matches():
+    index = word_index()
+    # able 为前缀匹配；其余按匹配位置、长度排序
+    assert ids(index.search("able")) == [1, 4, 6, 3]
+    assert ids(index.search("bl")) == [1, 4, 6, 3]
+
+def test_search_is_case_insensitive_and_limited():
+    index = word_index()
+    assert ids(index.search(" TABLE ")) == [4]
+    assert len(index.search("a", limit=2)) == 2
+    assert index.search("   ") == []
+
+def test_add_and_remove_update_both_structures():
+    index = word_index()
+    index.add([{"word_id": 7, "word": "abacus", "list_id": 4}])
+    index.add([{"word_id": 4, "word": "tablet", "list_id": 2}])
+    index.remove([1])
+    assert ids(index.search("aba", prefix_only=True)) == [7, 5]
+    assert ids(index.search("able")) == [4, 6, 3]
+    assert ids(index.search("table")) == [4]
+    assert index.stats()["words"] == 6
+
+TRANSLATIONS = [(1, "vt. 放弃；遗弃"), (2, "n. 能力；才能"), (3, "adj. 有能力的"), (4, "放弃的念头")]
+PHRASES = [(5, "放弃比赛"), (1, "完全放弃")]
+
+def translation_index():
+    index = TranslationIndex()
+    index.build(FakeCursor({
+        "SELECT word_id, translation FROM WordTranslation": TRANSLATIONS,
+        "SELECT word_id, translation FROM WordPhrase": PHRASES,
+    }))
+    return index
+
+def test_translation_ranks_whole_segment_hits_first():
+    # 词性标记和标点只用于切分；与释义某一段完全相同的排在前面，短语释义权重较低
+    results = translation_index().search("放弃")
+    assert [word_id for word_id, _ in results] == [1, 4, 5]
+    assert results[0][1] > results[1][1] > results[2][1]
+
+def test_translation_single_character_query():
+    assert [word_id for word_id, _ in translation_index().search("能")] == [2, 3]
+    assert translation_index().search("，。") == []
+
+def test_translation_remove_compacts_and_add_reindexes():
+    index = translation_index()
+    index.remove([1, 4])
+    assert [word_id for word_id, _ in index.search("放弃")] == [5]
+    # 删除的文档超过 1/4，已压缩
+    assert index.stats()["deleted"] == 0
+    index.add([{"word_id": 9, "translations": [{"translation": "放弃"}], "phrases": []}])
+    assert [word_id for word_id, _ in index.search("放弃")] == [9, 5]
+
+def fuzzy_index():
+    index = FuzzyWordIndex()
+    index.build(FakeCursor({
+        "SELECT word_id, word, list_id FROM Word": WORDS + [(7, "able", 5)],
+        "SELECT word_id, SUM(attempt_count) FROM WordMastery": [(7, 10), (1, 3)],
+    }))
+    return index
+
+def test_edit_distance_is_bounded_and_counts_transpositions():
+    assert edit_distance("abel", "able", 2) == 1
+    assert edit_distance("kitten", "sitting", 3) == 3
+    assert edit_distance("kitten", "sitting", 2) == 3
+    assert [auto_distance(q) for q in ("ab", "abcde", "abcdef")] == [0, 1, 2]
+
+def test_fuzzy_orders_by_distance_then_frequency():
+    index = fuzzy_index()
+    # 同一拼写的两个单词按 WordMastery 中的作答次数排序
+    assert [(r["word_id"], r["distance"]) for r in index.search("abel")] == [(7, 1), (1, 1)]
+    assert [r["word_id"] for r in index.search("abiliti")] == [2]
+    assert index.search("abel", max_distance=0) == []
+
+def test_fuzzy_add_and_remove():
+    index = fuzzy_index()
+    index.add([{"word_id": 8, "word": "tabel", "list_id": 1}])
+    assert [(r["word_id"], r["distance"]) for r in index.search("tabel")] == [(8, 0), (4, 1)]
+    index.remove([7])
+    assert [r["word_id"] for r in index.search("abel")] == [1, 8]
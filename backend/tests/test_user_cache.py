@@ -0,0 +1,49 @@
+from user_cache import UserCache
+from word_cache import VersionBoard
+
+def board(tmp_path):
+    return VersionBoard(str(tmp_path / "versions.bin"), 16)
+
+def test_hit_until_invalidated(tmp_path):
+    cache = UserCache(ttl=60, max_entries=10, versions=board(tmp_path))
+    cache.put(1, "dashboard", cache.version(1))
+    assert cache.get(1) == "dashboard"
+    cache.invalidate([1])
+    assert cache.get(1) is None
+    assert cache.stats()["invalidations"] == 1
+
+def test_write_from_another_worker_makes_entry_stale(tmp_path):
+    # 两个 worker 共用同一个版本戳文件，另一个 worker 只改版本戳，不动本进程的条目
+    cache = UserCache(ttl=60, max_entries=10, versions=board(tmp_path))
+    other = UserCache(ttl=60, max_entries=10, versions=board(tmp_path))
+    cache.put(1, "dashboard", cache.version(1))
+    cache.put(2, "other user", cache.version(2))
+    other.invalidate([1])
+    assert cache.get(1) is None
+    assert cache.get(2) == "other user"
+    assert cache.stats()["stale"] == 1
+
+def test_write_during_query_is_not_cached(tmp_path):
+    # 查询前取的版本戳在查询期间被改写，写入的结果下次读取时即判定为过期
+    cache = UserCache(ttl=60, max_entries=10, versions=board(tmp_path))
+    version = cache.version(1)
+    cache.invalidate([1])
+    cache.put(1, "stale dashboard", version)
+    assert cache.get(1) is None
+
+def test_ttl_and_lru_eviction(tmp_path):
+    expired = UserCache(ttl=0, max_entries=10, versions=board(tmp_path))
+    expired.put(1, "dashboard", expired.version(1))
+    assert expired.get(1) is None
+    assert expired.stats()["expired"] == 1
+    cache = UserCache(ttl=60, max_entries=2, versions=board(tmp_path))
+    for user_id in (1, 2):
+        cache.put(user_id, user_id, cache.version(user_id))
+    cache.get(1)
+    cache.put(3, 3, cache.version(3))
+    assert [cache.get(user_id) for user_id in (1, 2, 3)] == [1, None, 3]
+
+def test_disabled_cache_stores_nothing():
+    cache = UserCache(ttl=60, max_entries=10, enabled=False)
+    cache.put(1, "dashboard", cache.version(1))
+    assert cache.get(1) is None
@@ -0,0 +1,105 @@
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+from word_cache import VersionBoard
+
+# 按用户缓存的聚合结果（仪表盘）配置
+USER_CACHE_CONFIG = {
+    "enabled": os.getenv("DASHBOARD_CACHE_ENABLED", "1") == "1",
+    # 条目存活秒数；用户自己的写入会立即让条目失效，ttl 只兜底其他来源的变化（如批量重算复习计划）
+    "ttl": float(os.getenv("DASHBOARD_CACHE_TTL", "10")),
+    "max_entries": int(os.getenv("DASHBOARD_CACHE_MAX_ENTRIES", "10000")),
+    # 同一主机上各 worker 共享的按 user_id 分桶的版本戳文件
+    "version_file": os.getenv("DASHBOARD_CACHE_VERSION_FILE", os.path.join(tempfile.gettempdir(), "dancisystem_user_versions.bin")),
+    "version_buckets": int(os.getenv("DASHBOARD_CACHE_VERSION_BUCKETS", "4096")),
+}
+
+class UserCache:
+    # 每个用户一条的短期缓存；该用户写入学习记录、复习或打卡并提交后调用 invalidate，
+    # 通过共享版本戳让所有 worker 中该用户的条目失效
+    def __init__(self, ttl: float, max_entries: int, versions: Optional[VersionBoard] = None, enabled: bool = True):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.versions = versions
+        self.enabled = enabled
+        self._entries = OrderedDict()  # user_id -> (value, version, expires)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.expired = 0
+        self.invalidations = 0
+
+    def version(self, user_id: int) -> int:
+        # 查询数据库之前先取版本戳，查询期间该用户的写入会让结果在下次读取时被判定为过期
+        return self.versions.current(user_id) if self.versions else 0
+
+    def get(self, user_id: int):
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, version, expires = entry
+            if time.monotonic() >= expires:
+                del self._entries[user_id]
+                self.expired += 1
+                self.misses += 1
+                return None
+            if self.versions and self.versions.current(user_id) != version:
+                del self._entries[user_id]
+                self.stale += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return value
+
+    def put(self, user_id: int, value, version: int):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._entries[user_id] = (value, version, time.monotonic() + self.ttl)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_ids: Iterable[int]):
+        with self._lock:
+            for user_id in set(user_ids):
+                if self._entries.pop(user_id, None) is not None:
+                    self.invalidations += 1
+                if self.versions:
+                    self.versions.bump(user_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "ttl": self.ttl,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "expired": self.expired,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+dashboard_cache = UserCache(
+    ttl=USER_CACHE_CONFIG["ttl"],
+    max_entries=USER_CACHE_CONFIG["max_entries"],
+    versions=VersionBoard(USER_CACHE_CONFIG["version_file"], USER_CACHE_CONFIG["version_buckets"]),
+    enabled=USER_CACHE_CONFIG["enabled"],
+)
@@ -1,10 +1,27 @@
-from fastapi import APIRouter, HTTPException
+import logging
+import os
+import secrets
+from fastapi import APIRouter, HTTPException, Header
 from pydantic import BaseModel
 from typing import Optional, List
-from db_config import get_oracle_conn
+from db_config import get_oracle_conn, tune_cursor
+from fast_response import fast_json
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# 班级统计、进度导出等可以查看其他学生学习数据的接口，在有登录时签发、服务端校验的会话之前只对管理员开放：
+# 调用方需在 X-Admin-Token 请求头中带上服务端配置的 ADMIN_TOKEN。X-User-Id、查询参数里的 user_id 等
+# 调用方自报的身份都可以伪造，不能用来判断是否是教师。未配置 ADMIN_TOKEN 时这些接口一律拒绝
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+def require_admin(x_admin_token: Optional[str] = Header(None, description="服务端配置的 ADMIN_TOKEN")):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="该接口暂未开放：服务端未配置 ADMIN_TOKEN")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="管理员令牌无效")
+
 class User(BaseModel):
     user_id: int
     username: str
@@ -59,11 +76,11 @@ def register(data: RegisterRequest):
 @router.get("/users", response_model=List[User])
 def get_users():
     conn = get_oracle_conn()
-    cursor = conn.cursor()
+    cursor = tune_cursor(conn.cursor(), "list")
     try:
         cursor.execute('SELECT user_id, username, role, email, create_time FROM "User"')
-        users = [User(user_id=row[0], username=row[1], role=row[2], email=row[3], create_time=row[4].strftime('%Y-%m-%d') if row[4] else None) for row in cursor.fetchall()]
-        return users
+        users = [{"user_id": row[0], "username": row[1], "role": row[2], "email": row[3], "create_time": row[4].strftime('%Y-%m-%d') if row[4] else None} for row in cursor.fetchall()]
+        return fast_json(users, List[User])
     finally:
         cursor.close()
         conn.close()
@@ -71,7 +88,7 @@ def get_users():
 @router.get("/users/{user_id}", response_model=User)
 def get_user(user_id: int):
     conn = get_oracle_conn()
-    cursor = conn.cursor()
+    cursor = tune_cursor(conn.cursor(), "single")
     try:
         cursor.execute('SELECT user_id, username, role, email, create_time FROM "User" WHERE user_id=:1', (user_id,))
         row = cursor.fetchone()
@@ -118,7 +135,7 @@ def update_user(user_id: int, data: UpdateUserRequest):
         raise
     except Exception as e:
         conn.rollback()
-        print("Error updating user:", str(e))  # 添加错误日志
+        logger.exception("update user %s failed", user_id)
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cursor.close()
@@ -142,7 +159,7 @@ def delete_user(user_id: int):
         raise
     except Exception as e:
         conn.rollback()
-        print("Error deleting user:", str(e))
+        logger.exception("delete user %s failed", user_id)
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cursor.close()
@@ -0,0 +1,213 @@
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, List, Optional
+
+# 单词详情缓存配置
+CACHE_CONFIG = {
+    "enabled": os.getenv("WORD_CACHE_ENABLED", "1") == "1",
+    "max_entries": int(os.getenv("WORD_CACHE_MAX_ENTRIES", "10000")),
+    "max_bytes": int(os.getenv("WORD_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    # 同一主机上各 worker 共享的版本戳文件
+    "version_file": os.getenv("WORD_CACHE_VERSION_FILE", os.path.join(tempfile.gettempdir(), "dancisystem_word_versions.bin")),
+    "version_buckets": int(os.getenv("WORD_CACHE_VERSION_BUCKETS", "4096")),
+    # 同一主机上各 worker 共享的单词变更日志，搜索索引据此增量同步其他 worker 的写入
+    "change_file": os.getenv("WORD_CHANGE_FILE", os.path.join(tempfile.gettempdir(), "dancisystem_word_changes.bin")),
+}
+
+class VersionBoard:
+    # 按 word_id 哈希分桶的版本戳，存放在内存映射文件中，多个 uvicorn worker 共同读写。
+    # 写操作把桶改成一个新的唯一值，读缓存时版本戳与写入缓存时不一致即视为过期。
+    _SLOT = struct.Struct('<Q')
+
+    def __init__(self, path: str, buckets: int):
+        self.buckets = buckets
+        # 最后一个槽位是全局版本戳（如全部词表的版本）
+        size = (buckets + 1) * self._SLOT.size
+        with open(path, 'a+b') as f:
+            fresh = os.path.getsize(path) == 0
+            if os.path.getsize(path) < size:
+                f.truncate(size)
+        self._file = open(path, 'r+b')
+        self._map = mmap.mmap(self._file.fileno(), size)
+        if fresh:
+            # 新建的文件（如重启后临时目录被清理）从一个新的时间戳开始，不会与之前发出的版本戳（ETag）重复
+            self._map[:] = self._SLOT.pack(self._stamp()) * (buckets + 1)
+
+    def _offset(self, word_id: int) -> int:
+        return (word_id % self.buckets) * self._SLOT.size
+
+    def current(self, word_id: int) -> int:
+        return self._SLOT.unpack_from(self._map, self._offset(word_id))[0]
+
+    @staticmethod
+    def _stamp() -> int:
+        # 用纳秒时间戳混合进程号，不同 worker 并发写入也会得到与旧值不同的新值
+        return (time.time_ns() ^ (os.getpid() << 48)) & 0xFFFFFFFFFFFFFFFF
+
+    def _write_new(self, offset: int) -> int:
+        stamp = self._stamp()
+        if stamp == self._SLOT.unpack_from(self._map, offset)[0]:
+            stamp = (stamp + 1) & 0xFFFFFFFFFFFFFFFF
+        self._SLOT.pack_into(self._map, offset, stamp)
+        return stamp
+
+    def bump(self, word_id: int):
+        self._write_new(self._offset(word_id))
+
+    def catalogue(self) -> int:
+        return self._SLOT.unpack_from(self._map, self.buckets * self._SLOT.size)[0]
+
+    def bump_catalogue(self) -> int:
+        return self._write_new(self.buckets * self._SLOT.size)
+
+class ChangeLog:
+    # 只追加的单词变更日志：每条记录是一个被新增、修改或删除的 word_id（8 字节）。
+    # 日志位置为 (文件 inode, 字节偏移)，读者记住自己应用到的位置，之后只重放新增的记录；
+    # 文件被清理后重新创建时 inode 变化，读者据此知道需要全量重建。
+    _RECORD = struct.Struct('<q')
+    RECORD_SIZE = _RECORD.size
+
+    def __init__(self, path: str):
+        self.path = path
+        open(path, 'ab').close()
+
+    def end(self):
+        # 只计完整的记录；文件不存在时返回 (0, 0)
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return 0, 0
+        return st.st_ino, st.st_size - st.st_size % self.RECORD_SIZE
+
+    def append(self, word_ids: Iterable[int]):
+        # 以 O_APPEND 一次写入，多个进程并发追加不会交错；返回 (inode, 本次记录的起始偏移, 结束偏移)
+        data = b''.join(self._RECORD.pack(word_id) for word_id in word_ids)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+            end = os.lseek(fd, 0, os.SEEK_CUR)
+            return os.fstat(fd).st_ino, end - len(data), end
+        finally:
+            os.close(fd)
+
+    def reset(self):
+        # 换成一个新的空文件（inode 随之变化），已打开旧文件的写入者写完即止；读者发现 inode 变化后全量重建
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        open(tmp, 'wb').close()
+        os.replace(tmp, self.path)
+
+    def read(self, start: int, end: int) -> List[int]:
+        # 返回 [start, end) 之间去重后的 word_id
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            data = f.read(end - start)
+        data = data[:len(data) - len(data) % self.RECORD_SIZE]
+        return list(dict.fromkeys(word_id for (word_id,) in self._RECORD.iter_unpack(data)))
+
+class WordCache:
+    # 补全后的单词对象的 LRU 缓存，按条数和估算字节数两个上限淘汰
+    def __init__(self, max_entries: int, max_bytes: int, versions: Optional[VersionBoard] = None, enabled: bool = True):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.versions = versions
+        self.enabled = enabled
+        self._entries = OrderedDict()  # word_id -> (word, version, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def version(self, word_id: int) -> int:
+        # 从数据库加载之前先取版本戳，加载期间发生的写入会让该条目在下次读取时被判定为过期
+        return self.versions.current(word_id) if self.versions else 0
+
+    def get(self, word_id: int):
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(word_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            word, version, size = entry
+            if self.versions and self.versions.current(word_id) != version:
+                # 其他 worker 修改过该单词
+                self._remove(word_id)
+                self.stale += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(word_id)
+            self.hits += 1
+            return word
+
+    def put(self, word_id: int, word: dict, version: int):
+        if not self.enabled:
+            return
+        size = len(json.dumps(word, ensure_ascii=False).encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(word_id)
+            self._entries[word_id] = (word, version, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, word_ids: Iterable[int]):
+        # 单词被修改或删除后调用：清掉本进程的条目，并更新共享版本戳通知其他 worker
+        with self._lock:
+            for word_id in word_ids:
+                if self._remove(word_id):
+                    self.invalidations += 1
+                if self.versions:
+                    self.versions.bump(word_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, word_id: int) -> bool:
+        entry = self._entries.pop(word_id, None)
+        if entry is None:
+            return False
+        self._bytes -= entry[2]
+        return True
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+versions = VersionBoard(CACHE_CONFIG["version_file"], CACHE_CONFIG["version_buckets"])
+word_changes = ChangeLog(CACHE_CONFIG["change_file"])
+
+word_cache = WordCache(
+    max_entries=CACHE_CONFIG["max_entries"],
+    max_bytes=CACHE_CONFIG["max_bytes"],
+    versions=versions,
+    enabled=CACHE_CONFIG["enabled"],
+)
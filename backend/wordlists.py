@@ -1,7 +1,11 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 from typing import Optional, List
-from db_config import get_oracle_conn
+from db_config import get_oracle_conn, tune_cursor
+from word_cache import word_cache
+from search_index import apply_word_changes
+from study_rollup import days_touching_words, refresh_days
+from http_cache import touch_lists, list_version, make_etag, not_modified, cached_json
 
 router = APIRouter()
 
@@ -16,9 +20,14 @@ class WordList(BaseModel):
     word_count: Optional[int] = None
 
 @router.get("/wordlists", response_model=List[WordList])
-def get_wordlists(user_id: Optional[int] = None):
+def get_wordlists(request: Request, user_id: Optional[int] = None):
+    # 版本戳在查询之前读取，查询期间的修改会让下次验证拿到完整响应
+    etag = make_etag("lists", list_version(None))
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
     conn = get_oracle_conn()
-    cursor = conn.cursor()
+    cursor = tune_cursor(conn.cursor(), "list")
     try:
         if user_id:
             cursor.execute('SELECT list_id, list_name, description, creator_id, create_time, is_public, difficulty FROM WordList WHERE creator_id=:uid OR is_public=1', uid=user_id)
@@ -31,25 +40,24 @@ def get_wordlists(user_id: Optional[int] = None):
             cursor2.execute('SELECT COUNT(*) FROM Word WHERE list_id=:lid', lid=row[0])
             word_count = cursor2.fetchone()[0]
             cursor2.close()
-            lists.append(WordList(
-                list_id=row[0],
-                list_name=row[1],
-                description=str(row[2]) if row[2] is not None else None,
-                creator_id=row[3],
-                create_time=row[4].strftime('%Y-%m-%d') if row[4] else None,
-                is_public=bool(row[5]),
-                difficulty=row[6],
-                word_count=word_count
-            ))
-        return lists
+            lists.append({
+                "list_id": row[0],
+                "list_name": row[1],
+                "description": str(row[2]) if row[2] is not None else None,
+                "creator_id": row[3],
+                "create_time": row[4].strftime('%Y-%m-%d') if row[4] else None,
+                "is_public": bool(row[5]),
+                "difficulty": row[6],
+                "word_count": word_count
+            })
+        return cached_json(request, lists, etag, List[WordList])
     finally:
         cursor.close()
         conn.close()
 
-@router.get("/wordlists/{list_id}", response_model=WordList)
-def get_wordlist(list_id: int):
+def _load_wordlist(list_id: int):
     conn = get_oracle_conn()
-    cursor = conn.cursor()
+    cursor = tune_cursor(conn.cursor(), "single")
     try:
         cursor.execute('SELECT list_id, list_name, description, creator_id, create_time, is_public, difficulty FROM WordList WHERE list_id=:lid', lid=list_id)
         row = cursor.fetchone()
@@ -59,20 +67,28 @@ def get_wordlist(list_id: int):
         cursor2.execute('SELECT COUNT(*) FROM Word WHERE list_id=:lid', lid=row[0])
         word_count = cursor2.fetchone()[0]
         cursor2.close()
-        return WordList(
-            list_id=row[0],
-            list_name=row[1],
-            description=str(row[2]) if row[2] is not None else None,
-            creator_id=row[3],
-            create_time=row[4].strftime('%Y-%m-%d') if row[4] else None,
-            is_public=bool(row[5]),
-            difficulty=row[6],
-            word_count=word_count
-        )
+        return {
+            "list_id": row[0],
+            "list_name": row[1],
+            "description": str(row[2]) if row[2] is not None else None,
+            "creator_id": row[3],
+            "create_time": row[4].strftime('%Y-%m-%d') if row[4] else None,
+            "is_public": bool(row[5]),
+            "difficulty": row[6],
+            "word_count": word_count
+        }
     finally:
         cursor.close()
         conn.close()
 
+@router.get("/wordlists/{list_id}", response_model=WordList)
+def get_wordlist(list_id: int, request: Request):
+    etag = make_etag("list", list_id, list_version(list_id))
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+    return cached_json(request, _load_wordlist(list_id), etag, WordList)
+
 class CreateWordListRequest(BaseModel):
     list_name: str
     description: Optional[str] = None
@@ -96,8 +112,9 @@ def create_wordlist(data: CreateWordListRequest):
              public=data.is_public, diff=data.difficulty)
         
         conn.commit()
+        touch_lists([list_id])
         
-        return get_wordlist(list_id)
+        return _load_wordlist(list_id)
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
@@ -110,11 +127,19 @@ def delete_wordlist(list_id: int):
     conn = get_oracle_conn()
     cursor = conn.cursor()
     try:
-        # 先删除词表中的所有单词
-        cursor.execute('DELETE FROM Word WHERE list_id = :lid', lid=list_id)
+        # 学习记录随单词级联删除，先取出受影响的 (用户, 日期)，删除后重新汇总
+        days = days_touching_words(cursor, 'list_id = :list_id', {"list_id": list_id})
+        # 先删除词表中的所有单词，同时取回被删除的 word_id 用于清理缓存
+        word_ids_var = cursor.var(int)
+        cursor.execute('DELETE FROM Word WHERE list_id = :lid RETURNING word_id INTO :word_ids', lid=list_id, word_ids=word_ids_var)
+        word_ids = word_ids_var.getvalue() or []
         # 然后删除词表
         cursor.execute('DELETE FROM WordList WHERE list_id = :lid', lid=list_id)
+        refresh_days(cursor, days)
         conn.commit()
+        word_cache.invalidate(word_ids)
+        apply_word_changes(removed=word_ids)
+        touch_lists([list_id])
         return {"message": "词表删除成功"}
     except Exception as e:
         conn.rollback()
@@ -150,8 +175,9 @@ def update_wordlist(list_id: int, data: UpdateWordListRequest):
         ''', (data.list_name, data.description, 1 if data.is_public else 0, data.difficulty, list_id))
         
         conn.commit()
+        touch_lists([list_id])
         
-        return get_wordlist(list_id)
+        return _load_wordlist(list_id)
     except HTTPException:
         raise
     except Exception as e:
@@ -1,7 +1,14 @@
-from fastapi import APIRouter, HTTPException, Query
-from pydantic import BaseModel
+import json
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
 from typing import Optional, List, Dict, Any
-from db_config import get_oracle_conn
+from db_config import get_oracle_conn, get_async_conn, tune_cursor
+from hydrate import hydrate_words_async, load_words
+from word_cache import word_cache
+from search_index import apply_word_changes
+from study_rollup import days_touching_words, refresh_days
+from http_cache import touch_lists, list_version, make_etag, not_modified, cached_json
 
 router = APIRouter()
 
@@ -49,9 +56,12 @@ def create_word(word: Word):
             ''', word_id=word_id, phrase=phrase.phrase, translation=phrase.translation)
         
         conn.commit()
+        word_cache.invalidate([word_id])
+        apply_word_changes(added=[dict(word_id=word_id, **word.dict())])
+        touch_lists([word.list_id])
         
         # 返回创建的单词
-        return get_word(word_id)
+        return _load_word(word_id)
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
@@ -59,70 +69,305 @@ def create_word(word: Word):
         cursor.close()
         conn.close()
 
-@router.get("/words")
-def get_words(list_id: Optional[int] = None, limit: Optional[int] = None):
-    conn = get_oracle_conn()
+# 批量导入每批写入的单词数
+BULK_BATCH_SIZE = 1000
+
+class BulkWord(BaseModel):
+    word: str = Field(..., min_length=1, max_length=100)
+    translations: List[Translation] = []
+    phrases: List[Phrase] = []
+    list_id: Optional[int] = None
+
+class BulkRowError(BaseModel):
+    index: int
+    word: Optional[str] = None
+    error: str
+
+class BulkImportResult(BaseModel):
+    total: int
+    valid: int
+    inserted: int
+    dry_run: bool
+    errors: List[BulkRowError]
+
+def _validation_message(e: ValidationError):
+    return '; '.join('.'.join(str(p) for p in err['loc']) + ': ' + err['msg'] for err in e.errors())
+
+async def _existing_list_ids(cursor, list_ids):
+    list_ids = list(list_ids)
+    if not list_ids:
+        return set()
+    names = [f'l{i}' for i in range(len(list_ids))]
+    await cursor.execute(
+        'SELECT list_id FROM WordList WHERE list_id IN (' + ', '.join(':' + n for n in names) + ')',
+        dict(zip(names, list_ids))
+    )
+    return {row[0] for row in await cursor.fetchall()}
+
+def _first_value(value):
+    # DML RETURNING 在 executemany 时每行返回一个列表
+    return value[0] if isinstance(value, list) else value
+
+async def _import_batch(conn, batch, default_list_id, dry_run, result):
+    # batch 为 (原始序号, 原始数据) 列表；校验失败或写入失败的行记录到 result.errors，不影响同批其他行
     cursor = conn.cursor()
+    child_cursor = conn.cursor()
+    try:
+        valid = []
+        for index, item in batch:
+            if not isinstance(item, dict):
+                result.errors.append(BulkRowError(index=index, error="每一行必须是 JSON 对象"))
+                continue
+            try:
+                word = BulkWord(**item)
+            except ValidationError as e:
+                result.errors.append(BulkRowError(index=index, word=str(item.get('word') or ''), error=_validation_message(e)))
+                continue
+            if word.list_id is None:
+                word.list_id = default_list_id
+            if word.list_id is None:
+                result.errors.append(BulkRowError(index=index, word=word.word, error="缺少 list_id"))
+                continue
+            valid.append((index, word))
+
+        existing = await _existing_list_ids(cursor, {w.list_id for _, w in valid})
+        rows = []
+        for index, word in valid:
+            if word.list_id not in existing:
+                result.errors.append(BulkRowError(index=index, word=word.word, error=f"词表 {word.list_id} 不存在"))
+            else:
+                rows.append((index, word))
+        result.valid += len(rows)
+        if dry_run or not rows:
+            return
+
+        # 插入单词，RETURNING 一次取回本批全部 word_id
+        id_var = cursor.var(int, arraysize=len(rows))
+        cursor.setinputsizes(None, None, id_var)
+        await cursor.executemany(
+            'INSERT INTO Word (word, list_id) VALUES (:1, :2) RETURNING word_id INTO :3',
+            [(w.word, w.list_id) for _, w in rows],
+            batcherrors=True
+        )
+        failed = {error.offset: error.message for error in cursor.getbatcherrors()}
+        inserted = {}
+        for offset, (index, word) in enumerate(rows):
+            if offset in failed:
+                result.errors.append(BulkRowError(index=index, word=word.word, error=failed[offset]))
+            else:
+                inserted[_first_value(id_var.getvalue(offset))] = (index, word)
+
+        # 插入翻译和短语；某个单词的子行写入失败时删除该单词，保证每个单词要么完整写入要么不写入
+        translation_rows = [(word_id, t.translation, t.type) for word_id, (_, w) in inserted.items() for t in w.translations]
+        phrase_rows = [(word_id, p.phrase, p.translation) for word_id, (_, w) in inserted.items() for p in w.phrases]
+        broken = {}
+        for sql, child_rows in (
+            ('INSERT INTO WordTranslation (word_id, translation, word_type) VALUES (:1, :2, :3)', translation_rows),
+            ('INSERT INTO WordPhrase (word_id, phrase, translation) VALUES (:1, :2, :3)', phrase_rows),
+        ):
+            if not child_rows:
+                continue
+            await child_cursor.executemany(sql, child_rows, batcherrors=True)
+            for error in child_cursor.getbatcherrors():
+                broken.setdefault(child_rows[error.offset][0], error.message)
+        if broken:
+            params = [(word_id,) for word_id in broken]
+            for table in ('WordTranslation', 'WordPhrase', 'Word'):
+                await child_cursor.executemany(f'DELETE FROM {table} WHERE word_id = :1', params)
+            for word_id, message in broken.items():
+                index, word = inserted.pop(word_id)
+                result.errors.append(BulkRowError(index=index, word=word.word, error=message))
+
+        await conn.commit()
+        apply_word_changes(added=[dict(word_id=word_id, **w.dict()) for word_id, (_, w) in inserted.items()])
+        touch_lists(w.list_id for _, w in inserted.values())
+        result.inserted += len(inserted)
+    finally:
+        child_cursor.close()
+        cursor.close()
+
+async def _iter_bulk_rows(request: Request):
+    # JSON 数组整体解析；NDJSON 按行流式解析，无需把整个请求体读入内存
+    content_type = request.headers.get('content-type', '')
+    if 'ndjson' in content_type or 'jsonlines' in content_type:
+        index = 0
+        buffer = b''
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b'\n')
+            for line in lines:
+                if line.strip():
+                    yield index, line
+                    index += 1
+        if buffer.strip():
+            yield index, buffer
+        return
+    try:
+        items = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="请求体不是合法的 JSON")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="请求体必须是 JSON 数组")
+    for index, item in enumerate(items):
+        yield index, item
+
+@router.post("/words/bulk", response_model=BulkImportResult)
+async def bulk_create_words(
+    request: Request,
+    list_id: Optional[int] = Query(None, description="未指定 list_id 的行写入该词表"),
+    dry_run: bool = Query(False, description="只校验不写入"),
+):
+    result = BulkImportResult(total=0, valid=0, inserted=0, dry_run=dry_run, errors=[])
+    conn = await get_async_conn()
     try:
-        query = '''
+        batch = []
+        async for index, item in _iter_bulk_rows(request):
+            result.total += 1
+            if isinstance(item, bytes):
+                try:
+                    item = json.loads(item)
+                except ValueError:
+                    result.errors.append(BulkRowError(index=index, error="该行不是合法的 JSON"))
+                    continue
+            batch.append((index, item))
+            if len(batch) >= BULK_BATCH_SIZE:
+                await _import_batch(conn, batch, list_id, dry_run, result)
+                batch = []
+        if batch:
+            await _import_batch(conn, batch, list_id, dry_run, result)
+        result.errors.sort(key=lambda e: e.index)
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        await conn.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        await conn.close()
+
+# 游标分页的默认/最大页大小，流式导出每批从服务器取回的行数
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 500
+
+class WordPage(BaseModel):
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[int] = None
+
+def _words_query(list_id: Optional[int], after: Optional[int]):
+    query = '''
             SELECT w.word_id, w.word, w.list_id
             FROM Word w
+            WHERE 1 = 1
         '''
-        params = {}
-        if list_id:
-            query += ' WHERE w.list_id = :list_id'
-            params['list_id'] = list_id
+    params = {}
+    if list_id:
+        query += ' AND w.list_id = :list_id'
+        params['list_id'] = list_id
+    if after is not None:
+        query += ' AND w.word_id > :after'
+        params['after'] = after
+    query += ' ORDER BY w.word_id'
+    return query, params
+
+async def _stream_words(conn, cursor):
+    # 服务器端游标逐批取行，每批批量补全翻译和短语后以 NDJSON 逐行输出，内存占用与总行数无关；
+    # 连接和第一次 execute 在发出响应头之前完成，这里只负责取行并在结束时归还连接
+    detail_cursor = conn.cursor()
+    try:
+        while True:
+            rows = await cursor.fetchmany(STREAM_BATCH_SIZE)
+            if not rows:
+                break
+            for word in await hydrate_words_async(detail_cursor, rows):
+                yield json.dumps(word, ensure_ascii=False) + '\n'
+    finally:
+        detail_cursor.close()
+        cursor.close()
+        await conn.close()
+
+@router.get("/words")
+async def get_words(
+    request: Request,
+    list_id: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    after: Optional[int] = Query(None, description="游标分页：返回 word_id 大于该值的单词，响应中带 next_cursor"),
+    stream: bool = Query(False, description="以 NDJSON 流式返回全部结果"),
+):
+    # 词表版本戳未变时不取连接直接返回 304；不同的分页参数是不同的 URL，各自缓存
+    etag = make_etag("words", list_id or 0, list_version(list_id))
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+    # 在返回响应之前取连接：连接池耗尽时返回 503，而不是在 200 响应头发出后中断流
+    conn = await get_async_conn()
+    if stream:
+        cursor = conn.cursor()
+        try:
+            query, params = _words_query(list_id, after)
+            if limit:
+                query += ' FETCH FIRST :limit ROWS ONLY'
+                params['limit'] = limit
+            cursor.arraysize = STREAM_BATCH_SIZE
+            cursor.prefetchrows = STREAM_BATCH_SIZE
+            await cursor.execute(query, params)
+        except BaseException:
+            cursor.close()
+            await conn.close()
+            raise
+        # 流式输出不压缩，只带 ETag；游标和连接由生成器结束时关闭
+        return StreamingResponse(_stream_words(conn, cursor), media_type="application/x-ndjson", headers={"ETag": etag})
+    cursor = tune_cursor(conn.cursor(), "list")
+    try:
+        query, params = _words_query(list_id, after)
+        if after is not None:
+            # 游标分页：多取一行判断是否还有下一页
+            page_size = min(limit or PAGE_SIZE, MAX_PAGE_SIZE)
+            query += ' FETCH FIRST :limit ROWS ONLY'
+            params['limit'] = page_size + 1
+            await cursor.execute(query, params)
+            rows = await cursor.fetchall()
+            has_more = len(rows) > page_size
+            rows = rows[:page_size]
+            items = await hydrate_words_async(cursor, rows)
+            return cached_json(request, {"items": items, "next_cursor": rows[-1][0] if has_more else None}, etag, WordPage)
         if limit:
             query += ' FETCH FIRST :limit ROWS ONLY'
             params['limit'] = limit
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        words = []
-        for row in rows:
-            word_id, word, list_id = row
-            # 获取翻译
-            cursor.execute('''SELECT translation, word_type FROM WordTranslation WHERE word_id = :word_id ORDER BY word_type''', word_id=word_id)
-            translations = [{"translation": str(t) if t is not None else '', "type": ty} for t, ty in cursor.fetchall()]
-            # 获取短语
-            cursor.execute('''SELECT phrase, translation FROM WordPhrase WHERE word_id = :word_id''', word_id=word_id)
-            phrases = [{"phrase": str(p) if p is not None else '', "translation": str(tr) if tr is not None else ''} for p, tr in cursor.fetchall()]
-            words.append({
-                "word_id": word_id,
-                "word": word,
-                "translations": translations,
-                "phrases": phrases,
-                "list_id": list_id
-            })
-        return words
+        await cursor.execute(query, params)
+        rows = await cursor.fetchall()
+        # 批量获取翻译和短语
+        return cached_json(request, await hydrate_words_async(cursor, rows), etag)
     finally:
         cursor.close()
-        conn.close()
+        await conn.close()
 
-@router.get("/words/{word_id}")
-def get_word(word_id: int):
+def _load_word(word_id: int):
+    cached = word_cache.get(word_id)
+    if cached is not None:
+        return cached
+    version = word_cache.version(word_id)
     conn = get_oracle_conn()
     cursor = conn.cursor()
     try:
-        cursor.execute('''SELECT word_id, word, list_id FROM Word WHERE word_id = :word_id''', word_id=word_id)
-        row = cursor.fetchone()
-        if not row:
+        words = load_words(cursor, [word_id])
+        if not words:
             raise HTTPException(status_code=404, detail="Word not found")
-        word_id, word, list_id = row
-        cursor.execute('''SELECT translation, word_type FROM WordTranslation WHERE word_id = :word_id ORDER BY word_type''', word_id=word_id)
-        translations = [{"translation": str(t) if t is not None else '', "type": ty} for t, ty in cursor.fetchall()]
-        cursor.execute('''SELECT phrase, translation FROM WordPhrase WHERE word_id = :word_id''', word_id=word_id)
-        phrases = [{"phrase": str(p) if p is not None else '', "translation": str(tr) if tr is not None else ''} for p, tr in cursor.fetchall()]
-        return {
-            "word_id": word_id,
-            "word": word,
-            "translations": translations,
-            "phrases": phrases,
-            "list_id": list_id
-        }
+        word_cache.put(word_id, words[0], version)
+        return words[0]
     finally:
         cursor.close()
         conn.close()
 
+@router.get("/words/{word_id}")
+def get_word(word_id: int, request: Request):
+    # 单词的增删都会更新它在单词缓存中的版本戳，直接用作 ETag
+    etag = make_etag("word", word_id, word_cache.version(word_id))
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+    return cached_json(request, _load_word(word_id), etag)
+
 @router.delete("/words/{word_id}")
 def delete_word(word_id: int):
     conn = get_oracle_conn()
@@ -132,10 +377,17 @@ def delete_word(word_id: int):
         cursor.execute('DELETE FROM WordTranslation WHERE word_id = :word_id', word_id=word_id)
         cursor.execute('DELETE FROM WordPhrase WHERE word_id = :word_id', word_id=word_id)
         
-        # 删除单词
-        cursor.execute('DELETE FROM Word WHERE word_id = :word_id', word_id=word_id)
+        # 学习记录随单词级联删除，先取出受影响的 (用户, 日期)，删除后重新汇总
+        days = days_touching_words(cursor, 'word_id = :word_id', {"word_id": word_id})
+        # 删除单词，取回所属词表用于更新词表版本戳
+        list_id_var = cursor.var(int)
+        cursor.execute('DELETE FROM Word WHERE word_id = :word_id RETURNING list_id INTO :list_id', word_id=word_id, list_id=list_id_var)
+        refresh_days(cursor, days)
         
         conn.commit()
+        word_cache.invalidate([word_id])
+        apply_word_changes(removed=[word_id])
+        touch_lists(list_id_var.getvalue() or [])
         return {"message": "Word deleted successfully"}
     except Exception as e:
         conn.rollback()
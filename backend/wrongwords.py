@@ -1,7 +1,9 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Optional
-from db_config import get_oracle_conn
+from db_config import get_oracle_conn, tune_cursor
+from hydrate import hydrate_words
+from fast_response import fast_json
 
 router = APIRouter()
 
@@ -27,7 +29,7 @@ class WrongWord(BaseModel):
 @router.get("/wrongwords", response_model=List[WrongWord])
 def get_wrongwords(user_id: int):
     conn = get_oracle_conn()
-    cursor = conn.cursor()
+    cursor = tune_cursor(conn.cursor(), "list")
     try:
         # 获取错题记录并包含单词详情
         cursor.execute('''
@@ -41,39 +43,12 @@ def get_wrongwords(user_id: int):
             ORDER BY w.last_wrong_time DESC
         ''', (user_id,))
         
+        rows = cursor.fetchall()
+        # 批量获取单词的翻译、短语和词表难度
+        words = hydrate_words(cursor, [(row[2], str(row[8]) if row[8] is not None else '', row[9]) for row in rows], with_difficulty=True)
+        
         wrongs = []
-        for row in cursor.fetchall():
-            # 获取单词的翻译列表
-            cursor.execute('''
-                SELECT translation, word_type 
-                FROM WordTranslation 
-                WHERE word_id = :1
-            ''', (row[2],))
-            translations = [
-                {"translation": str(t[0]) if t[0] is not None else '', "type": str(t[1]) if t[1] is not None else ''}
-                for t in cursor.fetchall()
-            ]
-            
-            # 获取单词的短语列表
-            cursor.execute('''
-                SELECT phrase, translation 
-                FROM WordPhrase 
-                WHERE word_id = :1
-            ''', (row[2],))
-            phrases = [
-                {"phrase": str(p[0]) if p[0] is not None else '', "translation": str(p[1]) if p[1] is not None else ''}
-                for p in cursor.fetchall()
-            ]
-            
-            # 获取词表难度
-            cursor.execute('''
-                SELECT difficulty 
-                FROM WordList 
-                WHERE list_id = :1
-            ''', (row[9],))
-            difficulty_row = cursor.fetchone()
-            difficulty = str(difficulty_row[0]) if difficulty_row and difficulty_row[0] is not None else ''
-            
+        for row, word in zip(rows, words):
             wrongs.append({
                 "id": row[0],
                 "user_id": row[1],
@@ -83,16 +58,9 @@ def get_wrongwords(user_id: int):
                 "error_type": str(row[5]) if row[5] is not None else '',
                 "user_answer": str(row[6]) if row[6] is not None else None,
                 "correct_answer": str(row[7]) if row[7] is not None else None,
-                "word": {
-                    "word_id": row[2],
-                    "word": str(row[8]) if row[8] is not None else '',
-                    "list_id": row[9],
-                    "translations": translations,
-                    "phrases": phrases,
-                    "difficulty": difficulty
-                }
+                "word": word
             })
-        return wrongs
+        return fast_json(wrongs, List[WrongWord])
     finally:
         cursor.close()
         conn.close()
@@ -1,4 +1,16 @@
 -- 删除所有表（如果存在）
+BEGIN
+  EXECUTE IMMEDIATE 'DROP TABLE WordMastery CASCADE CONSTRAINTS';
+EXCEPTION WHEN OTHERS THEN NULL; END;
+/
+BEGIN
+  EXECUTE IMMEDIATE 'DROP TABLE StudyDailyWord CASCADE CONSTRAINTS';
+EXCEPTION WHEN OTHERS THEN NULL; END;
+/
+BEGIN
+  EXECUTE IMMEDIATE 'DROP TABLE StudyDailyRollup CASCADE CONSTRAINTS';
+EXCEPTION WHEN OTHERS THEN NULL; END;
+/
 BEGIN
   EXECUTE IMMEDIATE 'DROP TABLE CheckInLog CASCADE CONSTRAINTS';
 EXCEPTION WHEN OTHERS THEN NULL; END;
@@ -148,19 +160,68 @@ CREATE TABLE CheckInLog (
     CONSTRAINT fk_checkinlog_user FOREIGN KEY (user_id) REFERENCES "User"(user_id) ON DELETE CASCADE
 );
 
+-- 创建每日学习汇总表（写入 StudyLog 时同一事务增量维护；已有数据用 python study_rollup.py rebuild 回填，同时回填 WordMastery）
+CREATE TABLE StudyDailyRollup (
+    user_id NUMBER NOT NULL,
+    study_date DATE NOT NULL,
+    log_count NUMBER DEFAULT 0 NOT NULL,
+    distinct_words NUMBER DEFAULT 0 NOT NULL,
+    known_count NUMBER DEFAULT 0 NOT NULL,
+    unknown_count NUMBER DEFAULT 0 NOT NULL,
+    learning_count NUMBER DEFAULT 0 NOT NULL,
+    CONSTRAINT pk_studydailyrollup PRIMARY KEY (user_id, study_date),
+    CONSTRAINT fk_studydailyrollup_user FOREIGN KEY (user_id) REFERENCES "User"(user_id) ON DELETE CASCADE
+);
+
+-- 创建每日学习单词表（每个用户每天学过的不同单词，用于维护 distinct_words 和按周去重）
+CREATE TABLE StudyDailyWord (
+    user_id NUMBER NOT NULL,
+    study_date DATE NOT NULL,
+    word_id NUMBER NOT NULL,
+    CONSTRAINT pk_studydailyword PRIMARY KEY (user_id, study_date, word_id),
+    CONSTRAINT fk_studydailyword_user FOREIGN KEY (user_id) REFERENCES "User"(user_id) ON DELETE CASCADE,
+    CONSTRAINT fk_studydailyword_word FOREIGN KEY (word_id) REFERENCES Word(word_id) ON DELETE CASCADE
+) ORGANIZATION INDEX;
+
+-- 创建单词掌握状态表（每个用户每个单词一行，与每日学习汇总一起维护）
+-- 掌握程度按 known 占比：>= 90% 为 mastered，>= 70% 为 learning，其余为 not_started
+CREATE TABLE WordMastery (
+    user_id NUMBER NOT NULL,
+    word_id NUMBER NOT NULL,
+    attempt_count NUMBER DEFAULT 0 NOT NULL,
+    correct_count NUMBER DEFAULT 0 NOT NULL,
+    last_seen TIMESTAMP,
+    mastery_level VARCHAR2(20) GENERATED ALWAYS AS (
+        CASE
+            WHEN attempt_count > 0 AND correct_count >= attempt_count * 0.9 THEN 'mastered'
+            WHEN attempt_count > 0 AND correct_count >= attempt_count * 0.7 THEN 'learning'
+            ELSE 'not_started'
+        END
+    ) VIRTUAL,
+    CONSTRAINT pk_wordmastery PRIMARY KEY (user_id, word_id),
+    CONSTRAINT fk_wordmastery_user FOREIGN KEY (user_id) REFERENCES "User"(user_id) ON DELETE CASCADE,
+    CONSTRAINT fk_wordmastery_word FOREIGN KEY (word_id) REFERENCES Word(word_id) ON DELETE CASCADE
+);
+
 -- 创建索引
-CREATE INDEX idx_word_list ON Word(list_id);
+CREATE INDEX idx_word_list ON Word(list_id, word_id);
 CREATE INDEX idx_word_translation ON WordTranslation(word_id);
 CREATE INDEX idx_word_phrase ON WordPhrase(word_id);
-CREATE INDEX idx_study_user ON StudyLog(user_id);
+CREATE INDEX idx_study_user ON StudyLog(user_id, study_time);
 CREATE INDEX idx_study_word ON StudyLog(word_id);
 CREATE INDEX idx_study_time ON StudyLog(study_time);
-CREATE INDEX idx_review_user ON ReviewSchedule(user_id);
+CREATE INDEX idx_review_user ON ReviewSchedule(user_id, review_date);
 CREATE INDEX idx_review_date ON ReviewSchedule(review_date);
 CREATE INDEX idx_wrong_user ON WrongWord(user_id);
 CREATE INDEX idx_fav_user ON FavoriteWord(user_id);
 CREATE INDEX idx_checkin_user ON CheckInLog(user_id);
 CREATE INDEX idx_checkin_date ON CheckInLog(checkin_date);
+CREATE INDEX idx_daily_word ON StudyDailyWord(word_id);
+CREATE INDEX idx_mastery_user_seen ON WordMastery(user_id, last_seen);
+CREATE INDEX idx_mastery_word ON WordMastery(word_id);
 
 -- 添加correct_answer列到WrongWord表
-ALTER TABLE WrongWord ADD (correct_answer CLOB);
\ No newline at end of file
+ALTER TABLE WrongWord ADD (correct_answer CLOB);
+
+-- 添加间隔重复调度所需的状态列到ReviewSchedule表（难度系数、当前间隔天数、上次复习时间）
+ALTER TABLE ReviewSchedule ADD (ease_factor NUMBER(4,2) DEFAULT 2.5, interval_days NUMBER(8,2) DEFAULT 0, last_review_time TIMESTAMP);
@@ -505,11 +505,13 @@ export const DataService = {
   // 获取学习统计数据
   async getStudyStatistics(userId: number): Promise<StudyStatistics> {
     try {
-      const [masteryStats, categoryStats, studyLogs] = await Promise.all([
-        this.getMasteryStatistics(userId),
-        this.getCategoryStatistics(userId),
+      // 掌握情况和分类统计由 summary 接口一次取回
+      const [summary, studyLogs] = await Promise.all([
+        this.getStatisticsSummary(userId, ["mastery", "categories"]),
         this.getStudyLogs(userId)
       ])
+      const masteryStats = summary.mastery ?? { total_words: 0, mastered_words: 0 }
+      const categoryStats = summary.categories ?? []
 
       // Calculate total words and mastered words
       const totalWords = masteryStats?.total_words || 0
@@ -755,6 +757,19 @@ export const DataService = {
     }
   },
 
+  async getStatisticsSummary(userId: number, sections: string[] = ["daily", "mastery", "weekly", "categories"]) {
+    try {
+      const response = await fetch(`${API_BASE_URL}/statistics/summary/${userId}?sections=${sections.join(",")}`)
+      if (!response.ok) {
+        throw new Error("Failed to fetch statistics summary")
+      }
+      return await response.json()
+    } catch (error) {
+      console.error("Get statistics summary error:", error)
+      return {}
+    }
+  },
+
   async getCategoryStatistics(userId: number) {
     try {
       const response = await fetch(`${API_BASE_URL}/statistics/categories/${userId}`)
@@ -230,6 +230,22 @@ INSERT INTO StudyLog (user_id, word_id, status) VALUES
 (4, 1, 'known'),
 (4, 2, 'known');
 
+-- 回填学习汇总（与 python study_rollup.py rebuild 相同）：上面直接写入 StudyLog，没有经过增量维护，
+-- 仪表盘的学过单词数、统计接口都读取这些汇总表
+INSERT INTO StudyDailyWord (user_id, study_date, word_id)
+SELECT DISTINCT user_id, TRUNC(study_time), word_id FROM StudyLog;
+INSERT INTO StudyDailyRollup (user_id, study_date, log_count, distinct_words, known_count, unknown_count, learning_count)
+SELECT user_id, TRUNC(study_time), COUNT(*), COUNT(DISTINCT word_id),
+       SUM(CASE WHEN status IN ('known', 'correct') THEN 1 ELSE 0 END),
+       SUM(CASE WHEN status = 'unknown' THEN 1 ELSE 0 END),
+       SUM(CASE WHEN status = 'learning' THEN 1 ELSE 0 END)
+FROM StudyLog
+GROUP BY user_id, TRUNC(study_time);
+INSERT INTO WordMastery (user_id, word_id, attempt_count, correct_count, last_seen)
+SELECT user_id, word_id, COUNT(*), SUM(CASE WHEN status IN ('known', 'correct') THEN 1 ELSE 0 END), MAX(study_time)
+FROM StudyLog
+GROUP BY user_id, word_id;
+
 -- 插入复习计划
 INSERT INTO ReviewSchedule (user_id, word_id, review_date, repeat_count) VALUES (3, 2, CURRENT_TIMESTAMP + 1, 0);
 INSERT INTO ReviewSchedule (user_id, word_id, review_date, repeat_count) VALUES (3, 3, CURRENT_TIMESTAMP + 3, 1);